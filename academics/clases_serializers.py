@@ -186,7 +186,29 @@ class ClaseWithLabelsSerializer(ClaseDetailSerializer):
 
 # ----------------- BULK: REQUEST -----------------
 
+class _PkPrecargado(serializers.PrimaryKeyRelatedField):
+    """
+    Como PrimaryKeyRelatedField, pero resuelve contra los objetos precargados en
+    context["precarga"][modelo] (si están) en vez de una consulta por valor.
+    """
+
+    def to_internal_value(self, data):
+        objetos = self.context.get("precarga", {}).get(self.get_queryset().model)
+        if objetos is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            return objetos[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
 class ClaseCreateItemSerializer(serializers.ModelSerializer):
+    serializer_related_field = _PkPrecargado
+
     class Meta:
         model = Clase
         fields = (
@@ -203,15 +225,35 @@ class ClaseCreateItemSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             "docente": {"required": False, "allow_null": True},
         }
+        # la unicidad (grupo, día, bloque) se valida en la vista, en memoria y para todo el lote
+        validators = []
 
 
 class ClaseBulkCreateRequestSerializer(serializers.Serializer):
     items = ClaseCreateItemSerializer(many=True)
 
+    # FK de cada ítem que se precargan con una consulta por modelo (no una por ítem)
+    RELACIONES = ("grupo", "bloque_inicio", "ambiente", "docente")
+
+    def to_internal_value(self, data):
+        items = data.get("items") if isinstance(data, dict) else None
+        if isinstance(items, list):
+            precarga = {}
+            for campo in self.RELACIONES:
+                modelo = Clase._meta.get_field(campo).related_model
+                ids = set()
+                for it in items:
+                    v = it.get(campo) if isinstance(it, dict) else None
+                    if isinstance(v, (int, str)) and not isinstance(v, bool) and str(v).isdigit():
+                        ids.add(int(v))
+                precarga[modelo] = modelo.objects.in_bulk(ids)
+            self._context["precarga"] = precarga
+        return super().to_internal_value(data)
+
 
 class ClaseBulkUpdateItemSerializer(serializers.Serializer):
     id = serializers.IntegerField()
-    set = serializers.DictField(child=serializers.JSONField())
+    set = serializers.DictField(child=serializers.JSONField(allow_null=True))
 
     def validate_set(self, value):
         allowed = {
@@ -226,6 +268,7 @@ class ClaseBulkUpdateItemSerializer(serializers.Serializer):
 
 class ClaseBulkUpdateRequestSerializer(serializers.Serializer):
     updates = ClaseBulkUpdateItemSerializer(many=True)
+    motivo = serializers.CharField(required=False, allow_blank=True, default="", max_length=255)
 
 
 class ClaseBulkDeleteRequestSerializer(serializers.Serializer):
@@ -1,4 +1,5 @@
-from typing import List, Dict, Any
+import copy
+from typing import List, Dict, Any, Optional
 
 from django.db import transaction, IntegrityError
 from django.db.models import Sum, F, Case, When, IntegerField, ExpressionWrapper, Value, FloatField, Q
@@ -15,7 +16,13 @@ from drf_spectacular.utils import (
 )
 
 from academics.models import Grupo
-from scheduling.models import Calendario, Clase
+from facilities.models import Ambiente
+from notifications.utils import notify_cambios_grupo
+from scheduling.cargas import recalcular_al_confirmar
+from scheduling.models import Bloque, Calendario, CambioHorario, Clase, DiaSemana
+from scheduling.ocupacion import invalidar_calendario
+from scheduling.validacion_lote import OcupacionLote, detalle, motivo, ref_item
+from users.models import Docente
 from .clases_serializers import (
     GrupoPlanificacionSerializer,
     ClaseDetailSerializer,
@@ -69,7 +76,7 @@ class GrupoPlanificacionListAPIView(APIView):
                 return Response({"detail": "calendario inválido."}, status=400)
             # alineamos por periodo, pero NO filtramos por clases aquí
             qs = qs.filter(periodo_id=cal.periodo_id)
-            cal_q = Q(clases__bloque_inicio__calendario_id=cal.id)
+            cal_q = Q(clases__calendario_id=cal.id)
 
         tol_q = Q()
         if tolerancia_min:
@@ -208,6 +215,129 @@ class ClasesDeGrupoListAPIView(APIView):
         return Response(ser.data, status=status.HTTP_200_OK)
 
 
+def _plano(data: Dict[str, Any]) -> Dict[str, Any]:
+    # datos validados del ítem con las FK como ids (para devolverlos en el conflicto)
+    return {k: getattr(v, "pk", v) for k, v in data.items()}
+
+
+def _conflicto(idx: int, motivos: List[dict], data: Dict[str, Any]) -> Dict[str, Any]:
+    return {"index": idx, "tipo": motivos[0]["tipo"], "detail": detalle(motivos), "motivos": motivos,
+            "data": _plano(data)}
+
+
+# campos de `set` que son FK (el valor es el id) -> queryset con el que se precargan
+_FKS = {
+    "grupo": Grupo.objects.select_related("asignatura"),
+    "bloque_inicio": Bloque.objects.all(),
+    "ambiente": Ambiente.objects.all(),
+    "docente": Docente.objects.all(),
+}
+# cambios que quedan registrados en CambioHorario
+_CAMPOS_HISTORIAL = ("day_of_week", "bloque_inicio_id", "bloques_duracion", "ambiente_id", "docente_id")
+
+
+def _como_entero(valor) -> Optional[int]:
+    if isinstance(valor, bool):
+        return None
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, str) and valor.strip().isdigit():
+        return int(valor)
+    return None
+
+
+def _precargar_fks(updates: List[Dict[str, Any]]) -> Dict[str, Dict[int, Any]]:
+    ids: Dict[str, set] = {campo: set() for campo in _FKS}
+    for up in updates:
+        for campo in _FKS:
+            pk = _como_entero(up["set"].get(campo))
+            if pk is not None:
+                ids[campo].add(pk)
+    return {campo: qs.in_bulk(ids[campo]) for campo, qs in _FKS.items()}
+
+
+def _aplicar_cambios(obj: Clase, cambios: Dict[str, Any], precarga: Dict[str, Dict[int, Any]]) -> Optional[str]:
+    """
+    Aplica `set` sobre la instancia (sin guardar). Devuelve el error o None.
+    """
+    for campo, valor in cambios.items():
+        if campo in precarga:
+            if valor is None and campo == "docente":
+                obj.docente = None
+                continue
+            rel = precarga[campo].get(_como_entero(valor))
+            if rel is None:
+                return f"{campo}: no existe {valor!r}."
+            setattr(obj, campo, rel)
+        elif campo == "day_of_week":
+            if _como_entero(valor) not in DiaSemana.values:
+                return "day_of_week debe estar entre 1 y 7."
+            obj.day_of_week = _como_entero(valor)
+        elif campo == "bloques_duracion":
+            if not _como_entero(valor):
+                return "bloques_duracion debe ser >= 1."
+            obj.bloques_duracion = _como_entero(valor)
+        else:
+            opciones = Clase.Tipo.values if campo == "tipo" else Clase.Estado.values
+            if valor not in opciones:
+                return f"{campo} inválido: {valor!r}."
+            setattr(obj, campo, valor)
+    return None
+
+
+def _rechazo(cid: int, motivos: List[dict]) -> Dict[str, Any]:
+    return {"id": cid, "tipo": motivos[0]["tipo"], "detail": detalle(motivos), "motivos": motivos}
+
+
+def _franja(c: Clase) -> tuple:
+    # lugar en la grilla, sin los recursos asignados
+    return (c.grupo_id, c.day_of_week, c.bloque_inicio_id, c.bloques_duracion)
+
+
+def _posicion(c: Clase) -> tuple:
+    # lo que cuenta para la ocupación (si no cambia, no hace falta validar conflictos)
+    return (c.grupo_id, c.day_of_week, c.bloque_inicio_id, c.bloques_duracion, c.docente_id, c.ambiente_id,
+            c.estado == Clase.Estado.CANCELADO)
+
+
+# desplazamiento de day_of_week para estacionar filas fuera de cualquier clave real
+_DIA_ESTACIONADO = 100
+
+
+def _clave_unica(c: Clase) -> tuple:
+    return (c.grupo_id, c.day_of_week, c.bloque_inicio_id)
+
+
+def _estacionadas(updated: List[Clase], antes: Dict[int, Clase]) -> List[Clase]:
+    """
+    Filas del lote cuya clave única actual es la nueva clave de otra fila del lote (p.ej. un
+    intercambio de bloques). La unicidad se verifica fila a fila dentro del UPDATE, así que esas
+    filas se mueven antes a una clave libre: mismo grupo y bloque, día + _DIA_ESTACIONADO.
+    """
+    nuevas = {_clave_unica(c): c.pk for c in updated}
+    return [
+        Clase(pk=c.pk, day_of_week=antes[c.pk].day_of_week + _DIA_ESTACIONADO)
+        for c in updated
+        if nuevas.get(_clave_unica(antes[c.pk]), c.pk) != c.pk
+    ]
+
+
+def _reprogramada(antes: Clase, despues: Clase) -> bool:
+    return any(getattr(antes, f) != getattr(despues, f) for f in _CAMPOS_HISTORIAL)
+
+
+def _cambio(antes: Clase, despues: Clase, usuario, motivo: str) -> CambioHorario:
+    return CambioHorario(
+        clase=despues, usuario=usuario if usuario.is_authenticated else None, motivo=motivo,
+        old_day_of_week=antes.day_of_week, old_bloque_inicio_id=antes.bloque_inicio_id,
+        old_bloques_duracion=antes.bloques_duracion, old_ambiente_id=antes.ambiente_id,
+        old_docente_id=antes.docente_id,
+        new_day_of_week=despues.day_of_week, new_bloque_inicio_id=despues.bloque_inicio_id,
+        new_bloques_duracion=despues.bloques_duracion, new_ambiente_id=despues.ambiente_id,
+        new_docente_id=despues.docente_id,
+    )
+
+
 class ClasesBulkCreateAPIView(APIView):
     """
     Crea múltiples clases en bloque. **`docente` es opcional** (se admite omitir o `null`).
@@ -219,7 +349,10 @@ class ClasesBulkCreateAPIView(APIView):
         summary="Creación masiva de clases",
         description=(
             "Crea varias clases en una sola operación. "
-            "Respeta la restricción única (grupo, day_of_week, bloque_inicio). "
+            "Cada ítem se valida en memoria contra la ocupación de su calendario y contra los ítems "
+            "anteriores del pedido; los aceptados se insertan juntos. Cada conflicto trae `tipo` "
+            "(DUPLICADO = misma (grupo, day_of_week, bloque_inicio); GRUPO / DOCENTE / AMBIENTE = solape) "
+            "y `motivos` con la clase existente (`clase`) o el ítem del pedido (`index`) con el que choca. "
             "**Campo `docente` es opcional** y puede omitirse si el grupo no tiene docente."
         ),
         request=ClaseBulkCreateRequestSerializer,
@@ -239,15 +372,38 @@ class ClasesBulkCreateAPIView(APIView):
         ser.is_valid(raise_exception=True)
         items = ser.validated_data["items"]
 
-        created_objs = []
-        conflicts = []
+        cal_ids = {data["bloque_inicio"].calendario_id for data in items}
+        # serializa las altas masivas sobre los mismos calendarios mientras se valida la foto
+        list(Calendario.objects.select_for_update().filter(id__in=cal_ids).values_list("id", flat=True))
+        ocupacion = OcupacionLote(cal_ids)
 
+        aceptadas = []
+        conflicts = []
         for idx, data in enumerate(items):
+            obj = Clase(**data)
+            motivos = ocupacion.reservar(ref_item(idx), obj)
+            if motivos:
+                conflicts.append(_conflicto(idx, motivos, data))
+            else:
+                aceptadas.append((idx, obj))
+
+        created_objs = [obj for _, obj in aceptadas]
+        if created_objs:
+            Clase.sincronizar_ubicacion(created_objs)
             try:
-                obj = Clase.objects.create(**data)
-                created_objs.append(obj)
+                with transaction.atomic():
+                    Clase.objects.bulk_create(created_objs, batch_size=500)
             except IntegrityError as e:
-                conflicts.append({"index": idx, "detail": str(e), "data": data})
+                # otra escritura ocupó la misma clave entre la foto y el insert: no se guarda nada
+                conflicts.extend({"index": idx, "tipo": "CONCURRENTE", "detail": str(e), "motivos": [],
+                                  "data": _plano(items[idx])} for idx, _ in aceptadas)
+                conflicts.sort(key=lambda c: c["index"])
+                created_objs = []
+            else:
+                # bulk_create no dispara señales: índice de ocupación y cargas a mano
+                for cal_id in {obj.bloque_inicio.calendario_id for obj in created_objs}:
+                    transaction.on_commit(lambda c=cal_id: invalidar_calendario(c))
+                recalcular_al_confirmar(docente_ids={obj.docente_id for obj in created_objs if obj.docente_id})
 
         resp = {
             "created": len(created_objs),
@@ -263,6 +419,8 @@ class ClasesBulkCreateAPIView(APIView):
 class ClasesBulkUpdateAPIView(APIView):
     """
     Actualiza múltiples clases en bloque (parcial, vía `updates[].set`).
+    Bloquea todas las filas en una consulta, valida contra una sola foto de ocupación, guarda con un
+    bulk_update de los campos tocados y deja el historial en CambioHorario; avisa una vez por grupo.
     """
 
     # permission_classes = [IsAuthenticated]
@@ -285,35 +443,128 @@ class ClasesBulkUpdateAPIView(APIView):
         ser = ClaseBulkUpdateRequestSerializer(data=request.data)
         ser.is_valid(raise_exception=True)
         updates: List[Dict[str, Any]] = ser.validated_data["updates"]
+        motivo_txt = ser.validated_data["motivo"]
 
-        updated = []
-        errors = []
+        # una consulta bloquea todas las filas; relaciones cargadas para historial y notificaciones
+        clases = {
+            c.pk: c for c in (Clase.objects.select_for_update(of=("self",))
+                              .select_related("bloque_inicio", "grupo__asignatura", "ambiente", "docente")
+                              .filter(pk__in={up["id"] for up in updates}))
+        }
+        precarga = _precargar_fks(updates)
+        ocupacion = OcupacionLote({c.bloque_inicio.calendario_id for c in clases.values()})
 
+        errors: Dict[int, Dict[str, Any]] = {}
+        repetidas = []
+        antes: Dict[int, Clase] = {}
+        campos: Dict[int, set] = {}
         for up in updates:
             cid = up["id"]
-            fields = up["set"]
-            try:
-                obj = Clase.objects.select_for_update().get(id=cid)
-            except Clase.DoesNotExist:
-                errors.append({"id": cid, "detail": "Clase no encontrada"})
+            obj = clases.get(cid)
+            if obj is None:
+                errors[cid] = {"id": cid, "detail": "Clase no encontrada"}
                 continue
-
-            for k, v in fields.items():
-                setattr(obj, k, v)
-
+            if cid in antes:
+                repetidas.append({"id": cid, "detail": "Clase repetida en el pedido."})
+                continue
+            antes[cid] = copy.copy(obj)
+            err = _aplicar_cambios(obj, up["set"], precarga)
+            if err is None and obj.bloque_inicio.calendario_id != antes[cid].bloque_inicio.calendario_id:
+                err = "El bloque pertenece a otro calendario."
+            if err:
+                errors[cid] = {"id": cid, "detail": err}
+                continue
+            campos[cid] = set(up["set"])
+
+        # validar contra una sola foto: primero se liberan todas las posiciones que cambian
+        mueven = {cid for cid in campos if _posicion(antes[cid]) != _posicion(clases[cid])}
+        for cid in mueven:
+            ocupacion.quitar(cid)
+        aceptadas: Dict[int, Clase] = {}
+
+        def rechazar(cid: int, motivos: List[dict]) -> None:
+            # la clase vuelve a su posición previa; las aceptadas que la pisan también se rechazan
+            pendientes = [(cid, motivos)]
+            while pendientes:
+                cid, motivos = pendientes.pop()
+                aceptadas.pop(cid, None)
+                errors[cid] = _rechazo(cid, motivos)
+                ocupacion.quitar(cid)
+                for m in ocupacion.conflictos(cid, antes[cid]):
+                    otra = m.get("clase")
+                    if otra in aceptadas and otra in mueven:
+                        aceptadas.pop(otra)
+                        pendientes.append((otra, [motivo(m["tipo"], cid)]))
+                ocupacion.registrar(cid, antes[cid])
+
+        # primero las que no cambian de franja (sólo docente/ambiente/estado): que una que se muda
+        # a su lugar no las desplace
+        for cid in sorted(campos, key=lambda c: _franja(antes[c]) != _franja(clases[c])):
+            obj = clases[cid]
+            motivos = ocupacion.reservar(cid, obj) if cid in mueven else []
+            if motivos:
+                rechazar(cid, motivos)
+            else:
+                aceptadas[cid] = obj
+
+        # la cascada pudo devolver clases a su lugar previo y liberar posiciones: revalidar las
+        # rechazadas contra la foto final hasta que nada cambie (los motivos quedan los de esa foto)
+        cambio = True
+        while cambio:
+            cambio = False
+            for cid in [c for c in campos if c in errors]:
+                motivos = ocupacion.conflictos(cid, clases[cid])
+                if motivos:
+                    errors[cid] = _rechazo(cid, motivos)
+                    continue
+                ocupacion.registrar(cid, clases[cid])
+                aceptadas[cid] = clases[cid]
+                del errors[cid]
+                cambio = True
+        aceptadas = {cid: aceptadas[cid] for cid in campos if cid in aceptadas}
+
+        updated = list(aceptadas.values())
+        historial = [_cambio(antes[c.pk], c, request.user, motivo_txt) for c in updated if _reprogramada(antes[c.pk], c)]
+        if updated:
+            tocados = set().union(*(campos[c.pk] for c in updated))
+            # columnas desnormalizadas (bulk_update no pasa por save())
+            for campo in list(tocados):
+                tocados.update(Clase.DERIVADOS.get(campo, ()))
+            Clase.sincronizar_ubicacion(updated)
             try:
-                obj.save()
-                updated.append(obj)
+                with transaction.atomic():
+                    estacionadas = _estacionadas(updated, antes)
+                    if estacionadas:
+                        Clase.objects.bulk_update(estacionadas, ["day_of_week"], batch_size=500)
+                        tocados.add("day_of_week")  # el segundo paso las saca del día de estacionamiento
+                    Clase.objects.bulk_update(updated, sorted(tocados), batch_size=500)
+                    CambioHorario.objects.bulk_create(historial, batch_size=500)
             except IntegrityError as e:
-                errors.append({"id": cid, "detail": str(e)})
-
+                # otra escritura ocupó la misma clave entre la foto y el update: no se guarda nada
+                for c in updated:
+                    errors[c.pk] = {"id": c.pk, "tipo": "CONCURRENTE", "detail": str(e), "motivos": []}
+                updated = []
+            else:
+                # bulk_update no dispara señales: índice de ocupación, cargas y avisos a mano
+                for cal_id in {c.bloque_inicio.calendario_id for c in updated}:
+                    transaction.on_commit(lambda c=cal_id: invalidar_calendario(c))
+                recalcular_al_confirmar(docente_ids={d for c in updated
+                                                     for d in (c.docente_id, antes[c.pk].docente_id) if d})
+                movidas = [h.clase for h in historial]
+                notify_cambios_grupo(
+                    movidas, titulo="Clase reprogramada", motivo=motivo_txt,
+                    docentes_anteriores={c.pk: antes[c.pk].docente for c in movidas
+                                         if antes[c.pk].docente_id != c.docente_id},
+                )
+
+        orden = list(dict.fromkeys(up["id"] for up in updates))
         resp = {
             "updated": len(updated),
             "items": ClaseDetailSerializer(updated, many=True).data,
-            "errors": errors,
+            "errors": [errors[cid] for cid in orden if cid in errors] + repetidas,
         }
 
-        if len(updated) == 0 and errors:
+        if len(updated) == 0 and resp["errors"]:
             return Response(resp, status=status.HTTP_409_CONFLICT)
         return Response(resp, status=status.HTTP_200_OK)
 
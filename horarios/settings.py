@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -91,6 +92,27 @@ DATABASES = {
 }
 
 
+# Cache compartida entre procesos (web, jobs_worker, notifications_flush): guarda las respuestas de la
+# grilla y los contadores de no leídas (las versiones de calendario van en la base, VersionDatos). Con REDIS_URL usa Redis
+# (requiere el paquete redis); si no, la base de datos (crear la tabla: python manage.py createcachetable).
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -177,6 +199,13 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = [
+    "X-Conflictos-Nuevos",
+    "X-Conflictos-Mantenidos",
+    "X-Conflictos-Cerrados",
+    "X-Cache",
+    "X-Next-Cursor",
+]
 CSRF_TRUSTED_ORIGINS = ["http://localhost:5173", "http://localhost:3000"]
 
 # LOGIN CONFIG
@@ -0,0 +1,204 @@
+"""
+Pub/sub de eventos para el stream SSE (notifications.views_stream).
+Canales: "usuario:<id>" (notificaciones nuevas) y "calendario:<id>" (cambió la versión del horario).
+- publicar() es síncrono, se puede llamar desde cualquier hilo y entrega al confirmar la transacción.
+- El backend (settings.NOTIFICATIONS_BUS_BACKEND) define el alcance:
+  BusLocal: sólo suscriptores del mismo proceso; alcanza con un único worker ASGI y nada más publicando.
+  BusCache: a través de la cache de Django compartida, así que también llega lo que publican
+  jobs_worker o notifications_flush. Es el default cuando la cache es compartida (ocupacion.cache_compartida).
+"""
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# eventos que se guardan por suscriptor si el cliente no lee; los más nuevos se descartan
+COLA_MAX = 200
+
+
+class Suscripcion:
+    """
+    Cola de eventos de un cliente conectado, atada al event loop que la creó.
+    """
+
+    def __init__(self, canales: Iterable[str]):
+        self.canales = frozenset(canales)
+        self._loop = asyncio.get_running_loop()
+        self._cola: asyncio.Queue = asyncio.Queue(maxsize=COLA_MAX)
+
+    def entregar(self, canal: str, evento: dict) -> None:
+        # puede llamarse desde otro hilo: encolar dentro del loop del suscriptor
+        self._loop.call_soon_threadsafe(self._poner, canal, evento)
+
+    def _poner(self, canal, evento):
+        try:
+            self._cola.put_nowait((canal, evento))
+        except asyncio.QueueFull:
+            pass  # cliente lento: al reconectar recupera por Last-Event-ID / versión
+
+    async def siguiente(self, timeout: float):
+        """
+        (canal, evento) o None si no llegó nada en `timeout` segundos.
+        """
+        try:
+            return await asyncio.wait_for(self._cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class BusLocal:
+    """
+    Entrega en memoria a las suscripciones de este proceso.
+    """
+
+    def __init__(self):
+        self._subs: Dict[str, Set[Suscripcion]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def suscribir(self, canales: Iterable[str]) -> Suscripcion:
+        sub = Suscripcion(canales)
+        with self._lock:
+            for canal in sub.canales:
+                self._subs[canal].add(sub)
+        return sub
+
+    def cancelar(self, sub: Suscripcion) -> None:
+        with self._lock:
+            for canal in sub.canales:
+                subs = self._subs.get(canal)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subs[canal]
+
+    def canales_activos(self) -> List[str]:
+        with self._lock:
+            return list(self._subs)
+
+    def _entregar_local(self, canal: str, evento: dict) -> None:
+        with self._lock:
+            subs = list(self._subs.get(canal, ()))
+        for sub in subs:
+            sub.entregar(canal, evento)
+
+    def publicar(self, canal: str, evento: dict) -> None:
+        self._entregar_local(canal, evento)
+
+
+class BusCache(BusLocal):
+    """
+    Cada canal es una secuencia en la cache (`bus:<canal>:seq`) más un evento por número,
+    con TTL corto. Un hilo por proceso consulta las secuencias de los canales con suscriptores
+    locales (un get_many cada NOTIFICATIONS_BUS_INTERVALO segundos) y reparte lo nuevo.
+    Requiere una cache compartida entre procesos; con LocMem se comporta como BusLocal con retardo.
+    """
+    TTL = 120
+
+    def __init__(self):
+        super().__init__()
+        self.intervalo = float(getattr(settings, "NOTIFICATIONS_BUS_INTERVALO", 1.0))
+        self._vistos: Dict[str, int] = {}
+        self._hilo: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _clave_seq(canal: str) -> str:
+        return f"bus:{canal}:seq"
+
+    def publicar(self, canal: str, evento: dict) -> None:
+        key = self._clave_seq(canal)
+        cache.add(key, 0, None)
+        try:
+            seq = cache.incr(key)
+        except ValueError:  # expulsada entre add e incr
+            cache.set(key, 1, None)
+            seq = 1
+        cache.set(f"bus:{canal}:{seq}", evento, self.TTL)
+
+    def suscribir(self, canales: Iterable[str]) -> Suscripcion:
+        sub = super().suscribir(canales)
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._sondear, name="bus-cache", daemon=True)
+                self._hilo.start()
+        return sub
+
+    def _sondear(self) -> None:
+        while True:
+            try:
+                self._sondear_una_vez()
+            except Exception:
+                pass  # cache caída: reintentar en la próxima vuelta
+            time.sleep(self.intervalo)
+
+    def _sondear_una_vez(self) -> None:
+        canales = self.canales_activos()
+        for canal in list(self._vistos):
+            if canal not in canales:
+                del self._vistos[canal]
+        if not canales:
+            return
+        seqs = cache.get_many([self._clave_seq(c) for c in canales])
+        pedir = {}
+        for canal in canales:
+            actual = seqs.get(self._clave_seq(canal), 0)
+            visto = self._vistos.setdefault(canal, actual)  # canal nuevo: desde ahora, sin repetir
+            for n in range(max(visto + 1, actual - COLA_MAX + 1), actual + 1):
+                pedir[f"bus:{canal}:{n}"] = canal
+            self._vistos[canal] = actual
+        if not pedir:
+            return
+        eventos = cache.get_many(list(pedir))
+        # en orden de publicación por canal
+        for key in sorted(eventos, key=lambda k: (pedir[k], int(k.rsplit(":", 1)[1]))):
+            self._entregar_local(pedir[key], eventos[key])
+
+
+def _backend_por_defecto() -> str:
+    # con LocMem lo publicado en otro proceso no llegaría nunca: BusCache sólo si la cache es compartida
+    from scheduling.ocupacion import cache_compartida
+    return "notifications.bus.BusCache" if cache_compartida() else "notifications.bus.BusLocal"
+
+
+_BUS = None
+_BUS_LOCK = threading.Lock()
+
+
+def bus() -> BusLocal:
+    global _BUS
+    if _BUS is None:
+        with _BUS_LOCK:
+            if _BUS is None:
+                ruta = getattr(settings, "NOTIFICATIONS_BUS_BACKEND", None) or _backend_por_defecto()
+                _BUS = import_string(ruta)()
+    return _BUS
+
+
+def publicar(canal: str, evento: dict) -> None:
+    """
+    Publica al confirmar la transacción en curso (o ya, si no hay). Nunca falla la escritura que lo origina.
+    """
+    def _enviar():
+        try:
+            bus().publicar(canal, evento)
+        except Exception:
+            pass  # el stream es best-effort: los clientes se resincronizan al reconectar
+    transaction.on_commit(_enviar)
+
+
+def publicar_notificaciones(notificaciones: Iterable) -> None:
+    """
+    Un evento "notificacion" por fila creada, al canal de su usuario.
+    """
+    from notifications.serializers import NotificacionModelSerializer
+    for n in notificaciones:
+        publicar(f"usuario:{n.usuario_id}", {"tipo": "notificacion", **NotificacionModelSerializer(n).data})
+
+
+def publicar_version_calendario(calendario_id: int, version: int) -> None:
+    publicar(f"calendario:{calendario_id}", {"tipo": "calendario", "calendario": calendario_id, "version": version})
@@ -0,0 +1,61 @@
+"""
+Contador de no leídas por usuario en la cache de Django.
+Se calcula con un COUNT sobre el índice (usuario, leida, creada_en) cuando falta y se mantiene así:
+- al crear notificaciones se borra la clave de los destinatarios (un delete_many por lote);
+- al marcar leídas se descuenta (con Redis/Memcached; con otros backends se borra la clave) o se deja en 0.
+Con una cache por proceso (LocMem/Dummy) no se cachea: cada consulta cuenta en la base.
+"""
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+
+from notifications.models import Notificacion
+from scheduling.ocupacion import cache_compartida
+
+TTL_CONTADOR = getattr(settings, "NOTIFICATIONS_CONTADOR_TTL", 60 * 60)
+# backends cuyo decr es atómico en el servidor
+_DECR_ATOMICO = (RedisCache, BaseMemcachedCache)
+
+
+def _clave(usuario_id: int) -> str:
+    return f"notifications:no_leidas:{usuario_id}"
+
+
+def no_leidas(usuario_id: int) -> int:
+    if not cache_compartida():
+        return Notificacion.objects.filter(usuario_id=usuario_id, leida=False).count()
+    n = cache.get(_clave(usuario_id))
+    if n is None:
+        n = Notificacion.objects.filter(usuario_id=usuario_id, leida=False).count()
+        cache.set(_clave(usuario_id), n, TTL_CONTADOR)
+    return n
+
+
+def invalidar(usuarios: Iterable[int]) -> None:
+    claves = [_clave(uid) for uid in set(usuarios)]
+    if claves and cache_compartida():
+        # al confirmar: un conteo concurrente antes del commit dejaría cacheado el valor viejo
+        transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+def descontar(usuario_id: int, n: int = 1) -> None:
+    if not cache_compartida():
+        return
+    if not isinstance(caches["default"], _DECR_ATOMICO):
+        # DatabaseCache y similares hacen get + set: dos descuentos simultáneos pisarían uno al otro
+        invalidar([usuario_id])
+        return
+    try:
+        if cache.decr(_clave(usuario_id), n) < 0:
+            cache.delete(_clave(usuario_id))
+    except ValueError:
+        pass  # no estaba cacheado: se contará en la próxima consulta
+
+
+def en_cero(usuario_id: int) -> None:
+    if cache_compartida():
+        cache.set(_clave(usuario_id), 0, TTL_CONTADOR)
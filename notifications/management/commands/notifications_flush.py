@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from notifications import outbox
+
+
+class Command(BaseCommand):
+    help = "Entrega a la bandeja las notificaciones acumuladas en el outbox cuya ventana venció."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=500, help="Filas por transacción (default 500).")
+        parser.add_argument("--intervalo", type=float, default=5.0, help="Segundos entre pasadas.")
+        parser.add_argument("--una-vez", action="store_true", help="Vacía lo vencido y termina.")
+        parser.add_argument("--digest", action="store_true", default=None,
+                            help="Además envía un email resumen a quienes lo tengan activado.")
+
+    def handle(self, *args, **opts):
+        lote = max(1, opts["lote"])
+        while True:
+            # lotes seguidos mientras haya trabajo; luego esperar
+            while True:
+                res = outbox.vaciar(lote=lote, digest=opts["digest"])
+                if res["procesadas"]:
+                    self.stdout.write(
+                        f"{res['procesadas']} procesadas, {res['in_app']} a la bandeja, {res['emails']} emails"
+                    )
+                if res["procesadas"] < lote:
+                    break
+            if opts["una_vez"]:
+                break
+            connections.close_all()
+            time.sleep(opts["intervalo"])
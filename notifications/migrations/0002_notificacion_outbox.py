@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+        ('scheduling', '0005_job_tipo_notificacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacionOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('titulo', models.CharField(max_length=160)),
+                ('mensaje', models.TextField()),
+                ('eventos', models.PositiveIntegerField(default=1)),
+                ('creada_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actualizada_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('enviar_desde', models.DateTimeField()),
+                ('clase', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notificaciones_pendientes', to='scheduling.clase')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones_pendientes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Notificación pendiente',
+                'verbose_name_plural': 'Notificaciones pendientes',
+                'indexes': [models.Index(fields=['enviar_desde'], name='notificatio_enviar__b192c0_idx'), models.Index(fields=['clase', 'usuario'], name='notificatio_clase_i_a6491f_idx')],
+            },
+        ),
+    ]
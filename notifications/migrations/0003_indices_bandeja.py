@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notificacion_outbox'),
+        ('scheduling', '0005_job_tipo_notificacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', 'creada_en', 'id'], name='notificatio_usuario_7815fe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['usuario', 'leida', 'creada_en'], name='notificatio_usuario_bc6f1a_idx'),
+        ),
+    ]
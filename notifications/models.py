@@ -23,6 +23,42 @@ class Notificacion(models.Model):
         verbose_name = "Notificación"
         verbose_name_plural = "Notificaciones"
         ordering = ("-creada_en",)
+        indexes = [
+            # bandeja paginada por cursor (creada_en, id) y conteo de no leídas
+            models.Index(fields=["usuario", "creada_en", "id"]),
+            models.Index(fields=["usuario", "leida", "creada_en"]),
+        ]
 
     def __str__(self):
         return f"{self.titulo} → {self.usuario.username}"
+
+
+class NotificacionOutbox(models.Model):
+    """
+    Notificación pendiente de entregar (ver notifications.outbox). Los cambios de una misma clase
+    para un mismo usuario dentro de la ventana se acumulan en una sola fila.
+    """
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="notificaciones_pendientes"
+    )
+    clase = models.ForeignKey(
+        "scheduling.Clase", on_delete=models.SET_NULL, null=True, blank=True, related_name="notificaciones_pendientes"
+    )
+
+    titulo = models.CharField(max_length=160)
+    mensaje = models.TextField()
+    eventos = models.PositiveIntegerField(default=1)  # cambios acumulados
+    creada_en = models.DateTimeField(default=timezone.now)
+    actualizada_en = models.DateTimeField(default=timezone.now)
+    enviar_desde = models.DateTimeField()  # fin de la ventana de acumulación
+
+    class Meta:
+        verbose_name = "Notificación pendiente"
+        verbose_name_plural = "Notificaciones pendientes"
+        indexes = [
+            models.Index(fields=["enviar_desde"]),
+            models.Index(fields=["clase", "usuario"]),
+        ]
+
+    def __str__(self):
+        return f"{self.titulo} → {self.usuario_id} (x{self.eventos})"
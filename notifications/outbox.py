@@ -0,0 +1,124 @@
+"""
+Etapa intermedia entre los cambios de clase y la bandeja (Notificacion).
+- encolar(): una fila pendiente por (usuario, clase); los cambios dentro de la ventana
+  (settings.NOTIFICATIONS_VENTANA_S) reemplazan título/mensaje y suman `eventos`.
+- vaciar(): pasa a Notificacion las filas vencidas, por lotes, según las preferencias de cada
+  usuario (profile.permisos["notifications"], ver users.views_prefs). En modo digest, además manda
+  un email por usuario con lo entregado, usando NOTIFICATIONS_EMAIL_BACKEND (o EMAIL_BACKEND).
+Lo corre `python manage.py notifications_flush`.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from notifications import bus, contador
+from notifications.models import Notificacion, NotificacionOutbox
+from users.models import UserProfile
+
+PREFS_DEFAULT = {"in_app": True, "email": False, "push": False}
+
+
+def ventana() -> int:
+    """
+    Segundos de acumulación. 0 (default) = sin outbox, se escribe directo en Notificacion.
+    """
+    return int(getattr(settings, "NOTIFICATIONS_VENTANA_S", 0))
+
+
+def preferencias(usuarios: Iterable[int]) -> Dict[int, dict]:
+    """
+    {user_id: prefs} en una consulta; sin perfil o sin prefs guardadas => PREFS_DEFAULT.
+    """
+    out = {uid: PREFS_DEFAULT for uid in usuarios}
+    for uid, permisos in UserProfile.objects.filter(user_id__in=out).values_list("user_id", "permisos"):
+        prefs = permisos.get("notifications") if isinstance(permisos, dict) else None
+        if isinstance(prefs, dict):
+            out[uid] = {**PREFS_DEFAULT, **prefs}
+    return out
+
+
+def encolar(usuarios: List[int], clase_id: Optional[int], titulo: str, mensaje: str, ahora=None) -> int:
+    """
+    Registra el evento para `usuarios`. Devuelve cuántas filas nuevas se crearon.
+    """
+    ahora = ahora or timezone.now()
+    usuarios = list(dict.fromkeys(usuarios))
+    existentes = set()
+    if clase_id is not None:
+        # sólo se acumula en filas cuya ventana sigue abierta: las vencidas pueden estar vaciándose
+        abiertas = NotificacionOutbox.objects.filter(clase_id=clase_id, usuario_id__in=usuarios, enviar_desde__gt=ahora)
+        existentes = set(abiertas.values_list("usuario_id", flat=True))
+        if existentes:
+            abiertas.filter(usuario_id__in=existentes).update(
+                titulo=titulo, mensaje=mensaje, eventos=F("eventos") + 1, actualizada_en=ahora,
+            )
+    enviar_desde = ahora + timedelta(seconds=ventana())
+    nuevas = [
+        NotificacionOutbox(usuario_id=uid, clase_id=clase_id, titulo=titulo, mensaje=mensaje,
+                           creada_en=ahora, actualizada_en=ahora, enviar_desde=enviar_desde)
+        for uid in usuarios if uid not in existentes
+    ]
+    NotificacionOutbox.objects.bulk_create(nuevas, batch_size=500)
+    return len(nuevas)
+
+
+def vaciar(lote: int = 500, digest: Optional[bool] = None, ahora=None) -> Dict[str, int]:
+    """
+    Entrega un lote de filas vencidas. Devuelve {"procesadas", "in_app", "emails"}.
+    """
+    ahora = ahora or timezone.now()
+    if digest is None:
+        digest = getattr(settings, "NOTIFICATIONS_DIGEST", False)
+
+    with transaction.atomic():
+        # skip_locked: varios flush en paralelo no se pisan (se ignora en SQLite)
+        filas = list(NotificacionOutbox.objects.select_for_update(skip_locked=True)
+                     .filter(enviar_desde__lte=ahora).order_by("id")[:lote])
+        if not filas:
+            return {"procesadas": 0, "in_app": 0, "emails": 0}
+        prefs = preferencias({f.usuario_id for f in filas})
+        bandeja = [
+            Notificacion(usuario_id=f.usuario_id, clase_id=f.clase_id, titulo=f.titulo,
+                         mensaje=f.mensaje, creada_en=f.actualizada_en)
+            for f in filas if prefs[f.usuario_id]["in_app"]
+        ]
+        Notificacion.objects.bulk_create(bandeja, batch_size=lote)
+        NotificacionOutbox.objects.filter(pk__in=[f.pk for f in filas]).delete()
+    contador.invalidar(n.usuario_id for n in bandeja)
+    bus.publicar_notificaciones(bandeja)
+
+    emails = _enviar_digest(filas, prefs) if digest else 0
+    return {"procesadas": len(filas), "in_app": len(bandeja), "emails": emails}
+
+
+def _enviar_digest(filas: List[NotificacionOutbox], prefs: Dict[int, dict]) -> int:
+    """
+    Un email por usuario con email=True, con todas sus notificaciones del lote.
+    """
+    por_usuario = defaultdict(list)
+    for f in filas:
+        if prefs[f.usuario_id]["email"]:
+            por_usuario[f.usuario_id].append(f)
+    if not por_usuario:
+        return 0
+    correos = dict(get_user_model().objects.filter(pk__in=por_usuario).exclude(email="")
+                   .values_list("pk", "email"))
+    mensajes = [
+        EmailMessage(
+            subject=f"Cambios en tu horario ({len(items)})",
+            body="\n".join(f"- {f.titulo}: {f.mensaje}" for f in items),
+            to=[correos[uid]],
+        )
+        for uid, items in por_usuario.items() if uid in correos
+    ]
+    if not mensajes:
+        return 0
+    conexion = get_connection(getattr(settings, "NOTIFICATIONS_EMAIL_BACKEND", None), fail_silently=True)
+    return conexion.send_messages(mensajes) or 0
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from notifications.models import Notificacion
+from . import bus, contador
+
+
+# altas sueltas y bajas; los bulk_create invalidan y publican explícitamente (utils/outbox) y las vistas
+# que marcan leídas ajustan el contador ellas mismas
+@receiver(post_save, sender=Notificacion)
+def notificacion_creada(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        contador.invalidar([instance.usuario_id])
+        bus.publicar_notificaciones([instance])
+
+
+@receiver(post_delete, sender=Notificacion)
+def notificacion_borrada(sender, instance, **kwargs):
+    contador.invalidar([instance.usuario_id])
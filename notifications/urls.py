@@ -1,7 +1,14 @@
 from django.urls import path
-from .views import notificaciones_list_view, notificaciones_marcar_leida_view
+from .views import (
+    notificaciones_list_view, notificaciones_marcar_leida_view,
+    notificaciones_marcar_todas_view, notificaciones_no_leidas_view,
+)
+from .views_stream import stream_view
 
 urlpatterns = [
     path("", notificaciones_list_view),
     path("<int:pk>/read/", notificaciones_marcar_leida_view),
+    path("read-all/", notificaciones_marcar_todas_view),
+    path("unread-count/", notificaciones_no_leidas_view),
+    path("stream/", stream_view),
 ]
@@ -1,31 +1,87 @@
+from django.conf import settings
+from django.db import transaction
+
+from notifications import bus, contador, outbox
 from notifications.models import Notificacion
 from academics.models import Inscripcion
-from django.contrib.auth import get_user_model
-
-User = get_user_model()
-
-def notify_cambio_clase(clase, titulo: str, motivo: str = "", docente_anterior=None):
-    """Crea notificaciones in-app para usuarios afectados."""
-    grupo = clase.grupo
-    # estudiantes del grupo
-    estudiantes = Inscripcion.objects.filter(grupo=grupo).select_related("estudiante__user")
-    for ins in estudiantes:
-        Notificacion.objects.create(
-            usuario=ins.estudiante.user, clase=clase,
-            titulo=titulo, mensaje=_build_msg(clase, motivo)
-        )
-    # docente actual
-    if getattr(clase, "docente", None) and clase.docente.user_id:
-        Notificacion.objects.create(
-            usuario=clase.docente.user, clase=clase,
-            titulo=titulo, mensaje=_build_msg(clase, motivo)
-        )
-    # docente anterior (si cambió)
-    if docente_anterior and docente_anterior.user_id:
-        Notificacion.objects.create(
-            usuario=docente_anterior.user, clase=clase,
-            titulo=titulo, mensaje=_build_msg(clase, motivo)
-        )
+from scheduling.jobs import encolar
+from scheduling.models import Clase, Job
+
+
+def notify_cambio_clase(clase, titulo: str, motivo: str = "", docente_anterior=None, diferido=None):
+    """
+    Crea notificaciones in-app para usuarios afectados (estudiantes del grupo, docente actual y anterior).
+    El mensaje se arma una vez y las filas se insertan con un solo bulk_create.
+    diferido=True (default: settings.NOTIFICATIONS_DIFERIDAS) encola el envío como Job al confirmar la
+    transacción, así la latencia del request no depende del tamaño del grupo.
+    """
+    mensaje = _build_msg(clase, motivo)
+    docentes = [d.user_id for d in (getattr(clase, "docente", None), docente_anterior) if d and d.user_id]
+
+    if diferido is None:
+        diferido = getattr(settings, "NOTIFICATIONS_DIFERIDAS", False)
+    if diferido:
+        parametros = {"clase": clase.pk, "grupo": clase.grupo_id, "titulo": titulo,
+                      "mensaje": mensaje, "usuarios": docentes}
+        transaction.on_commit(lambda: encolar(Job.Tipo.NOTIFICACION_CAMBIO, parametros))
+        return
+    _crear_notificaciones(clase.pk, clase.grupo_id, titulo, mensaje, docentes)
+
+def notify_cambios_grupo(clases, titulo: str, motivo: str = "", docentes_anteriores=None, diferido=None):
+    """
+    notify_cambio_clase para un lote de clases: una notificación por grupo afectado (no una por clase),
+    con una línea por clase. docentes_anteriores: {clase_id: Docente} de las que cambiaron de docente.
+    Las clases deben traer grupo__asignatura, bloque_inicio, ambiente y docente ya cargados.
+    """
+    anteriores = docentes_anteriores or {}
+    por_grupo = {}
+    for c in clases:
+        por_grupo.setdefault(c.grupo_id, []).append(c)
+
+    if diferido is None:
+        diferido = getattr(settings, "NOTIFICATIONS_DIFERIDAS", False)
+    for grupo_id, del_grupo in por_grupo.items():
+        if len(del_grupo) == 1:
+            clase_id, titulo_g, mensaje = del_grupo[0].pk, titulo, _build_msg(del_grupo[0], motivo)
+        else:
+            clase_id, titulo_g = None, f"{titulo} ({len(del_grupo)} clases)"
+            mensaje = "\n".join(_build_msg(c, "") for c in del_grupo) + (f"\nMotivo: {motivo}" if motivo else "")
+        docentes = [d.user_id for c in del_grupo for d in (c.docente, anteriores.get(c.pk)) if d and d.user_id]
+        if diferido:
+            parametros = {"clase": clase_id, "grupo": grupo_id, "titulo": titulo_g,
+                          "mensaje": mensaje, "usuarios": docentes}
+            transaction.on_commit(lambda p=parametros: encolar(Job.Tipo.NOTIFICACION_CAMBIO, p))
+        else:
+            _crear_notificaciones(clase_id, grupo_id, titulo_g, mensaje, docentes)
+
+def _crear_notificaciones(clase_id, grupo_id, titulo, mensaje, usuarios_extra) -> int:
+    """
+    Estudiantes inscritos (una consulta) + usuarios_extra, sin repetir. Con ventana de outbox
+    se acumulan en NotificacionOutbox; si no, un bulk_create para quienes tienen in_app activo.
+    """
+    estudiantes = Inscripcion.objects.filter(grupo_id=grupo_id).values_list("estudiante__user_id", flat=True)
+    usuarios = list(dict.fromkeys((*estudiantes, *usuarios_extra)))
+    if outbox.ventana() > 0:
+        return outbox.encolar(usuarios, clase_id, titulo, mensaje)
+    prefs = outbox.preferencias(usuarios)
+    filas = [
+        Notificacion(usuario_id=uid, clase_id=clase_id, titulo=titulo, mensaje=mensaje)
+        for uid in usuarios if prefs[uid]["in_app"]
+    ]
+    Notificacion.objects.bulk_create(filas, batch_size=500)
+    contador.invalidar(f.usuario_id for f in filas)
+    bus.publicar_notificaciones(filas)
+    return len(filas)
+
+def _notificar_job(parametros, progreso=None):
+    """
+    Tarea del worker (Job.Tipo.NOTIFICACION_CAMBIO).
+    """
+    # la clase pudo borrarse antes de que corra el job (FK con SET_NULL)
+    clase_id = Clase.objects.filter(pk=parametros["clase"]).values_list("pk", flat=True).first()
+    creadas = _crear_notificaciones(clase_id, parametros["grupo"], parametros["titulo"],
+                                    parametros["mensaje"], parametros.get("usuarios", []))
+    return {"creadas": creadas}
 
 def _build_msg(clase, motivo):
     g = clase.grupo
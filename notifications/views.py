@@ -1,24 +1,68 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.db.models import Q
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from notifications.models import Notificacion
+from . import contador
 from .serializers import NotificacionModelSerializer
 
+LIMITE_DEFAULT = 50
+LIMITE_MAX = 200
+
+def _cursor(n: Notificacion) -> str:
+    raw = f"{n.creada_en.isoformat()}|{n.id}"
+    return urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _leer_cursor(txt: str):
+    # ValueError (incluye binascii.Error / UnicodeDecodeError) si no es un cursor nuestro
+    raw = urlsafe_b64decode(txt + "=" * (-len(txt) % 4)).decode()
+    fecha, pk = raw.split("|")
+    return datetime.fromisoformat(fecha), int(pk)
+
 @extend_schema(
     tags=["notificaciones"],
-    parameters=[OpenApiParameter("unread", bool, OpenApiParameter.QUERY)],
+    parameters=[
+        OpenApiParameter("unread", bool, OpenApiParameter.QUERY),
+        OpenApiParameter("cursor", str, OpenApiParameter.QUERY),
+        OpenApiParameter("limite", int, OpenApiParameter.QUERY),
+    ],
     responses={200: NotificacionModelSerializer(many=True)}
 )
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def notificaciones_list_view(request):
-    qs = Notificacion.objects.filter(usuario=request.user).order_by("-creada_en")
+    """
+    Bandeja del usuario, más recientes primero, paginada por cursor sobre (creada_en, id).
+    Si hay más resultados, el header X-Next-Cursor trae el valor para ?cursor= de la página siguiente.
+    """
+    qs = Notificacion.objects.filter(usuario=request.user).order_by("-creada_en", "-id")
     unread = request.query_params.get("unread")
     if unread in {"true","false"}:
         qs = qs.filter(leida=(unread!="true"))
-    return Response(NotificacionModelSerializer(qs, many=True).data)
+
+    cursor = request.query_params.get("cursor")
+    if cursor:
+        try:
+            fecha, pk = _leer_cursor(cursor)
+        except ValueError:
+            return Response({"detail":"Cursor inválido."}, status=400)
+        qs = qs.filter(Q(creada_en__lt=fecha) | Q(creada_en=fecha, id__lt=pk))
+
+    try:
+        limite = min(max(int(request.query_params.get("limite", LIMITE_DEFAULT)), 1), LIMITE_MAX)
+    except ValueError:
+        limite = LIMITE_DEFAULT
+
+    items = list(qs[:limite + 1])
+    response = Response(NotificacionModelSerializer(items[:limite], many=True).data)
+    if len(items) > limite:
+        response["X-Next-Cursor"] = _cursor(items[limite - 1])
+    return response
 
 @extend_schema(tags=["notificaciones"], responses={200: NotificacionModelSerializer})
 @api_view(["POST"])
@@ -28,6 +72,24 @@ def notificaciones_marcar_leida_view(request, pk: int):
         n = Notificacion.objects.get(pk=pk, usuario=request.user)
     except Notificacion.DoesNotExist:
         return Response({"detail":"No encontrada."}, status=404)
+    # UPDATE condicional: de dos pedidos simultáneos sólo uno la marca (y descuenta)
+    if Notificacion.objects.filter(pk=pk, usuario=request.user, leida=False).update(leida=True):
+        contador.descontar(request.user.pk)
     n.leida = True
-    n.save(update_fields=["leida"])
     return Response(NotificacionModelSerializer(n).data)
+
+@extend_schema(tags=["notificaciones"], responses={200: dict})
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def notificaciones_marcar_todas_view(request):
+    """Marca como leídas todas las notificaciones del usuario en un solo UPDATE."""
+    n = Notificacion.objects.filter(usuario=request.user, leida=False).update(leida=True)
+    contador.en_cero(request.user.pk)
+    return Response({"actualizadas": n})
+
+@extend_schema(tags=["notificaciones"], responses={200: dict})
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def notificaciones_no_leidas_view(request):
+    """Cantidad de no leídas (cacheada por usuario; ver notifications.contador)."""
+    return Response({"no_leidas": contador.no_leidas(request.user.pk)})
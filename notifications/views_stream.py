@@ -0,0 +1,117 @@
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from notifications.models import Notificacion
+from scheduling.ocupacion import version_calendario
+from . import bus, contador
+from .serializers import NotificacionModelSerializer
+
+# comentario cada tantos segundos para que proxies no corten la conexión
+KEEPALIVE_S = 15
+# el token se valida al conectar: cortar a tiempo fuerza a reconectar (y revalidar)
+DURACION_MAX_S = getattr(settings, "NOTIFICATIONS_STREAM_MAX_S", 30 * 60)
+# notificaciones que se recuperan al reconectar con Last-Event-ID
+PENDIENTES_MAX = 100
+
+
+def _autenticar(request):
+    """
+    JWT del header Authorization o de ?token= (EventSource no permite headers propios).
+    """
+    auth = JWTAuthentication()
+    raw = request.GET.get("token")
+    if not raw:
+        header = auth.get_header(request)
+        raw = auth.get_raw_token(header) if header else None
+    if not raw:
+        return None
+    try:
+        return auth.get_user(auth.get_validated_token(raw))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+def _sse(evento: str, datos, id_: int = None) -> bytes:
+    txt = f"event: {evento}\n"
+    if id_ is not None:
+        txt += f"id: {id_}\n"
+    txt += f"data: {json.dumps(datos, cls=DjangoJSONEncoder, ensure_ascii=False)}\n\n"
+    return txt.encode()
+
+
+def _estado_inicial(usuario_id: int, calendarios, ultimo_id):
+    estado = {
+        "no_leidas": contador.no_leidas(usuario_id),
+        "calendarios": {c: version_calendario(c) for c in calendarios},
+    }
+    pendientes = []
+    if ultimo_id is not None:
+        qs = Notificacion.objects.filter(usuario_id=usuario_id, id__gt=ultimo_id).order_by("id")[:PENDIENTES_MAX]
+        pendientes = NotificacionModelSerializer(qs, many=True).data
+    return estado, pendientes
+
+
+async def _eventos(usuario_id: int, calendarios, ultimo_id):
+    # suscribir antes de leer el estado: lo que se publique mientras tanto queda en la cola
+    b = bus.bus()
+    sub = b.suscribir([f"usuario:{usuario_id}", *(f"calendario:{c}" for c in calendarios)])
+    try:
+        yield b"retry: 3000\n\n"
+        estado, pendientes = await sync_to_async(_estado_inicial)(usuario_id, calendarios, ultimo_id)
+        yield _sse("estado", estado)
+        for n in pendientes:
+            yield _sse("notificacion", n, n["id"])
+
+        fin = time.monotonic() + DURACION_MAX_S
+        while time.monotonic() < fin:
+            item = await sub.siguiente(KEEPALIVE_S)
+            if item is None:
+                yield b": ping\n\n"
+                continue
+            _, evento = item
+            tipo = evento["tipo"]
+            datos = {k: v for k, v in evento.items() if k != "tipo"}
+            yield _sse(tipo, datos, datos["id"] if tipo == "notificacion" else None)
+    finally:
+        # también si el cliente se desconecta (el servidor ASGI cancela el generador)
+        b.cancelar(sub)
+
+
+async def stream_view(request):
+    """
+    Server-Sent Events (text/event-stream); requiere servir con ASGI (horarios.asgi).
+    GET ?calendarios=1,2[&token=<jwt>]
+    Eventos:
+      estado        {"no_leidas", "calendarios": {id: versión}} al conectar
+      notificacion  fila nueva de la bandeja (id = id de la notificación, para Last-Event-ID)
+      calendario    {"calendario", "version"} cuando cambian las clases del calendario
+    """
+    if request.method != "GET":
+        return HttpResponse(status=405)
+    if not isinstance(request, ASGIRequest):
+        # con WSGI Django consume el generador entero antes de responder: el cliente no recibiría nada
+        return HttpResponse("El stream requiere servir la aplicación con ASGI (horarios.asgi).", status=501)
+    usuario = await sync_to_async(_autenticar)(request)
+    if usuario is None:
+        return HttpResponse("No autenticado.", status=401)
+
+    calendarios = []
+    for p in (request.GET.get("calendarios") or "").split(","):
+        if p.strip().isdigit():
+            calendarios.append(int(p))
+    ultimo = request.headers.get("Last-Event-ID") or request.GET.get("ultimo")
+    ultimo_id = int(ultimo) if ultimo and ultimo.isdigit() else None
+
+    resp = StreamingHttpResponse(_eventos(usuario.pk, calendarios, ultimo_id), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"  # nginx: no acumular la respuesta
+    return resp
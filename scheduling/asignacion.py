@@ -0,0 +1,236 @@
+import time
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+INF = float("inf")
+
+# costo de dejar un grupo sin docente: mayor que cualquier -score, así se prefiere asignar si es viable
+COSTO_SIN_ASIGNAR = 10.0
+# costo marginal por cada grupo extra del mismo docente (reparte carga entre docentes con score similar)
+COSTO_POR_COPIA = 0.01
+
+
+def _hungaro(costos: List[List[float]]) -> List[int]:
+    """
+    Asignación de costo mínimo (Hungarian / Kuhn-Munkres con potenciales), O(n² · m).
+    costos: matriz n × m con n <= m. Devuelve col[i] para cada fila i.
+    """
+    n = len(costos)
+    if n == 0:
+        return []
+    m = len(costos[0])
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    p = [0] * (m + 1)      # p[j] = fila (1-based) asignada a la columna j
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [INF] * (m + 1)
+        usadas = [0]
+        libres = list(range(1, m + 1))
+        while True:
+            i0 = p[j0]
+            fila = costos[i0 - 1]
+            ui0 = u[i0]
+            delta = INF
+            j1 = 0
+            for j in libres:
+                cur = fila[j - 1] - ui0 - v[j]
+                if cur < minv[j]:
+                    minv[j] = cur
+                    way[j] = j0
+                    if cur < delta:
+                        delta = cur
+                        j1 = j
+                elif minv[j] < delta:
+                    delta = minv[j]
+                    j1 = j
+            for j in usadas:
+                u[p[j]] += delta
+                v[j] -= delta
+            for j in libres:
+                minv[j] -= delta
+            j0 = j1
+            usadas.append(j0)
+            libres.remove(j0)
+            if p[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+    col = [0] * n
+    for j in range(1, m + 1):
+        if p[j]:
+            col[p[j] - 1] = j - 1
+    return col
+
+
+class _Estado:
+    """
+    Asignación parcial con su carga y celdas ocupadas por docente, para reparar y refinar.
+    """
+
+    def __init__(self, carga_grupo, holgura, celdas):
+        self.carga_grupo = carga_grupo
+        self.holgura = holgura
+        self.celdas = celdas
+        self.asig: Dict[int, int] = {}
+        self.usada: Dict[int, float] = {}
+        self.ocupadas: Dict[int, Set[Hashable]] = {}
+
+    def cabe(self, gid: int, did: int) -> bool:
+        if self.usada.get(did, 0) + self.carga_grupo[gid] > self.holgura[did]:
+            return False
+        return self.ocupadas.get(did, set()).isdisjoint(self.celdas[gid])
+
+    def poner(self, gid: int, did: int) -> None:
+        self.asig[gid] = did
+        self.usada[did] = self.usada.get(did, 0) + self.carga_grupo[gid]
+        self.ocupadas.setdefault(did, set()).update(self.celdas[gid])
+
+    def sacar(self, gid: int) -> Optional[int]:
+        did = self.asig.pop(gid, None)
+        if did is not None:
+            self.usada[did] -= self.carga_grupo[gid]
+            self.ocupadas[did].difference_update(self.celdas[gid])
+        return did
+
+
+def asignar_por_matching(
+    candidatos: Dict[int, List[Tuple[int, float]]],
+    carga_grupo: Dict[int, int],
+    holgura: Dict[int, float],
+    celdas: Dict[int, Set[Hashable]],
+    tiempo_max_ms: int = 0,
+) -> Dict[int, int]:
+    """
+    Asigna a cada grupo 0 o 1 docente maximizando la suma de scores.
+    - candidatos: {grupo_id: [(docente_id, score)]} ya filtrados por viabilidad individual.
+    - carga_grupo: bloques que suma el grupo al docente; holgura: bloques que aún puede tomar cada docente.
+    - celdas: celdas (día, bloque) del grupo; un docente no puede tomar dos grupos que se crucen.
+    La capacidad se modela expandiendo cada docente en k copias (columnas) con costo creciente;
+    el resultado se repara contra la carga real y, si tiempo_max_ms > 0, se refina con búsqueda local.
+    Devuelve {grupo_id: docente_id} (sólo grupos asignados).
+    """
+    # grupos sin clases (carga 0) no compiten por capacidad ni celdas: van directo a su mejor candidato
+    libres = {gid: max(cs, key=lambda x: x[1])[0]
+              for gid, cs in candidatos.items() if cs and not carga_grupo[gid]}
+    gids = [g for g in candidatos if candidatos[g] and carga_grupo[g]]
+    n = len(gids)
+    if n == 0:
+        return libres
+
+    viables_por_docente: Dict[int, List[int]] = {}
+    for gid in gids:
+        for did, _ in candidatos[gid]:
+            viables_por_docente.setdefault(did, []).append(gid)
+
+    # ---- expansión por capacidad: copia j de d = (j+1)-ésimo grupo que toma d ----
+    # cota por carga y por celdas (los grupos de un mismo docente no se cruzan)
+    columnas: List[Tuple[int, int]] = []  # (docente_id, j)
+    for did, gs in viables_por_docente.items():
+        universo = set().union(*(celdas[g] for g in gs))
+        tope = min(holgura[did], len(universo))
+        k = min(len(gs), max(1, int(tope // min(carga_grupo[g] for g in gs))))
+        columnas.extend((did, j) for j in range(k))
+
+    m = len(columnas) + n  # + una columna "sin asignar" por grupo
+    costos: List[List[float]] = []
+    for gid in gids:
+        score_de = dict(candidatos[gid])
+        cg = carga_grupo[gid]
+        fila = [INF] * m
+        for c, (did, j) in enumerate(columnas):
+            s = score_de.get(did)
+            if s is None or cg * (j + 1) > holgura[did]:
+                continue
+            fila[c] = -s + COSTO_POR_COPIA * j
+        for c in range(len(columnas), m):
+            fila[c] = COSTO_SIN_ASIGNAR
+        # INF rompe la aritmética de potenciales: usar un costo grande finito
+        costos.append([x if x != INF else 1e9 for x in fila])
+
+    col = _hungaro(costos)
+
+    # ---- reparación: respetar la carga acumulada real y los cruces entre grupos ----
+    score = {gid: dict(candidatos[gid]) for gid in gids}
+    est = _Estado(carga_grupo, holgura, celdas)
+    propuestas = []
+    for i, gid in enumerate(gids):
+        c = col[i]
+        if c < len(columnas) and costos[i][c] < 1e9:
+            did = columnas[c][0]
+            propuestas.append((score[gid][did], gid, did))
+    for _, gid, did in sorted(propuestas, reverse=True):
+        if est.cabe(gid, did):
+            est.poner(gid, did)
+
+    # grupos que quedaron sin docente: mejor candidato que aún quepa
+    for gid in gids:
+        if gid in est.asig:
+            continue
+        for did, _ in sorted(candidatos[gid], key=lambda x: x[1], reverse=True):
+            if est.cabe(gid, did):
+                est.poner(gid, did)
+                break
+
+    if tiempo_max_ms > 0:
+        _busqueda_local(est, gids, candidatos, score, time.monotonic() + tiempo_max_ms / 1000.0)
+
+    return {**libres, **est.asig}
+
+
+def _busqueda_local(est: _Estado, gids, candidatos, score, deadline: float) -> None:
+    """
+    Mejora por movimientos (reasignar un grupo) e intercambios (swap de docentes entre dos grupos)
+    mientras haya mejora y quede tiempo.
+    """
+    def valor(gid):
+        did = est.asig.get(gid)
+        return COSTO_SIN_ASIGNAR * -1 if did is None else score[gid][did]
+
+    mejoro = True
+    while mejoro and time.monotonic() < deadline:
+        mejoro = False
+        for gid in gids:
+            if time.monotonic() >= deadline:
+                return
+            actual = est.asig.get(gid)
+            base = valor(gid)
+            est.sacar(gid)
+            mejor = (base, actual)
+            for did, s in candidatos[gid]:
+                if s > mejor[0] + 1e-9 and est.cabe(gid, did):
+                    mejor = (s, did)
+            if mejor[1] is not None:
+                est.poner(gid, mejor[1])
+            if mejor[1] != actual:
+                mejoro = True
+
+        for a_i, ga in enumerate(gids):
+            if time.monotonic() >= deadline:
+                return
+            da = est.asig.get(ga)
+            if da is None:
+                continue
+            for gb in gids[a_i + 1:]:
+                db = est.asig.get(gb)
+                if db is None or db == da:
+                    continue
+                sa, sb = score[ga].get(db), score[gb].get(da)
+                if sa is None or sb is None or sa + sb <= score[ga][da] + score[gb][db] + 1e-9:
+                    continue
+                est.sacar(ga)
+                est.sacar(gb)
+                if est.cabe(ga, db):
+                    est.poner(ga, db)
+                    if est.cabe(gb, da):
+                        est.poner(gb, da)
+                        mejoro = True
+                        break
+                    est.sacar(ga)
+                est.poner(ga, da)
+                est.poner(gb, db)
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import defaultdict
+from hashlib import sha1
+from typing import Dict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from scheduling.ocupacion import version_calendario, version_catalogo
+
+# TTL de respuestas cacheadas; la invalidación real es por versión, esto sólo acota memoria
+TTL_RESPUESTAS = getattr(settings, "SCHEDULING_CACHE_TTL", 60 * 60)
+# cada cuánto se vuelcan a la cache los aciertos/fallos contados en memoria (ver contar)
+VOLCADO_STATS_S = getattr(settings, "SCHEDULING_CACHE_STATS_VOLCADO_S", 30)
+
+_PENDIENTES: Dict[str, int] = defaultdict(int)
+_PENDIENTES_LOCK = threading.Lock()
+_ultimo_volcado = time.monotonic()
+
+
+def clave_respuesta(prefijo: str, calendario_id: int, *partes) -> str:
+    """
+    Clave de cache para una respuesta derivada de los horarios del calendario.
+    Incluye la versión del calendario y la del catálogo, así que cualquier escritura
+    relevante deja las claves anteriores huérfanas (expiran solas por TTL).
+    Las versiones están en la base (VersionDatos): nunca vuelven atrás, así que una clave vieja no se reusa.
+    """
+    digest = sha1(repr(partes).encode()).hexdigest()
+    return f"scheduling:{prefijo}:{calendario_id}:v{version_calendario(calendario_id)}.{version_catalogo()}:{digest}"
+
+
+def _clave_stats(prefijo: str, evento: str) -> str:
+    return f"scheduling:{prefijo}:stats:{evento}"
+
+
+def contar(prefijo: str, evento: str) -> None:
+    """
+    Suma un acierto/fallo en memoria del proceso; se vuelca a la cache cada VOLCADO_STATS_S
+    segundos, así que un HIT no escribe en la cache (con DatabaseCache sería una escritura por request).
+    """
+    global _ultimo_volcado
+    with _PENDIENTES_LOCK:
+        _PENDIENTES[_clave_stats(prefijo, evento)] += 1
+        ahora = time.monotonic()
+        if ahora - _ultimo_volcado < VOLCADO_STATS_S:
+            return
+        pendientes = dict(_PENDIENTES)
+        _PENDIENTES.clear()
+        _ultimo_volcado = ahora
+    _volcar(pendientes)
+
+
+def _volcar(pendientes: Dict[str, int]) -> None:
+    for key, n in pendientes.items():
+        if cache.add(key, n, None):
+            continue
+        try:
+            cache.incr(key, n)
+        except ValueError:  # expulsada entre add e incr
+            cache.set(key, n, None)
+
+
+def estadisticas(prefijo: str) -> Dict[str, float]:
+    """
+    Totales volcados por todos los procesos más lo pendiente de este (los demás, con hasta VOLCADO_STATS_S de retraso).
+    """
+    with _PENDIENTES_LOCK:
+        locales = dict(_PENDIENTES)
+    hits, misses = (cache.get(_clave_stats(prefijo, e), 0) + locales.get(_clave_stats(prefijo, e), 0)
+                    for e in ("hit", "miss"))
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "ratio": round(hits / total, 4) if total else 0.0}
@@ -0,0 +1,136 @@
+"""
+Mantenimiento de CargaDocentePeriodo (carga materializada por docente, periodo y calendario).
+Se recalcula por alcance (docentes, periodo y/o calendario) con una consulta agrupada sobre Clase:
+las señales de Clase lo hacen para los docentes afectados al confirmar la transacción y las
+escrituras masivas lo llaman explícitamente. Recalcular es idempotente, así que no acumula deriva.
+"""
+from itertools import accumulate
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from scheduling.models import Bloque, Calendario, CargaDocentePeriodo, Clase
+
+Clave = Tuple[int, int, int]  # (docente_id, periodo_id, calendario_id)
+
+
+def _funcion_minutos(filas: List[Tuple[int, int]], m_default: int) -> Callable[[int, int], int]:
+    """
+    f(orden_inicio, dur) -> minutos sumando duracion_min de los bloques del tramo (sumas prefijas).
+    `filas` = [(orden, duracion_min)] ordenadas; órdenes fuera de la grilla cuentan m_default.
+    """
+    if not filas:
+        return lambda orden, dur: dur * m_default
+    base = filas[0][0]
+    tope = filas[-1][0]
+    por_orden = dict(filas)
+    pref = [0, *accumulate(por_orden.get(o, m_default) for o in range(base, tope + 1))]
+
+    def minutos(orden: int, dur: int) -> int:
+        ini, fin = max(orden, base), min(orden + dur - 1, tope)
+        dentro = fin - ini + 1 if ini <= fin else 0
+        total = pref[fin - base + 1] - pref[ini - base] if dentro else 0
+        return total + (dur - dentro) * m_default
+    return minutos
+
+
+def minutos_por_tramo(calendario_id: int, m_default: int) -> Callable[[int, int], int]:
+    filas = list(Bloque.objects.filter(calendario_id=calendario_id).order_by("orden")
+                 .values_list("orden", "duracion_min"))
+    return _funcion_minutos(filas, m_default)
+
+
+def _minutos_por_calendario(calendario_ids: Iterable[int]) -> Dict[int, Callable[[int, int], int]]:
+    """
+    Una consulta de calendarios y otra de bloques para todos los calendarios pedidos.
+    """
+    ids = set(calendario_ids)
+    m_default = dict(Calendario.objects.filter(id__in=ids).values_list("id", "duracion_bloque_min"))
+    filas: Dict[int, List[Tuple[int, int]]] = {c: [] for c in ids}
+    for cal_id, orden, dur in (Bloque.objects.filter(calendario_id__in=ids).order_by("calendario_id", "orden")
+                               .values_list("calendario_id", "orden", "duracion_min")):
+        filas[cal_id].append((orden, dur))
+    return {c: _funcion_minutos(filas[c], m_default.get(c) or 45) for c in ids}
+
+
+def recalcular(docente_ids: Optional[Iterable[int]] = None, periodo_id: Optional[int] = None,
+               calendario_id: Optional[int] = None) -> int:
+    """
+    Recalcula las filas del alcance (None = sin filtrar por ese criterio; todo = reconstrucción completa).
+    Upsert de las claves con clases y borrado de las que quedaron en cero. Devuelve filas escritas.
+    """
+    clases = Clase.objects.filter(docente__isnull=False).exclude(estado="cancelado")
+    actuales = CargaDocentePeriodo.objects.all()
+    if docente_ids is not None:
+        docente_ids = list(set(docente_ids))
+        if not docente_ids:
+            return 0
+        clases = clases.filter(docente_id__in=docente_ids)
+        actuales = actuales.filter(docente_id__in=docente_ids)
+    if periodo_id is not None:
+        clases = clases.filter(periodo_id=periodo_id)
+        actuales = actuales.filter(periodo_id=periodo_id)
+    if calendario_id is not None:
+        clases = clases.filter(calendario_id=calendario_id)
+        actuales = actuales.filter(calendario_id=calendario_id)
+
+    grupos = list(clases
+                  .values_list("docente_id", "periodo_id", "calendario_id", "orden_inicio", "bloques_duracion")
+                  .order_by().annotate(n=Count("id")))
+    minutos = _minutos_por_calendario({g[2] for g in grupos})
+
+    acum: Dict[Clave, List[int]] = {}
+    for docente_id, per_id, cal_id, orden, dur, n in grupos:
+        a = acum.setdefault((docente_id, per_id, cal_id), [0, 0, 0])
+        a[0] += dur * n
+        a[1] += minutos[cal_id](orden, dur) * n
+        a[2] += n
+
+    ahora = timezone.now()
+    filas = [
+        CargaDocentePeriodo(docente_id=d, periodo_id=p, calendario_id=c,
+                            bloques=b, minutos=m, clases=n, actualizado_en=ahora)
+        for (d, p, c), (b, m, n) in acum.items()
+    ]
+    with transaction.atomic():
+        if filas:
+            CargaDocentePeriodo.objects.bulk_create(
+                filas, batch_size=500, update_conflicts=True,
+                unique_fields=["docente", "periodo", "calendario"],
+                update_fields=["bloques", "minutos", "clases", "actualizado_en"],
+            )
+        sobrantes = [pk for pk, d, p, c in actuales.values_list("id", "docente_id", "periodo_id", "calendario_id")
+                     if (d, p, c) not in acum]
+        if sobrantes:
+            CargaDocentePeriodo.objects.filter(pk__in=sobrantes).delete()
+    return len(filas)
+
+
+def recalcular_al_confirmar(**alcance) -> None:
+    """
+    recalcular() cuando se confirme la transacción en curso (o ya, si no hay).
+    """
+    transaction.on_commit(lambda: recalcular(**alcance))
+
+
+def carga_en_bloques(docente_id: int, periodo_id: int) -> int:
+    """
+    Bloques del docente en el periodo, sumando sus calendarios (lectura de la tabla materializada).
+    """
+    return (CargaDocentePeriodo.objects
+            .filter(docente_id=docente_id, periodo_id=periodo_id)
+            .aggregate(total=Coalesce(Sum("bloques"), 0))["total"])
+
+
+def cargas_del_periodo(periodo_id: int) -> Dict[int, int]:
+    """
+    {docente_id: bloques} del periodo en una consulta.
+    """
+    return dict(CargaDocentePeriodo.objects
+                .filter(periodo_id=periodo_id)
+                .values_list("docente_id")
+                .order_by()
+                .annotate(total=Sum("bloques")))
@@ -0,0 +1,238 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from scheduling.snapshot import SnapshotPlanificacion
+
+# pesos de los objetivos blandos (mayor score = mejor ubicación)
+PESO_PREFERENCIA = 1.0   # por bloque, según DisponibilidadDocente.preferencia
+PESO_MISMO_DIA = 3.0     # por cada sesión del grupo que ya cae ese día
+PESO_HUECO = 1.0         # por cada bloque libre que queda entre clases del grupo o del docente
+
+
+@dataclass
+class Sesion:
+    grupo_id: int
+    tipo: str
+    dur: int
+    docente_id: int
+    ambientes: List[int]  # candidatos compatibles, en orden de preferencia (vacío = ninguno compatible)
+
+
+@dataclass
+class Ubicacion:
+    day: int
+    pos: int
+    ambiente_id: Optional[int]
+
+
+def _huecos(m: int) -> int:
+    """
+    Bloques libres entre el primer y el último bloque ocupado de la máscara.
+    """
+    if not m:
+        return 0
+    return m.bit_length() - (m & -m).bit_length() + 1 - m.bit_count()
+
+
+class GeneradorHorario:
+    """
+    Ubica sesiones sobre un SnapshotPlanificacion.
+    Restricciones duras: exclusividad de docente, grupo y ambiente, disponibilidad del docente
+    y sesiones contiguas dentro de la grilla. Objetivos blandos: preferencia del docente,
+    repartir las sesiones del grupo en distintos días y evitar huecos.
+    Construcción voraz (lo más restringido primero) y, con presupuesto de tiempo,
+    reparación de sesiones sin ubicar y mejora por reubicación.
+    """
+
+    def __init__(self, snap: SnapshotPlanificacion, sesiones: Sequence[Sesion], dias: Sequence[int]):
+        self.snap = snap
+        self.sesiones = list(sesiones)
+        self.dias = [int(d) for d in dias]
+        self.n = len(snap.id_por_idx)
+        self.docente = {s.docente_id: list(snap.ocupacion_docente(s.docente_id)) for s in self.sesiones}
+        self.grupo = {s.grupo_id: list(snap.ocupacion_grupo(s.grupo_id)) for s in self.sesiones}
+        self.ambiente = {a: list(snap.ocupacion_ambiente(a)) for s in self.sesiones for a in s.ambientes}
+        self.disp = {s.docente_id: snap.disponibilidad_docente(s.docente_id) for s in self.sesiones}
+        self.sesiones_dia: Dict[Tuple[int, int], int] = {}  # (grupo_id, día) -> sesiones nuevas
+        self.ubic: Dict[int, Ubicacion] = {}
+        self.dominio: Dict[int, int] = {}
+
+    # ---- estado ----
+
+    def _mascara(self, i: int, pos: int) -> int:
+        return ((1 << self.sesiones[i].dur) - 1) << pos
+
+    def _poner(self, i: int, u: Ubicacion) -> None:
+        s = self.sesiones[i]
+        m = self._mascara(i, u.pos)
+        self.docente[s.docente_id][u.day] |= m
+        self.grupo[s.grupo_id][u.day] |= m
+        if u.ambiente_id is not None:
+            self.ambiente[u.ambiente_id][u.day] |= m
+        k = (s.grupo_id, u.day)
+        self.sesiones_dia[k] = self.sesiones_dia.get(k, 0) + 1
+        self.ubic[i] = u
+
+    def _sacar(self, i: int) -> Optional[Ubicacion]:
+        u = self.ubic.pop(i, None)
+        if u is None:
+            return None
+        s = self.sesiones[i]
+        m = ~self._mascara(i, u.pos)
+        self.docente[s.docente_id][u.day] &= m
+        self.grupo[s.grupo_id][u.day] &= m
+        if u.ambiente_id is not None:
+            self.ambiente[u.ambiente_id][u.day] &= m
+        self.sesiones_dia[(s.grupo_id, u.day)] -= 1
+        return u
+
+    # ---- evaluación ----
+
+    def _posiciones(self, i: int):
+        """
+        (día, pos, máscara) donde el docente está disponible para toda la sesión.
+        """
+        s = self.sesiones[i]
+        base = (1 << s.dur) - 1
+        disp = self.disp[s.docente_id]
+        for day in self.dias:
+            d = disp[day]
+            if not d:
+                continue
+            for pos in range(0, self.n - s.dur + 1):
+                m = base << pos
+                if d & m == m:
+                    yield day, pos, m
+
+    def _score(self, i: int, day: int, pos: int, m: int) -> float:
+        s = self.sesiones[i]
+        prefs = self.snap.pref_docente.get(s.docente_id)
+        pref = sum(prefs.get((day, p), 0) for p in range(pos, pos + s.dur)) if prefs else 0
+        g, d = self.grupo[s.grupo_id][day], self.docente[s.docente_id][day]
+        huecos = (_huecos(g | m) - _huecos(g)) + (_huecos(d | m) - _huecos(d))
+        return (PESO_PREFERENCIA * pref
+                - PESO_MISMO_DIA * self.sesiones_dia.get((s.grupo_id, day), 0)
+                - PESO_HUECO * huecos
+                - 0.001 * pos)  # desempate estable: temprano primero
+
+    def _ambiente_libre(self, i: int, day: int, m: int):
+        """
+        Primer ambiente candidato libre; None si la sesión no tiene candidatos; False si todos chocan.
+        """
+        s = self.sesiones[i]
+        if not s.ambientes:
+            return None
+        for a in s.ambientes:
+            if not self.ambiente[a][day] & m:
+                return a
+        return False
+
+    def _mejor(self, i: int) -> Optional[Tuple[float, Ubicacion]]:
+        s = self.sesiones[i]
+        opciones = []
+        for day, pos, m in self._posiciones(i):
+            if self.grupo[s.grupo_id][day] & m or self.docente[s.docente_id][day] & m:
+                continue
+            opciones.append((self._score(i, day, pos, m), day, pos, m))
+        opciones.sort(key=lambda x: x[0], reverse=True)
+        for score, day, pos, m in opciones:
+            a = self._ambiente_libre(i, day, m)
+            if a is not False:
+                return score, Ubicacion(day, pos, a)
+        return None
+
+    # ---- búsqueda ----
+
+    def resolver(self, tiempo_max_ms: int = 0) -> Dict[int, Ubicacion]:
+        deadline = time.monotonic() + tiempo_max_ms / 1000.0
+        self.dominio = {i: sum(1 for _ in self._posiciones(i)) for i in range(len(self.sesiones))}
+        orden = sorted(range(len(self.sesiones)), key=lambda i: (self.dominio[i], -self.sesiones[i].dur))
+        for i in orden:
+            mejor = self._mejor(i)
+            if mejor:
+                self._poner(i, mejor[1])
+
+        if tiempo_max_ms > 0:
+            self._reparar(orden, deadline)
+            self._mejorar(deadline)
+        return dict(self.ubic)
+
+    def _bloqueantes(self, i: int, day: int, m: int) -> List[int]:
+        s = self.sesiones[i]
+        return [j for j, u in self.ubic.items()
+                if u.day == day and self._mascara(j, u.pos) & m
+                and (self.sesiones[j].grupo_id == s.grupo_id or self.sesiones[j].docente_id == s.docente_id)]
+
+    def _reparar(self, orden: List[int], deadline: float) -> None:
+        """
+        Para cada sesión sin ubicar: libera la posición con menos sesiones bloqueantes,
+        la ubica y reubica las desplazadas; si alguna no entra, deshace.
+        """
+        progreso = True
+        while progreso and time.monotonic() < deadline:
+            progreso = False
+            for i in orden:
+                if i in self.ubic:
+                    continue
+                if time.monotonic() >= deadline:
+                    return
+                intentos = sorted(((len(self._bloqueantes(i, day, m)), day, pos, m)
+                                   for day, pos, m in self._posiciones(i)), key=lambda x: x[0])
+                for _, day, pos, m in intentos[:5]:
+                    s = self.sesiones[i]
+                    sacadas = {j: self._sacar(j) for j in self._bloqueantes(i, day, m)}
+                    # lo que queda ocupado son clases ya existentes: no se mueven
+                    fijo = self.grupo[s.grupo_id][day] & m or self.docente[s.docente_id][day] & m
+                    a = self._ambiente_libre(i, day, m)
+                    if fijo or a is False:
+                        for j, u in sacadas.items():
+                            self._poner(j, u)
+                        continue
+                    self._poner(i, Ubicacion(day, pos, a))
+                    nuevas = {}
+                    for j in sorted(sacadas, key=lambda j: self.dominio[j]):
+                        mejor = self._mejor(j)
+                        if not mejor:
+                            break
+                        self._poner(j, mejor[1])
+                        nuevas[j] = mejor[1]
+                    if len(nuevas) == len(sacadas):
+                        progreso = True
+                        break
+                    for j in nuevas:
+                        self._sacar(j)
+                    self._sacar(i)
+                    for j, u in sacadas.items():
+                        self._poner(j, u)
+
+    def _mejorar(self, deadline: float) -> None:
+        """
+        Reubica cada sesión en su mejor posición mientras haya mejora y quede tiempo.
+        """
+        mejoro = True
+        while mejoro and time.monotonic() < deadline:
+            mejoro = False
+            for i in list(self.ubic):
+                if time.monotonic() >= deadline:
+                    return
+                actual = self._sacar(i)
+                base = self._score(i, actual.day, actual.pos, self._mascara(i, actual.pos))
+                mejor = self._mejor(i)
+                if mejor and mejor[0] > base + 1e-9:
+                    self._poner(i, mejor[1])
+                    mejoro = True
+                else:
+                    self._poner(i, actual)
+
+
+def dividir_en_sesiones(bloques: int, max_por_sesion: int) -> List[int]:
+    """
+    Reparte los bloques requeridos en sesiones de a lo sumo max_por_sesion (p.ej. 5, 2 -> [2, 2, 1]).
+    """
+    out = []
+    while bloques > 0:
+        d = min(max_por_sesion, bloques)
+        out.append(d)
+        bloques -= d
+    return out
@@ -3,20 +3,12 @@
 
 import math
 from academics.models import Asignatura
+from scheduling.cargas import carga_en_bloques
 from scheduling.models import Calendario, Clase, DiaSemana, DisponibilidadDocente
+from scheduling.ocupacion import indice_calendario
 from users.models import Docente
 
 
-def _rango(bloque, dur):
-    s = bloque.orden
-    e = s + dur - 1
-    return s, e
-
-def _solapan(b1, d1, b2, d2):
-    s1, e1 = b1, b1 + d1 - 1
-    s2, e2 = b2, b2 + d2 - 1
-    return not (e1 < s2 or e2 < s1)
-
 def _bloques_requeridos(asig: Asignatura, cal: Calendario):
     m = cal.duracion_bloque_min or 45
     req_t = math.ceil((asig.horas_teoria_semana * 60) / m) if asig.horas_teoria_semana else 0
@@ -25,8 +17,7 @@ def _bloques_requeridos(asig: Asignatura, cal: Calendario):
 
 def _carga_actual_en_bloques(docente_id: int, periodo_id: int):
     # Suma bloques por clases (no canceladas) del docente en el periodo
-    qs = Clase.objects.filter(docente_id=docente_id, grupo__periodo_id=periodo_id).exclude(estado="cancelado")
-    return qs.aggregate(total=sum("bloques_duracion"))["total"] or 0
+    return carga_en_bloques(docente_id, periodo_id)
 
 def _dia_ints():
     return [DiaSemana.LUNES, DiaSemana.MARTES, DiaSemana.MIERCOLES, DiaSemana.JUEVES, DiaSemana.VIERNES]
@@ -41,19 +32,19 @@ def _candidatos_docentes(asig: Asignatura, prefer_especialidad=True):
 def _ventanas_disponibles(docente: Docente, calendario: Calendario, day):
     # retorna lista de (bloque_inicio.orden, dur) para ese día
     ds = DisponibilidadDocente.objects.filter(docente=docente, calendario=calendario, day_of_week=day)\
-                                      .select_related("bloque_inicio").order_by("bloque_inicio__orden")
-    return [(d.bloque_inicio.orden, d.bloques_duracion, d.bloque_inicio_id) for d in ds]
-
-def _hay_clase_en(ambiente_id, day, start_orden, dur):
-    qs = Clase.objects.filter(ambiente_id=ambiente_id, day_of_week=day)
-    for c in qs:
-        if _solapan(start_orden, dur, c.bloque_inicio.orden, c.bloques_duracion):
-            return True
-    return False
-
-def _hay_clase_para_docente(docente_id, day, start_orden, dur):
-    qs = Clase.objects.filter(docente_id=docente_id, day_of_week=day)
-    for c in qs:
-        if _solapan(start_orden, dur, c.bloque_inicio.orden, c.bloques_duracion):
-            return True
-    return False
\ No newline at end of file
+                                      .order_by("orden_inicio")
+    return [(d.orden_inicio, d.bloques_duracion, d.bloque_inicio_id) for d in ds]
+
+def _solapadas(qs, start_orden, dur):
+    # rango [start_orden, start_orden+dur-1] contra las columnas orden_inicio/orden_fin (sin join)
+    return qs.filter(orden_inicio__lte=start_orden + dur - 1, orden_fin__gte=start_orden)
+
+def _hay_clase_en(ambiente_id, day, start_orden, dur, calendario_id=None):
+    if calendario_id:
+        return not indice_calendario(calendario_id).libre("AMBIENTE", ambiente_id, day, start_orden, dur)
+    return _solapadas(Clase.objects.filter(ambiente_id=ambiente_id, day_of_week=day), start_orden, dur).exists()
+
+def _hay_clase_para_docente(docente_id, day, start_orden, dur, calendario_id=None):
+    if calendario_id:
+        return not indice_calendario(calendario_id).libre("DOCENTE", docente_id, day, start_orden, dur)
+    return _solapadas(Clase.objects.filter(docente_id=docente_id, day_of_week=day), start_orden, dur).exists()
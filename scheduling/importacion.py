@@ -0,0 +1,151 @@
+"""
+Importación masiva de disponibilidad docente desde CSV, por lotes:
+- Ids de docentes, calendarios y bloques se precargan una vez; ninguna fila va a la base para validar.
+- Los solapes se controlan en memoria con máscaras por (docente, calendario, día): las existentes se
+  leen una vez por par (docente, calendario) y se les suman las filas ya aceptadas del archivo.
+- Cada lote se escribe con un bulk_create en su propia transacción (no una transacción gigante);
+  si choca con una escritura concurrente se revierte entero, borrados de "reemplazar" incluidos.
+Modos: "agregar" (default) respeta lo existente; "reemplazar" borra la disponibilidad previa de cada
+(docente, calendario) que aparece en el archivo antes de cargar sus filas.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import IntegrityError, transaction
+
+from scheduling.models import Bloque, Calendario, DisponibilidadDocente
+from scheduling.ocupacion import _mascara
+from users.models import Docente
+
+MODOS = ("agregar", "reemplazar")
+LOTE = 1000
+
+Par = Tuple[int, int]  # (docente_id, calendario_id)
+
+
+def _entero(row: dict, campo: str, errores: dict, default: Optional[int] = None) -> Optional[int]:
+    valor = (row.get(campo) or "").strip()
+    if valor == "":
+        if default is None:
+            errores[campo] = ["Campo requerido."]
+        return default
+    try:
+        return int(valor)
+    except ValueError:
+        errores[campo] = ["Debe ser un número entero."]
+        return None
+
+
+class ImportadorDisponibilidad:
+
+    def __init__(self, modo: str = "agregar", lote: int = LOTE):
+        self.modo = modo
+        self.lote = max(1, lote)
+        self.docentes = set(Docente.objects.values_list("id", flat=True))
+        self.calendarios = set(Calendario.objects.values_list("id", flat=True))
+        self.bloques: Dict[int, Tuple[int, int]] = {
+            b_id: (cal_id, orden) for b_id, cal_id, orden in Bloque.objects.values_list("id", "calendario_id", "orden")
+        }
+        self.ocupado: Dict[Tuple[int, int, int], int] = {}  # (docente, calendario, día) -> máscara
+        self.pares_listos: set = set()
+        self.creadas = 0
+        self.borradas = 0
+        self.errores: List[dict] = []
+
+    def _validar(self, row: dict) -> Tuple[Optional[DisponibilidadDocente], dict]:
+        err: dict = {}
+        docente = _entero(row, "docente", err)
+        cal = _entero(row, "calendario", err)
+        day = _entero(row, "day_of_week", err)
+        bloque = _entero(row, "bloque_inicio", err)
+        dur = _entero(row, "bloques_duracion", err, default=1)
+        pref = _entero(row, "preferencia", err, default=0)
+
+        if docente is not None and docente not in self.docentes:
+            err["docente"] = [f"Docente {docente} no existe."]
+        if cal is not None and cal not in self.calendarios:
+            err["calendario"] = [f"Calendario {cal} no existe."]
+        if day is not None and not 1 <= day <= 7:
+            err["day_of_week"] = ["day_of_week debe estar entre 1 y 7."]
+        if bloque is not None:
+            info = self.bloques.get(bloque)
+            if info is None:
+                err["bloque_inicio"] = [f"Bloque {bloque} no existe."]
+            elif cal is not None and info[0] != cal:
+                err["bloque_inicio"] = ["El bloque no pertenece al calendario."]
+        if dur is not None and dur <= 0:
+            err["bloques_duracion"] = ["bloques_duracion debe ser >= 1."]
+        if err:
+            return None, err
+        orden = self.bloques[bloque][1]
+        return DisponibilidadDocente(docente_id=docente, calendario_id=cal, day_of_week=day,
+                                     bloque_inicio_id=bloque, bloques_duracion=dur, preferencia=pref,
+                                     orden_inicio=orden, orden_fin=orden + dur - 1), err
+
+    def _preparar_pares(self, pares: Iterable[Par]) -> None:
+        """
+        Primera vez que aparece cada (docente, calendario): borrar (reemplazar) o leer sus máscaras (agregar).
+        Corre dentro de la transacción del lote.
+        """
+        nuevos = [p for p in set(pares) if p not in self.pares_listos]
+        if not nuevos:
+            return
+        docentes = {d for d, _ in nuevos}
+        cals = {c for _, c in nuevos}
+        qs = DisponibilidadDocente.objects.filter(docente_id__in=docentes, calendario_id__in=cals)
+        if self.modo == "reemplazar":
+            ids = [pk for pk, d, c in qs.values_list("id", "docente_id", "calendario_id") if (d, c) in nuevos]
+            if ids:
+                self.borradas += DisponibilidadDocente.objects.filter(pk__in=ids).delete()[0]
+        else:
+            filas = qs.values_list("docente_id", "calendario_id", "day_of_week", "orden_inicio", "bloques_duracion")
+            for d, c, day, orden, dur in filas:
+                if (d, c) in nuevos:
+                    k = (d, c, day)
+                    self.ocupado[k] = self.ocupado.get(k, 0) | _mascara(orden, dur)
+        self.pares_listos.update(nuevos)
+
+    def _procesar_lote(self, lote: List[Tuple[int, DisponibilidadDocente]]) -> None:
+        previo = (dict(self.ocupado), set(self.pares_listos), self.borradas)
+        aceptadas: List[Tuple[int, DisponibilidadDocente]] = []
+        try:
+            with transaction.atomic():
+                self._preparar_pares((o.docente_id, o.calendario_id) for _, o in lote)
+                for linea, o in lote:
+                    k = (o.docente_id, o.calendario_id, o.day_of_week)
+                    m = _mascara(self.bloques[o.bloque_inicio_id][1], o.bloques_duracion)
+                    if self.ocupado.get(k, 0) & m:
+                        self.errores.append({"row": linea, "errors": {
+                            "non_field_errors": ["La disponibilidad se solapa con otra existente."]}})
+                        continue
+                    self.ocupado[k] = self.ocupado.get(k, 0) | m
+                    aceptadas.append((linea, o))
+                if aceptadas:
+                    DisponibilidadDocente.objects.bulk_create([o for _, o in aceptadas], batch_size=self.lote)
+        except IntegrityError:
+            # alguien escribió la misma disponibilidad mientras tanto: se revierte el lote entero, incluido
+            # el borrado de "reemplazar", y los pares vuelven a prepararse si reaparecen en otro lote
+            self.ocupado, self.pares_listos, self.borradas = previo
+            for linea, _ in aceptadas:
+                self.errores.append({"row": linea, "errors": {
+                    "non_field_errors": ["Conflicto con una escritura concurrente; reintentar."]}})
+            return
+        self.creadas += len(aceptadas)
+
+    def importar(self, reader) -> dict:
+        """
+        `reader`: csv.DictReader (se usa reader.line_num para numerar errores por línea del archivo).
+        """
+        lote: List[Tuple[int, DisponibilidadDocente]] = []
+        for row in reader:
+            obj, err = self._validar(row)
+            if err:
+                self.errores.append({"row": reader.line_num, "errors": err})
+                continue
+            lote.append((reader.line_num, obj))
+            if len(lote) >= self.lote:
+                self._procesar_lote(lote)
+                lote = []
+        if lote:
+            self._procesar_lote(lote)
+        self.errores.sort(key=lambda e: e["row"])
+        return {"created": self.creadas, "deleted": self.borradas, "errors": self.errores}
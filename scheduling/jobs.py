@@ -0,0 +1,102 @@
+import traceback
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+
+from scheduling.models import Job
+
+# tipo de job -> función (parametros, progreso) -> resultado JSON
+TAREAS = {
+    Job.Tipo.ASIGNACION_DOCENTES: "scheduling.views._proponer_docentes",
+    Job.Tipo.PROPUESTA_CLASES: "scheduling.views._proponer_clases",
+    Job.Tipo.ASIGNACION_AULAS: "scheduling.views_aulas._asignar_aulas",
+    Job.Tipo.DETECCION_CONFLICTOS: "scheduling.views_conflictos._detectar_conflictos_job",
+    Job.Tipo.NOTIFICACION_CAMBIO: "notifications.utils._notificar_job",
+}
+
+
+def es_async(request) -> bool:
+    """
+    `async=true` en la query string o en el cuerpo.
+    """
+    valor = request.query_params.get("async")
+    if valor is None and hasattr(request.data, "get"):
+        valor = request.data.get("async")
+    return str(valor).lower() in {"1", "true", "yes", "si"}
+
+
+def encolar(tipo: str, parametros: dict, usuario=None) -> Job:
+    return Job.objects.create(
+        tipo=tipo, parametros=parametros,
+        creado_por=usuario if usuario is not None and usuario.is_authenticated else None,
+    )
+
+
+def respuesta_encolado(job: Job) -> Response:
+    """
+    202 con el id del job y la URL de consulta.
+    """
+    return Response({"job": job.id, "estado": job.estado, "url": f"/api/scheduling/jobs/{job.id}/"},
+                    status=status.HTTP_202_ACCEPTED)
+
+
+def tomar_job(job_id: int) -> bool:
+    """
+    Marca el job como en curso si sigue pendiente. False si otro worker ya lo tomó.
+    """
+    return bool(Job.objects.filter(pk=job_id, estado=Job.Estado.PENDIENTE)
+                .update(estado=Job.Estado.EN_CURSO, iniciado_en=timezone.now(), progreso=0))
+
+
+def devolver_job(job_id: int) -> None:
+    """
+    Vuelve a pendiente un job tomado que no llegó a arrancar (p.ej. el pool no aceptó el envío).
+    """
+    Job.objects.filter(pk=job_id, estado=Job.Estado.EN_CURSO).update(
+        estado=Job.Estado.PENDIENTE, iniciado_en=None, progreso=0)
+
+
+def recuperar_colgados(antiguedad_s: float) -> int:
+    """
+    Marca con error los jobs en curso hace más de `antiguedad_s` segundos: su worker murió o se
+    reinició sin registrar el final. No se reintentan (pudieron dejar escrituras a medias).
+    """
+    limite = timezone.now() - timedelta(seconds=antiguedad_s)
+    return Job.objects.filter(estado=Job.Estado.EN_CURSO, iniciado_en__lt=limite).update(
+        estado=Job.Estado.ERROR, error="El worker se interrumpió durante la ejecución.", terminado_en=timezone.now())
+
+
+def _reportador(job_id: int) -> Callable[[int], None]:
+    def progreso(pct: int) -> None:
+        Job.objects.filter(pk=job_id).update(progreso=max(0, min(100, int(pct))))
+    return progreso
+
+
+def ejecutar_job(job_id: int) -> Optional[str]:
+    """
+    Corre un job ya tomado (estado en_curso) y guarda resultado o error. Devuelve el estado final.
+    Pensado para ejecutarse en un proceso del pool del worker.
+    """
+    close_old_connections()
+    job = Job.objects.filter(pk=job_id).first()
+    if job is None:
+        return None
+    try:
+        tarea = import_string(TAREAS[job.tipo])
+        resultado = tarea(job.parametros, progreso=_reportador(job.id))
+        Job.objects.filter(pk=job.id).update(
+            estado=Job.Estado.TERMINADO, progreso=100, resultado=resultado, terminado_en=timezone.now()
+        )
+        return Job.Estado.TERMINADO
+    except Exception:
+        Job.objects.filter(pk=job.id).update(
+            estado=Job.Estado.ERROR, error=traceback.format_exc(), terminado_en=timezone.now()
+        )
+        return Job.Estado.ERROR
+    finally:
+        close_old_connections()
@@ -0,0 +1,61 @@
+"""
+Medición y corte de líneas para el render PDF, sin volver a medir cadenas en cada intento.
+- Anchos por glifo cacheados por fuente (en milésimas de em; se escalan por tamaño).
+- Cortes greedy a partir de sumas prefijas de anchos de palabras.
+- Resultado memoizado por (texto, ancho máximo, líneas, fuente, tamaño).
+"""
+from functools import lru_cache
+from itertools import accumulate
+from typing import Dict, Tuple
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+_GLIFOS: Dict[str, Dict[str, float]] = {}
+
+
+def _ancho_unidades(texto: str, fuente: str) -> float:
+    """
+    Ancho en milésimas de em (tamaño 1000), sumando la tabla de glifos de la fuente.
+    """
+    tabla = _GLIFOS.setdefault(fuente, {})
+    total = 0.0
+    for ch in texto:
+        w = tabla.get(ch)
+        if w is None:
+            w = tabla[ch] = stringWidth(ch, fuente, 1000)
+        total += w
+    return total
+
+
+def ancho(texto: str, fuente: str, tamano: float) -> float:
+    return _ancho_unidades(texto, fuente) * tamano / 1000.0
+
+
+@lru_cache(maxsize=8192)
+def envolver(texto: str, max_w: float, max_lineas: int,
+             fuente: str = "Helvetica", tamano: int = 8) -> Tuple[Tuple[str, ...], int]:
+    """
+    Corta `texto` en a lo sumo max_lineas líneas de ancho <= max_w (greedy por palabras).
+    Una palabra más ancha que max_w ocupa su propia línea. Devuelve (líneas, tamaño).
+    Mismo resultado que el _wrap_text que usaba el export PDF.
+    """
+    palabras = texto.split()
+    if not palabras:
+        return (), tamano
+    limite = max_w * 1000.0 / tamano  # comparar en unidades evita escalar cada candidato
+    espacio = _ancho_unidades(" ", fuente)
+    # pref[k] = suma de anchos de las primeras k palabras
+    pref = [0.0, *accumulate(_ancho_unidades(p, fuente) for p in palabras)]
+
+    lineas = []
+    ini = 0  # primera palabra de la línea en curso
+    for j in range(1, len(palabras)):
+        # ancho de palabras[ini..j] con sus espacios
+        w = pref[j + 1] - pref[ini] + espacio * (j - ini)
+        if w > limite:
+            lineas.append(" ".join(palabras[ini:j]))
+            ini = j
+            if len(lineas) >= max_lineas:
+                return tuple(lineas), tamano
+    lineas.append(" ".join(palabras[ini:]))
+    return tuple(lineas[:max_lineas]), tamano
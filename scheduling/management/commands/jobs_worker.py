@@ -0,0 +1,84 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from scheduling import worker
+from scheduling.jobs import devolver_job, recuperar_colgados, tomar_job
+from scheduling.models import Job
+
+
+class Command(BaseCommand):
+    help = "Ejecuta los jobs de planificación pendientes con un pool de procesos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=2, help="Tamaño del pool (default 2).")
+        parser.add_argument("--intervalo", type=float, default=1.0, help="Segundos entre consultas de la cola.")
+        parser.add_argument("--una-vez", action="store_true", help="Procesa lo pendiente y termina.")
+        parser.add_argument("--timeout-en-curso", type=float,
+                            default=getattr(settings, "JOBS_TIMEOUT_EN_CURSO_S", 60 * 60),
+                            help="Al arrancar, marca con error los jobs en curso hace más de estos segundos.")
+
+    def handle(self, *args, **opts):
+        procesos = max(1, opts["procesos"])
+        colgados = recuperar_colgados(opts["timeout_en_curso"])
+        if colgados:
+            self.stdout.write(f"{colgados} job(s) en curso de una ejecución anterior marcados con error.")
+        pool = _pool(procesos)
+        en_vuelo = {}
+        try:
+            while True:
+                roto = False
+                for job_id, fut in list(en_vuelo.items()):
+                    if not fut.done():
+                        continue
+                    en_vuelo.pop(job_id)
+                    if fut.exception():
+                        # el proceso murió antes de poder registrar el error
+                        Job.objects.filter(pk=job_id).update(estado=Job.Estado.ERROR, error=repr(fut.exception()))
+                        estado = Job.Estado.ERROR
+                        roto = roto or isinstance(fut.exception(), BrokenProcessPool)
+                    else:
+                        estado = fut.result()
+                    self.stdout.write(f"Job {job_id}: {estado}")
+
+                if roto:
+                    pool = _reemplazar(pool, procesos)
+
+                libres = procesos - len(en_vuelo)
+                if libres > 0:
+                    pendientes = list(Job.objects.filter(estado=Job.Estado.PENDIENTE)
+                                      .order_by("creado_en", "id").values_list("id", flat=True)[:libres])
+                    for job_id in pendientes:
+                        if not tomar_job(job_id):
+                            continue
+                        try:
+                            en_vuelo[job_id] = pool.submit(worker.ejecutar, job_id)
+                        except BrokenProcessPool:
+                            # un proceso murió y el pool ya no acepta trabajo: el job vuelve a la cola
+                            devolver_job(job_id)
+                            pool = _reemplazar(pool, procesos)
+                            break
+
+                if opts["una_vez"] and not en_vuelo:
+                    break
+                connections.close_all()
+                time.sleep(opts["intervalo"])
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _pool(procesos: int) -> ProcessPoolExecutor:
+    # "spawn": cada proceso arranca Django y abre su propia conexión a la base
+    ctx = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=procesos, mp_context=ctx, initializer=worker.inicializar_proceso)
+
+
+def _reemplazar(pool: ProcessPoolExecutor, procesos: int) -> ProcessPoolExecutor:
+    # los jobs que corrían en el pool roto ya terminaron con BrokenProcessPool (se marcan con error)
+    pool.shutdown(wait=False, cancel_futures=True)
+    return _pool(procesos)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from scheduling.cargas import recalcular
+
+
+class Command(BaseCommand):
+    help = "Reconstruye CargaDocentePeriodo desde las clases (reparación de deriva)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--periodo", type=int, help="Sólo este periodo.")
+        parser.add_argument("--calendario", type=int, help="Sólo este calendario.")
+        parser.add_argument("--docente", type=int, action="append", help="Sólo estos docentes (repetible).")
+
+    def handle(self, *args, **opts):
+        n = recalcular(docente_ids=opts["docente"], periodo_id=opts["periodo"], calendario_id=opts["calendario"])
+        self.stdout.write(f"{n} filas de carga recalculadas.")
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:14
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0003_clase_docente_substituto'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('asignacion_docentes', 'Asignación de docentes'), ('propuesta_clases', 'Propuesta de clases'), ('asignacion_aulas', 'Asignación de aulas'), ('deteccion_conflictos', 'Detección de conflictos')], max_length=32)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('terminado', 'Terminado'), ('error', 'Error')], default='pendiente', max_length=12)),
+                ('progreso', models.PositiveSmallIntegerField(default=0)),
+                ('parametros', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('resultado', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Job',
+                'verbose_name_plural': 'Jobs',
+                'ordering': ('-creado_en',),
+                'indexes': [models.Index(fields=['estado', 'creado_en'], name='scheduling__estado_9ecdf6_idx')],
+            },
+        ),
+    ]
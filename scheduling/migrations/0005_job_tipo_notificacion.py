@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduling', '0004_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='tipo',
+            field=models.CharField(choices=[('asignacion_docentes', 'Asignación de docentes'), ('propuesta_clases', 'Propuesta de clases'), ('asignacion_aulas', 'Asignación de aulas'), ('deteccion_conflictos', 'Detección de conflictos'), ('notificacion_cambio', 'Notificación de cambio de clase')], max_length=32),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_cargas(apps, schema_editor):
+    """Carga inicial: misma cuenta que scheduling.cargas.recalcular, con los modelos históricos."""
+    Clase = apps.get_model("scheduling", "Clase")
+    Bloque = apps.get_model("scheduling", "Bloque")
+    Calendario = apps.get_model("scheduling", "Calendario")
+    Carga = apps.get_model("scheduling", "CargaDocentePeriodo")
+
+    m_default = dict(Calendario.objects.values_list("id", "duracion_bloque_min"))
+    dur_bloque = {(c, o): d for c, o, d in Bloque.objects.values_list("calendario_id", "orden", "duracion_min")}
+    acum = {}
+    grupos = (Clase.objects.filter(docente__isnull=False).exclude(estado="cancelado")
+              .values_list("docente_id", "grupo__periodo_id", "bloque_inicio__calendario_id",
+                           "bloque_inicio__orden", "bloques_duracion")
+              .order_by().annotate(n=Count("id")))
+    for docente_id, per_id, cal_id, orden, dur, n in grupos:
+        a = acum.setdefault((docente_id, per_id, cal_id), [0, 0, 0])
+        mins = sum(dur_bloque.get((cal_id, o), m_default.get(cal_id) or 45) for o in range(orden, orden + dur))
+        a[0] += dur * n
+        a[1] += mins * n
+        a[2] += n
+    Carga.objects.bulk_create([
+        Carga(docente_id=d, periodo_id=p, calendario_id=c, bloques=b, minutos=m, clases=n)
+        for (d, p, c), (b, m, n) in acum.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0003_alter_grupo_codigo'),
+        ('scheduling', '0005_job_tipo_notificacion'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CargaDocentePeriodo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bloques', models.PositiveIntegerField(default=0)),
+                ('minutos', models.PositiveIntegerField(default=0)),
+                ('clases', models.PositiveIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('calendario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cargas_docentes', to='scheduling.calendario')),
+                ('docente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cargas', to='users.docente')),
+                ('periodo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cargas_docentes', to='academics.periodo')),
+            ],
+            options={
+                'verbose_name': 'Carga de Docente',
+                'verbose_name_plural': 'Cargas de Docentes',
+                'indexes': [models.Index(fields=['periodo', 'calendario'], name='scheduling__periodo_b19c23_idx')],
+                'constraints': [models.UniqueConstraint(fields=('docente', 'periodo', 'calendario'), name='carga_docente_unica_por_periodo_cal')],
+            },
+        ),
+        migrations.RunPython(poblar_cargas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def poblar_ubicacion(apps, schema_editor):
+    """periodo/calendario de las clases existentes, desde grupo y bloque_inicio (un UPDATE)."""
+    Clase = apps.get_model("scheduling", "Clase")
+    Grupo = apps.get_model("academics", "Grupo")
+    Bloque = apps.get_model("scheduling", "Bloque")
+    Clase.objects.update(
+        periodo_id=Subquery(Grupo.objects.filter(pk=OuterRef("grupo_id")).values("periodo_id")[:1]),
+        calendario_id=Subquery(Bloque.objects.filter(pk=OuterRef("bloque_inicio_id")).values("calendario_id")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0003_alter_grupo_codigo'),
+        ('facilities', '0001_initial'),
+        ('scheduling', '0006_carga_docente_periodo'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clase',
+            name='calendario',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='scheduling.calendario'),
+        ),
+        migrations.AddField(
+            model_name='clase',
+            name='periodo',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='academics.periodo'),
+        ),
+        migrations.RunPython(poblar_ubicacion, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='clase',
+            index=models.Index(fields=['calendario', 'estado', 'day_of_week'], name='scheduling__calenda_6bc643_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clase',
+            index=models.Index(fields=['calendario', 'docente', 'day_of_week'], name='scheduling__calenda_8f3878_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clase',
+            index=models.Index(fields=['calendario', 'ambiente', 'day_of_week'], name='scheduling__calenda_818152_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clase',
+            index=models.Index(fields=['periodo', 'calendario'], name='scheduling__periodo_4806e0_idx'),
+        ),
+    ]
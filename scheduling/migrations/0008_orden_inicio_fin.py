@@ -0,0 +1,80 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:39
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def poblar_orden(apps, schema_editor):
+    """orden_inicio/orden_fin de clases y disponibilidades existentes (dos UPDATE por modelo)."""
+    Bloque = apps.get_model("scheduling", "Bloque")
+    orden = Subquery(Bloque.objects.filter(pk=OuterRef("bloque_inicio_id")).values("orden")[:1])
+    for nombre in ("Clase", "DisponibilidadDocente"):
+        modelo = apps.get_model("scheduling", nombre)
+        modelo.objects.update(orden_inicio=orden)
+        modelo.objects.update(orden_fin=F("orden_inicio") + F("bloques_duracion") - 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0003_alter_grupo_codigo'),
+        ('facilities', '0001_initial'),
+        ('scheduling', '0007_clase_periodo_calendario'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='clase',
+            name='scheduling__docente_a16f5e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='clase',
+            name='scheduling__ambient_aef2a7_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='clase',
+            name='scheduling__grupo_i_1a59ab_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='disponibilidaddocente',
+            name='scheduling__docente_a39703_idx',
+        ),
+        migrations.AddField(
+            model_name='clase',
+            name='orden_fin',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='clase',
+            name='orden_inicio',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='disponibilidaddocente',
+            name='orden_fin',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='disponibilidaddocente',
+            name='orden_inicio',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(poblar_orden, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='clase',
+            index=models.Index(fields=['docente', 'day_of_week', 'orden_inicio', 'orden_fin'], name='scheduling__docente_2bf0f8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clase',
+            index=models.Index(fields=['ambiente', 'day_of_week', 'orden_inicio', 'orden_fin'], name='scheduling__ambient_1b41f4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clase',
+            index=models.Index(fields=['grupo', 'day_of_week', 'orden_inicio', 'orden_fin'], name='scheduling__grupo_i_89790e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disponibilidaddocente',
+            index=models.Index(fields=['docente', 'calendario', 'day_of_week', 'orden_inicio', 'orden_fin'], name='scheduling__docente_84896a_idx'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 
@@ -55,6 +57,25 @@ class DiaSemana(models.IntegerChoices):
     DOMINGO = 7, "Domingo"
 
 
+def _toca_derivados(update_fields, derivados) -> bool:
+    # sin update_fields se guarda todo; con update_fields, sólo si incluye algún campo origen
+    if update_fields is None:
+        return True
+    campos = set(update_fields)
+    return any(campos & {origen, f"{origen}_id"} for origen in derivados)
+
+
+def _con_derivados(update_fields, derivados):
+    # update_fields más las columnas desnormalizadas que dependen de los campos que se guardan
+    if update_fields is None:
+        return None
+    campos = set(update_fields)
+    for origen, extra in derivados.items():
+        if campos & {origen, f"{origen}_id"}:
+            campos.update(extra)
+    return campos
+
+
 class DisponibilidadDocente(models.Model):
     """
     Disponibilidad por docente, día y bloque de un calendario (periodo específico).
@@ -73,6 +94,10 @@ class DisponibilidadDocente(models.Model):
     bloques_duracion = models.PositiveSmallIntegerField(default=1)
     preferencia = models.IntegerField(default=0)  # peso para tu optimizador
 
+    # rango [orden_inicio, orden_fin] de Bloque.orden, para consultar solapes sin join (ver save())
+    orden_inicio = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    orden_fin = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+
     class Meta:
         verbose_name = "Disponibilidad Docente"
         verbose_name_plural = "Disponibilidades Docentes"
@@ -83,13 +108,42 @@ class DisponibilidadDocente(models.Model):
             )
         ]
         indexes = [
-            models.Index(fields=["docente", "calendario", "day_of_week"]),
+            models.Index(fields=["docente", "calendario", "day_of_week", "orden_inicio", "orden_fin"]),
             models.Index(fields=["bloque_inicio"]),
         ]
 
     def __str__(self):
         return f"{self.docente} · {self.get_day_of_week_display()} #{self.bloque_inicio.orden} x{self.bloques_duracion}"
 
+    # campo guardado -> columnas desnormalizadas que hay que guardar con él
+    DERIVADOS = {
+        "bloque_inicio": ("orden_inicio", "orden_fin"),
+        "bloques_duracion": ("orden_fin",),
+    }
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if _toca_derivados(update_fields, self.DERIVADOS):
+            DisponibilidadDocente.sincronizar_orden([self])
+            kwargs["update_fields"] = _con_derivados(update_fields, self.DERIVADOS)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def sincronizar_orden(cls, disponibilidades) -> None:
+        """
+        orden_inicio/orden_fin desde bloque_inicio.orden (relación cargada o una consulta para el resto).
+        """
+        disponibilidades = list(disponibilidades)
+        sin_bloque = {d.bloque_inicio_id for d in disponibilidades
+                      if d.bloque_inicio_id and not cls.bloque_inicio.is_cached(d)}
+        ordenes = dict(Bloque.objects.filter(pk__in=sin_bloque).values_list("id", "orden")) if sin_bloque else {}
+        for d in disponibilidades:
+            if not d.bloque_inicio_id:
+                continue
+            orden = d.bloque_inicio.orden if cls.bloque_inicio.is_cached(d) else ordenes.get(d.bloque_inicio_id)
+            d.orden_inicio = orden
+            d.orden_fin = orden + d.bloques_duracion - 1 if orden is not None else None
+
 
 class Clase(models.Model):
     """
@@ -140,14 +194,32 @@ class Clase(models.Model):
         blank=True,
     )
 
+    # Desnormalizados de grupo.periodo y bloque_inicio.calendario para filtrar sin joins.
+    # save() los completa; bulk_create/bulk_update deben llamar antes a Clase.sincronizar_ubicacion.
+    periodo = models.ForeignKey(
+        "academics.Periodo", on_delete=models.CASCADE, related_name="+",
+        null=True, blank=True, editable=False, db_index=False,
+    )
+    calendario = models.ForeignKey(
+        Calendario, on_delete=models.CASCADE, related_name="+",
+        null=True, blank=True, editable=False, db_index=False,
+    )
+    # rango [orden_inicio, orden_fin] de Bloque.orden que ocupa la clase (solapes con EXISTS indexado)
+    orden_inicio = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    orden_fin = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+
     class Meta:
         verbose_name = "Clase"
         verbose_name_plural = "Clases"
         indexes = [
             models.Index(fields=["day_of_week", "bloque_inicio"]),
-            models.Index(fields=["docente", "day_of_week", "bloque_inicio"]),
-            models.Index(fields=["ambiente", "day_of_week", "bloque_inicio"]),
-            models.Index(fields=["grupo", "day_of_week", "bloque_inicio"]),
+            models.Index(fields=["docente", "day_of_week", "orden_inicio", "orden_fin"]),
+            models.Index(fields=["ambiente", "day_of_week", "orden_inicio", "orden_fin"]),
+            models.Index(fields=["grupo", "day_of_week", "orden_inicio", "orden_fin"]),
+            models.Index(fields=["calendario", "estado", "day_of_week"]),
+            models.Index(fields=["calendario", "docente", "day_of_week"]),
+            models.Index(fields=["calendario", "ambiente", "day_of_week"]),
+            models.Index(fields=["periodo", "calendario"]),
         ]
         constraints = [
             # Evita duplicar exacta misma clase por grupo en mismo bloque/día
@@ -160,6 +232,46 @@ class Clase(models.Model):
     def __str__(self):
         return f"{self.grupo} {self.get_tipo_display()} · {self.get_day_of_week_display()} #{self.bloque_inicio.orden}"
 
+    # campo guardado -> columnas desnormalizadas que hay que guardar con él
+    DERIVADOS = {
+        "grupo": ("periodo",),
+        "bloque_inicio": ("calendario", "orden_inicio", "orden_fin"),
+        "bloques_duracion": ("orden_fin",),
+    }
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if _toca_derivados(update_fields, self.DERIVADOS):
+            Clase.sincronizar_ubicacion([self])
+            kwargs["update_fields"] = _con_derivados(update_fields, self.DERIVADOS)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def sincronizar_ubicacion(cls, clases) -> None:
+        """
+        Copia grupo.periodo, bloque_inicio.calendario y el rango de órdenes en las columnas desnormalizadas.
+        Usa las relaciones ya cargadas; el resto se resuelve con una consulta por modelo (no una por clase).
+        """
+        from academics.models import Grupo
+
+        clases = list(clases)
+        sin_grupo = {c.grupo_id for c in clases if c.grupo_id and not cls.grupo.is_cached(c)}
+        sin_bloque = {c.bloque_inicio_id for c in clases if c.bloque_inicio_id and not cls.bloque_inicio.is_cached(c)}
+        periodos = dict(Grupo.objects.filter(pk__in=sin_grupo).values_list("id", "periodo_id")) if sin_grupo else {}
+        bloques = ({b_id: (cal_id, orden) for b_id, cal_id, orden in
+                    Bloque.objects.filter(pk__in=sin_bloque).values_list("id", "calendario_id", "orden")}
+                   if sin_bloque else {})
+        for c in clases:
+            if c.grupo_id:
+                c.periodo_id = c.grupo.periodo_id if cls.grupo.is_cached(c) else periodos.get(c.grupo_id)
+            if c.bloque_inicio_id:
+                if cls.bloque_inicio.is_cached(c):
+                    c.calendario_id, orden = c.bloque_inicio.calendario_id, c.bloque_inicio.orden
+                else:
+                    c.calendario_id, orden = bloques.get(c.bloque_inicio_id, (None, None))
+                c.orden_inicio = orden
+                c.orden_fin = orden + c.bloques_duracion - 1 if orden is not None else None
+
 
 class CambioHorario(models.Model):
     """
@@ -271,3 +383,97 @@ class ConflictoHorario(models.Model):
     def __str__(self):
         status = "OK" if self.resuelto else "PEND"
         return f"[{status}] {self.tipo} {self.clase_a_id} vs {self.clase_b_id}"
+
+
+class CargaDocentePeriodo(models.Model):
+    """
+    Carga materializada de un docente en un calendario del periodo (clases no canceladas).
+    La mantiene scheduling.cargas desde las señales de Clase y las escrituras masivas;
+    `python manage.py recalcular_cargas` la reconstruye si se desincroniza.
+    """
+
+    docente = models.ForeignKey(
+        "users.Docente", on_delete=models.CASCADE, related_name="cargas"
+    )
+    periodo = models.ForeignKey(
+        "academics.Periodo", on_delete=models.CASCADE, related_name="cargas_docentes"
+    )
+    calendario = models.ForeignKey(
+        Calendario, on_delete=models.CASCADE, related_name="cargas_docentes"
+    )
+    bloques = models.PositiveIntegerField(default=0)
+    minutos = models.PositiveIntegerField(default=0)
+    clases = models.PositiveIntegerField(default=0)
+    actualizado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Carga de Docente"
+        verbose_name_plural = "Cargas de Docentes"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["docente", "periodo", "calendario"], name="carga_docente_unica_por_periodo_cal"
+            )
+        ]
+        indexes = [models.Index(fields=["periodo", "calendario"])]
+
+    def __str__(self):
+        return f"{self.docente_id} · P{self.periodo_id} C{self.calendario_id}: {self.bloques} bloques"
+
+
+class Job(models.Model):
+    """
+    Operación de planificación larga ejecutada fuera del request por el worker
+    (`python manage.py jobs_worker`). Ver scheduling.jobs.
+    """
+
+    class Tipo(models.TextChoices):
+        ASIGNACION_DOCENTES = "asignacion_docentes", "Asignación de docentes"
+        PROPUESTA_CLASES = "propuesta_clases", "Propuesta de clases"
+        ASIGNACION_AULAS = "asignacion_aulas", "Asignación de aulas"
+        DETECCION_CONFLICTOS = "deteccion_conflictos", "Detección de conflictos"
+        NOTIFICACION_CAMBIO = "notificacion_cambio", "Notificación de cambio de clase"
+
+    class Estado(models.TextChoices):
+        PENDIENTE = "pendiente", "Pendiente"
+        EN_CURSO = "en_curso", "En curso"
+        TERMINADO = "terminado", "Terminado"
+        ERROR = "error", "Error"
+
+    tipo = models.CharField(max_length=32, choices=Tipo.choices)
+    estado = models.CharField(max_length=12, choices=Estado.choices, default=Estado.PENDIENTE)
+    progreso = models.PositiveSmallIntegerField(default=0)  # 0..100
+    parametros = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    resultado = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    creado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="jobs"
+    )
+    creado_en = models.DateTimeField(default=timezone.now)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+        ordering = ("-creado_en",)
+        indexes = [models.Index(fields=["estado", "creado_en"])]
+
+    def __str__(self):
+        return f"Job {self.pk} · {self.tipo} [{self.estado}]"
+
+
+class VersionDatos(models.Model):
+    """
+    Contador de versión de datos derivables (horario de un calendario, catálogo). Fila en la base y
+    no en la cache: nunca se expulsa ni vuelve a 1, y se incrementa atómicamente con F(). Ver scheduling.ocupacion.
+    """
+
+    clave = models.CharField(max_length=64, unique=True)  # "calendario:<id>" | "catalogo"
+    version = models.PositiveBigIntegerField(default=1)
+
+    class Meta:
+        verbose_name = "Versión de datos"
+        verbose_name_plural = "Versiones de datos"
+
+    def __str__(self):
+        return f"{self.clave} v{self.version}"
@@ -0,0 +1,320 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import F
+
+from notifications.bus import publicar_version_calendario
+
+# Recursos exclusivos de una clase: (tipo de conflicto, atributo en Clase)
+RECURSOS = (("DOCENTE", "docente_id"), ("AMBIENTE", "ambiente_id"), ("GRUPO", "grupo_id"))
+
+Clave = Tuple[str, int, int]  # (tipo, recurso_id, day_of_week)
+
+
+def _mascara(orden: int, dur: int) -> int:
+    """
+    Máscara de bits del rango [orden, orden+dur-1] (bit i = bloque con orden i).
+    """
+    if not dur or dur < 0:
+        return 0
+    return ((1 << dur) - 1) << orden
+
+
+class MapaOcupacion:
+    """
+    Ocupación por recurso (docente/ambiente/grupo) y día como máscaras de bits sobre Bloque.orden.
+    Dos clases chocan si comparten recurso y día y el AND de sus máscaras es distinto de 0.
+    """
+
+    def __init__(self):
+        self._mascaras: Dict[Clave, int] = {}
+        self._clases: Dict[Clave, Dict[int, int]] = {}
+        self._por_clase: Dict[int, List[Tuple[Clave, int]]] = {}
+
+    def __len__(self):
+        return len(self._por_clase)
+
+    def __contains__(self, clase_id):
+        return clase_id in self._por_clase
+
+    def agregar(self, clase_id: int, day: int, orden: int, dur: int,
+                docente_id=None, ambiente_id=None, grupo_id=None) -> List[Tuple[str, int]]:
+        """
+        Registra la clase y devuelve [(tipo, otra_clase_id)] con las clases ya registradas que chocan.
+        """
+        if clase_id in self._por_clase:
+            self.quitar(clase_id)
+        m = _mascara(orden, dur)
+        ids = {"docente_id": docente_id, "ambiente_id": ambiente_id, "grupo_id": grupo_id}
+        choques: List[Tuple[str, int]] = []
+        entradas: List[Tuple[Clave, int]] = []
+        for tipo, attr in RECURSOS:
+            rid = ids[attr]
+            if not rid:
+                continue
+            k = (tipo, rid, int(day))
+            if self._mascaras.get(k, 0) & m:
+                choques.extend((tipo, otro) for otro, om in self._clases[k].items() if om & m)
+            self._mascaras[k] = self._mascaras.get(k, 0) | m
+            self._clases.setdefault(k, {})[clase_id] = m
+            entradas.append((k, m))
+        self._por_clase[clase_id] = entradas
+        return choques
+
+    def quitar(self, clase_id: int) -> None:
+        for k, _ in self._por_clase.pop(clase_id, []):
+            clases = self._clases.get(k)
+            if clases is None:
+                continue
+            clases.pop(clase_id, None)
+            if clases:
+                # recomponer: otras clases del mismo recurso/día pueden compartir bits
+                acc = 0
+                for om in clases.values():
+                    acc |= om
+                self._mascaras[k] = acc
+            else:
+                self._clases.pop(k, None)
+                self._mascaras.pop(k, None)
+
+    def mascara(self, tipo: str, recurso_id: int, day: int, excluir: Optional[int] = None) -> int:
+        k = (tipo, recurso_id, int(day))
+        clases = self._clases.get(k)
+        if excluir is None or not clases or excluir not in clases:
+            return self._mascaras.get(k, 0)
+        acc = 0
+        for cid, om in clases.items():
+            if cid != excluir:
+                acc |= om
+        return acc
+
+    def libre(self, tipo: str, recurso_id: int, day: int, orden: int, dur: int) -> bool:
+        return not (self.mascara(tipo, recurso_id, day) & _mascara(orden, dur))
+
+    def choques(self, tipo: str, recurso_id: int, day: int, orden: int, dur: int,
+                excluir: Optional[int] = None) -> List[int]:
+        """
+        Ids de clases del recurso que se solapan con [orden, orden+dur-1] ese día.
+        """
+        k = (tipo, recurso_id, int(day))
+        m = _mascara(orden, dur)
+        if not (self._mascaras.get(k, 0) & m):
+            return []
+        return [cid for cid, om in self._clases[k].items() if om & m and cid != excluir]
+
+
+def _conflictos_por_mascaras(filas: Iterable[Tuple]) -> List[Tuple[str, int, int]]:
+    """
+    filas: (clase_id, day, orden, dur, docente_id, ambiente_id, grupo_id).
+    Devuelve [(tipo, clase_a_id, clase_b_id)] con a registrada antes que b.
+    Costo ~lineal: sólo se comparan clases del mismo recurso/día cuyas máscaras se cruzan.
+    """
+    mapa = MapaOcupacion()
+    hallados = []
+    for cid, day, orden, dur, docente_id, ambiente_id, grupo_id in filas:
+        for tipo, otro in mapa.agregar(cid, day, orden, dur, docente_id, ambiente_id, grupo_id):
+            hallados.append((tipo, otro, cid))
+    return hallados
+
+
+# -------------------------------------------------------------------
+# Índice incremental por calendario (en memoria del proceso)
+# -------------------------------------------------------------------
+
+_VERSION_KEY = "calendario:{}"
+_VERSION_CATALOGO_KEY = "catalogo"
+
+
+def cache_compartida() -> bool:
+    """
+    True si la cache default la ven todos los procesos (Redis, Memcached, base de datos).
+    Con LocMem/Dummy lo que un proceso cachea (respuestas, contadores) no se entera de lo que
+    escriben los demás (otro worker, jobs_worker, notifications_flush).
+    """
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def _version(clave: str) -> int:
+    from scheduling.models import VersionDatos
+
+    return VersionDatos.objects.filter(clave=clave).values_list("version", flat=True).first() or 1
+
+
+def _incrementar(clave: str) -> int:
+    """
+    Incrementa la versión en la base (UPDATE ... SET version = version + 1) y devuelve la nueva.
+    La fila queda bloqueada hasta el final de la transacción: dos incrementos nunca dan el mismo valor.
+    """
+    from scheduling.models import VersionDatos
+
+    with transaction.atomic():
+        if not VersionDatos.objects.filter(clave=clave).update(version=F("version") + 1):
+            VersionDatos.objects.get_or_create(clave=clave)
+            VersionDatos.objects.filter(clave=clave).update(version=F("version") + 1)
+        return VersionDatos.objects.filter(clave=clave).values_list("version", flat=True).get()
+
+
+def version_calendario(calendario_id: int) -> int:
+    """
+    Versión de los datos de horario del calendario. Vive en la base (VersionDatos),
+    así que la ven todos los procesos y nunca se pierde.
+    """
+    return _version(_VERSION_KEY.format(calendario_id))
+
+
+def _incrementar_version(calendario_id: int) -> int:
+    version = _incrementar(_VERSION_KEY.format(calendario_id))
+    # avisar a los clientes suscritos por SSE (notifications.views_stream)
+    publicar_version_calendario(calendario_id, version)
+    return version
+
+
+# Datos de catálogo que se muestran en las grillas pero no cambian la ocupación
+# (nombres de docentes, ambientes, grupos, asignaturas): una versión global aparte
+# para no descartar los índices de ocupación por un cambio de nombre.
+def version_catalogo() -> int:
+    return _version(_VERSION_CATALOGO_KEY)
+
+
+def invalidar_catalogo() -> None:
+    _incrementar(_VERSION_CATALOGO_KEY)
+
+
+class IndiceCalendario:
+    """
+    MapaOcupacion de las clases no canceladas de un calendario, con el orden de sus bloques.
+    Se construye con dos consultas y luego se mantiene con las señales de Clase (scheduling.signals).
+    """
+
+    def __init__(self, calendario_id: int, periodo_id: Optional[int], version: int,
+                 orden_por_bloque: Dict[int, int]):
+        self.calendario_id = calendario_id
+        self.periodo_id = periodo_id
+        self.version = version
+        self.orden_por_bloque = orden_por_bloque
+        self.mapa = MapaOcupacion()
+        self._filas: Dict[int, Tuple] = {}
+        self.lock = threading.RLock()
+
+    @classmethod
+    def construir(cls, calendario_id: int, version: int) -> "IndiceCalendario":
+        from scheduling.models import Bloque, Calendario, Clase
+
+        periodo_id = Calendario.objects.filter(pk=calendario_id).values_list("periodo_id", flat=True).first()
+        orden_por_bloque = dict(Bloque.objects.filter(calendario_id=calendario_id).values_list("id", "orden"))
+        idx = cls(calendario_id, periodo_id, version, orden_por_bloque)
+        filas = (Clase.objects
+                 .filter(calendario_id=calendario_id)
+                 .exclude(estado="cancelado")
+                 .order_by("id")
+                 .values_list("id", "day_of_week", "bloque_inicio_id", "bloques_duracion",
+                              "docente_id", "ambiente_id", "grupo_id"))
+        for cid, day, bloque_id, dur, docente_id, ambiente_id, grupo_id in filas:
+            idx._agregar(cid, day, orden_por_bloque[bloque_id], dur, docente_id, ambiente_id, grupo_id)
+        return idx
+
+    def _agregar(self, cid, day, orden, dur, docente_id, ambiente_id, grupo_id):
+        self._filas[cid] = (cid, day, orden, dur, docente_id, ambiente_id, grupo_id)
+        self.mapa.agregar(cid, day, orden, dur, docente_id, ambiente_id, grupo_id)
+
+    def aplicar(self, clase) -> bool:
+        """
+        Refleja el estado guardado de `clase`. False si su bloque no está en el índice (hay que reconstruir).
+        """
+        with self.lock:
+            self.quitar(clase.id)
+            if clase.estado == "cancelado":
+                return True
+            orden = self.orden_por_bloque.get(clase.bloque_inicio_id)
+            if orden is None:
+                return False
+            self._agregar(clase.id, clase.day_of_week, orden, clase.bloques_duracion,
+                          clase.docente_id, clase.ambiente_id, clase.grupo_id)
+            return True
+
+    def quitar(self, clase_id: int) -> None:
+        with self.lock:
+            self._filas.pop(clase_id, None)
+            self.mapa.quitar(clase_id)
+
+    def libre(self, tipo: str, recurso_id: int, day: int, orden: int, dur: int,
+              excluir: Optional[int] = None) -> bool:
+        return not self.choques(tipo, recurso_id, day, orden, dur, excluir=excluir)
+
+    def choques(self, tipo: str, recurso_id: int, day: int, orden: int, dur: int,
+                excluir: Optional[int] = None) -> List[int]:
+        with self.lock:
+            return self.mapa.choques(tipo, recurso_id, day, orden, dur, excluir=excluir)
+
+    def mascara(self, tipo: str, recurso_id: int, day: int, excluir: Optional[int] = None) -> int:
+        with self.lock:
+            return self.mapa.mascara(tipo, recurso_id, day, excluir=excluir)
+
+    def conflictos(self) -> List[Tuple[str, int, int]]:
+        with self.lock:
+            filas = [self._filas[cid] for cid in sorted(self._filas)]
+        return _conflictos_por_mascaras(filas)
+
+
+_INDICES: Dict[int, IndiceCalendario] = {}
+_INDICES_LOCK = threading.Lock()
+
+
+def indice_calendario(calendario_id: int) -> IndiceCalendario:
+    """
+    Índice del calendario; se (re)construye perezosamente si no existe o si otra escritura
+    (de este u otro proceso) cambió la versión.
+    """
+    version = version_calendario(calendario_id)
+    idx = _INDICES.get(calendario_id)
+    if idx is not None and idx.version == version:
+        return idx
+    idx = IndiceCalendario.construir(calendario_id, version)
+    with _INDICES_LOCK:
+        _INDICES[calendario_id] = idx
+    return idx
+
+
+def invalidar_calendario(calendario_id: int) -> None:
+    """
+    Descarta el índice del calendario en todos los procesos. Usar tras escrituras masivas
+    (bulk_create/bulk_update/update) que no disparan señales.
+    """
+    _incrementar_version(calendario_id)
+    with _INDICES_LOCK:
+        _INDICES.pop(calendario_id, None)
+
+
+def _clase_guardada(clase, calendario_id: int) -> None:
+    version = _incrementar_version(calendario_id)
+    with _INDICES_LOCK:
+        # si la clase cambió de calendario, sacarla de los demás índices
+        for otro in _INDICES.values():
+            if otro.calendario_id != calendario_id:
+                otro.quitar(clase.id)
+        idx = _INDICES.get(calendario_id)
+        if idx is None:
+            return
+        with idx.lock:
+            if idx.version == version - 1 and idx.aplicar(clase):
+                idx.version = version
+            else:
+                _INDICES.pop(calendario_id, None)
+
+
+def _clase_eliminada(clase_id: int, calendario_id: int) -> None:
+    version = _incrementar_version(calendario_id)
+    with _INDICES_LOCK:
+        idx = _INDICES.get(calendario_id)
+        if idx is None:
+            return
+        with idx.lock:
+            if idx.version == version - 1:
+                idx.quitar(clase_id)
+                idx.version = version
+            else:
+                _INDICES.pop(calendario_id, None)
@@ -0,0 +1,129 @@
+"""
+Render del horario semanal en PDF a partir de datos planos (sin ORM), para poder
+ejecutarlo en procesos del pool de exportación por lotes y cachearlo por contenido.
+"""
+import hashlib
+import json
+from io import BytesIO
+from typing import Dict, List, Sequence, Tuple
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+
+from scheduling.layout_texto import envolver
+
+# subir si cambia el diseño: invalida todo lo cacheado en disco
+VERSION_LAYOUT = 1
+
+DOW_LABEL = {1:"Lunes",2:"Martes",3:"Miércoles",4:"Jueves",5:"Viernes",6:"Sábado",7:"Domingo"}
+
+# datos = {
+#   "subtitulo": str,
+#   "dias": [int],
+#   "bloques": [(orden, "HH:MM - HH:MM")],
+#   "clases": [(day_of_week, orden_inicio, duracion, tipo, linea1, linea2)],
+# }
+DatosPDF = Dict[str, object]
+
+
+def huella(datos: DatosPDF) -> str:
+    """
+    Hash del contenido exacto que se dibuja (y de la versión del diseño).
+    """
+    raw = json.dumps([VERSION_LAYOUT, datos], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def render_horario(datos: DatosPDF) -> bytes:
+    dias: List[int] = list(datos["dias"])
+    bloques: Sequence[Tuple[int, str]] = datos["bloques"]
+    bloque_index = {orden: i for i, (orden, _) in enumerate(bloques)}
+
+    buffer = BytesIO()
+    # invariant: sin fecha/ID aleatorio, mismo contenido => mismos bytes
+    c = canvas.Canvas(buffer, pagesize=landscape(A4), invariant=1)
+    page_w, page_h = landscape(A4)
+
+    left, right, top, bottom = 1.2*cm, 1.2*cm, 1.4*cm, 1.2*cm
+    title_h = 0.9*cm
+    header_h = 1.0*cm
+    y0 = page_h - top - title_h
+    time_col_w = 3.2*cm
+    grid_x0 = left + time_col_w
+    grid_y_top = y0 - 0.4*cm
+    grid_w = page_w - right - grid_x0
+    grid_h = grid_y_top - bottom - header_h
+
+    col_count = len(dias)
+    row_count = len(bloques)
+    col_w = grid_w / col_count
+    row_h = grid_h / row_count
+
+    # Título y subtítulo
+    c.setFont("Helvetica-Bold", 13)
+    c.drawString(left, page_h - top, "Horario semanal")
+    c.setFont("Helvetica", 9)
+    c.drawString(left, page_h - top - 0.6*cm, datos["subtitulo"])
+
+    # Encabezado de días
+    c.setFont("Helvetica-Bold", 10)
+    for i, d in enumerate(dias):
+        label = DOW_LABEL.get(d, str(d))
+        x_center = grid_x0 + i*col_w + col_w/2
+        c.drawCentredString(x_center, grid_y_top - 0.75*cm + header_h - 0.65*cm, label)
+
+    # Etiquetas de filas (rangos)
+    c.setFont("Helvetica", 8)
+    for r, (_, rango) in enumerate(bloques):
+        y_center = grid_y_top - header_h - r*row_h - row_h/2
+        c.drawRightString(grid_x0 - 0.15*cm, y_center - 2.5, rango)
+
+    # Grid
+    c.setStrokeColor(colors.black); c.setLineWidth(1)
+    for i in range(col_count + 1):
+        x = grid_x0 + i * col_w
+        c.line(x, grid_y_top - header_h - grid_h, x, grid_y_top - header_h)
+    for r in range(row_count + 1):
+        y = grid_y_top - header_h - r * row_h
+        c.line(grid_x0, y, grid_x0 + grid_w, y)
+    c.line(grid_x0, grid_y_top - header_h, grid_x0 + grid_w, grid_y_top - header_h)
+
+    # Celdas de clases
+    for day, orden, dur, tipo, linea1, linea2 in datos["clases"]:
+        if orden not in bloque_index or day not in dias:
+            continue
+        day_idx = dias.index(day)
+        start_idx = bloque_index[orden]
+        dur = int(dur or 1)
+
+        x = grid_x0 + day_idx*col_w + 0.8
+        y = grid_y_top - header_h - (start_idx + dur)*row_h + 0.8
+        w = col_w - 1.6
+        h = dur*row_h - 1.6
+
+        fill = colors.Color(0.93,0.96,1.0) if tipo == "T" else colors.Color(0.96,0.93,1.0)
+        c.setFillColor(fill); c.setStrokeColor(colors.black)
+        c.rect(x, y, w, h, stroke=1, fill=1)
+
+        c.setFillColor(colors.black)
+        top_pad, left_pad = 2.5, 3.0
+        max_w = w - 2*left_pad
+
+        lines1, size1 = envolver(linea1, max_w, 2, "Helvetica", 8)
+        lines2, size2 = envolver(linea2, max_w, 1, "Helvetica", 7)
+        yy = y + h - top_pad - size1
+        c.setFont("Helvetica-Bold", size1)
+        for L in lines1:
+            c.drawString(x + left_pad, yy, L)
+            yy -= size1 + 1.2
+        c.setFont("Helvetica", size2)
+        if yy - size2 > y + 1.5:
+            c.drawString(x + left_pad, yy, lines2[0])
+
+    c.showPage()
+    c.save()
+    pdf = buffer.getvalue()
+    buffer.close()
+    return pdf
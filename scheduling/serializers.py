@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from datetime import datetime
-from scheduling.models import Calendario, Bloque, Clase, ConflictoHorario, DisponibilidadDocente
+from scheduling.models import Calendario, Bloque, Clase, ConflictoHorario, DisponibilidadDocente, Job
 from users.models import Docente
 
 class CalendarioSerializer(serializers.ModelSerializer):
@@ -60,15 +60,12 @@ class DisponibilidadDocenteSerializer(serializers.ModelSerializer):
             return attrs
         start = b0.orden
         end = start + dur - 1
-        qs = DisponibilidadDocente.objects.filter(docente=docente, calendario=cal, day_of_week=day)
+        qs = DisponibilidadDocente.objects.filter(docente=docente, calendario=cal, day_of_week=day,
+                                                  orden_inicio__lte=end, orden_fin__gte=start)
         if self.instance:
             qs = qs.exclude(pk=self.instance.pk)
-        qs = qs.select_related("bloque_inicio")
-        for d in qs:
-            s2 = d.bloque_inicio.orden
-            e2 = s2 + d.bloques_duracion - 1
-            if not (end < s2 or e2 < start):
-                raise serializers.ValidationError("La disponibilidad se solapa con otra existente.")
+        if qs.exists():
+            raise serializers.ValidationError("La disponibilidad se solapa con otra existente.")
         return attrs
 
 
@@ -79,6 +76,9 @@ class PropuestaDocenteRequestSerializer(serializers.Serializer):
     turno = serializers.IntegerField(required=False)
     persistir = serializers.BooleanField(default=False)  # si True, actualiza grupo.docente
     prefer_especialidad = serializers.BooleanField(default=True)  # filtra por especialidad si es posible
+    # "exacto": backtracking (pocos grupos); "matching": Hungarian polinomial; "auto": elige por tamaño
+    modo = serializers.ChoiceField(choices=["auto", "exacto", "matching"], default="auto")
+    tiempo_max_ms = serializers.IntegerField(default=0, min_value=0, max_value=60000)  # refinamiento local (0 = sin)
 
 class GrupoDocenteSugerenciaSerializer(serializers.Serializer):
     grupo = serializers.IntegerField()
@@ -97,6 +97,7 @@ class PropuestaClasesRequestSerializer(serializers.Serializer):
     reusar_docente_de_grupo = serializers.BooleanField(default=True)  # usa grupo.docente
     persistir = serializers.BooleanField(default=False)               # crea Clase con estado "propuesto"
     max_bloques_por_sesion = serializers.IntegerField(required=False, default=2)  # p.ej. 2×45'=90min
+    tiempo_max_ms = serializers.IntegerField(required=False, default=1000, min_value=0, max_value=60000)  # presupuesto para reparar/mejorar
 
 class ClasePreviewSerializer(serializers.Serializer):
     grupo = serializers.IntegerField()
@@ -137,6 +138,10 @@ class CargaDocenteItemSerializer(serializers.Serializer):
     carga_max_semanal = serializers.IntegerField()
     estado = serializers.ChoiceField(choices=["BAJO", "OK", "EXCESO"])
     clases = serializers.IntegerField()
+    bloques = serializers.IntegerField()
+    minutos = serializers.IntegerField()
+    # {"dia"|"turno"|"tipo": {clave: {"clases", "horas_45"}}}, sólo con ?desglose=
+    desglose = serializers.DictField(required=False)
 
 class CargaDocenteResponseSerializer(serializers.Serializer):
     periodo = serializers.IntegerField()
@@ -226,6 +231,48 @@ class DragDropMoveResponseSerializer(serializers.Serializer):
     clase = ClaseDetailSerializer()
     conflictos = serializers.ListField(child=serializers.DictField(), required=False)
 
+class DragDropProbeTargetSerializer(serializers.Serializer):
+    day_of_week = serializers.IntegerField(min_value=1, max_value=7)
+    bloque_inicio = serializers.IntegerField()
+    bloques_duracion = serializers.IntegerField(required=False, min_value=1)
+
+class DragDropProbeRequestSerializer(serializers.Serializer):
+    clase = serializers.IntegerField()
+    bloques_duracion = serializers.IntegerField(required=False, min_value=1)  # por defecto, la de la clase
+    destinos = DragDropProbeTargetSerializer(many=True)
+
+class DragDropProbeItemSerializer(serializers.Serializer):
+    day_of_week = serializers.IntegerField()
+    bloque_inicio = serializers.IntegerField()
+    bloques_duracion = serializers.IntegerField()
+    valido = serializers.BooleanField()
+    conflictos = serializers.ListField(child=serializers.DictField())
+    detalle = serializers.CharField(allow_blank=True)
+
+class DragDropProbeResponseSerializer(serializers.Serializer):
+    clase = serializers.IntegerField()
+    destinos = DragDropProbeItemSerializer(many=True)
+
+class DragDropMapaRequestSerializer(serializers.Serializer):
+    clase = serializers.IntegerField()
+    bloques_duracion = serializers.IntegerField(required=False, min_value=1)  # por defecto, la de la clase
+    dias = serializers.ListField(child=serializers.IntegerField(min_value=1, max_value=7), required=False)
+
+class DragDropMapaBloqueSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    orden = serializers.IntegerField()
+
+class DragDropMapaFilaSerializer(serializers.Serializer):
+    day_of_week = serializers.IntegerField()
+    celdas = serializers.ListField(child=serializers.ChoiceField(
+        choices=["libre", "grupo", "docente", "ambiente", "fuera_disponibilidad", "fuera_grilla"]))
+
+class DragDropMapaResponseSerializer(serializers.Serializer):
+    clase = serializers.IntegerField()
+    bloques_duracion = serializers.IntegerField()
+    bloques = DragDropMapaBloqueSerializer(many=True)  # columnas de `celdas`, por orden
+    filas = DragDropMapaFilaSerializer(many=True)
+
 
 class SubstitucionSuggestRequestSerializer(serializers.Serializer):
     clase = serializers.IntegerField()
@@ -299,4 +346,19 @@ class ClasePreviewSerializer(serializers.ModelSerializer):
             "docente",          # id o null
             "ambiente",         # id o null
             "docente_substituto" # id o null
-        ]
\ No newline at end of file
+        ]
+
+# ====== Jobs (operaciones largas en segundo plano) ======
+
+class JobSerializer(serializers.ModelSerializer):
+    duracion_ms = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ["id", "tipo", "estado", "progreso", "parametros", "resultado", "error",
+                  "creado_en", "iniciado_en", "terminado_en", "duracion_ms"]
+
+    def get_duracion_ms(self, obj) -> int | None:
+        if not obj.iniciado_en or not obj.terminado_en:
+            return None
+        return int((obj.terminado_en - obj.iniciado_en).total_seconds() * 1000)
@@ -0,0 +1,123 @@
+from types import SimpleNamespace
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from academics.models import Asignatura, Grupo
+from facilities.models import Ambiente, Edificio, TipoAmbiente
+from scheduling.models import Bloque, Clase, DisponibilidadDocente
+from users.models import Docente
+from . import cargas, ocupacion
+
+
+def _calendario_de(clase):
+    if clase.calendario_id:
+        return clase.calendario_id
+    if Clase.bloque_inicio.is_cached(clase):
+        return clase.bloque_inicio.calendario_id
+    return Bloque.objects.filter(pk=clase.bloque_inicio_id).values_list("calendario_id", flat=True).first()
+
+
+def _foto(clase):
+    # copia de lo que usa el índice; la instancia puede seguir mutando antes del commit
+    return SimpleNamespace(
+        id=clase.id, estado=clase.estado, day_of_week=clase.day_of_week,
+        bloque_inicio_id=clase.bloque_inicio_id, bloques_duracion=clase.bloques_duracion,
+        docente_id=clase.docente_id, ambiente_id=clase.ambiente_id, grupo_id=clase.grupo_id,
+    )
+
+
+@receiver(post_save, sender=Clase)
+def clase_guardada(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    cal_id = _calendario_de(instance)
+    if cal_id is None:
+        return
+    foto = _foto(instance)
+    transaction.on_commit(lambda: ocupacion._clase_guardada(foto, cal_id))
+
+
+@receiver(post_delete, sender=Clase)
+def clase_eliminada(sender, instance, **kwargs):
+    if instance.docente_id:
+        cargas.recalcular_al_confirmar(docente_ids=[instance.docente_id])
+    cal_id = _calendario_de(instance)
+    if cal_id is None:
+        return
+    clase_id = instance.id
+    transaction.on_commit(lambda: ocupacion._clase_eliminada(clase_id, cal_id))
+
+
+# campos de Clase que cambian la carga materializada (nombre o attname en update_fields)
+_CAMPOS_CARGA = {"docente", "docente_id", "grupo", "grupo_id", "bloque_inicio", "bloque_inicio_id",
+                 "bloques_duracion", "estado"}
+
+
+@receiver(post_init, sender=Clase)
+def clase_cargada(sender, instance, **kwargs):
+    # docente con el que se leyó la fila; si se reasigna, hay que recalcular también al anterior.
+    # Por __dict__ para no disparar una consulta si el campo vino diferido (.only/.defer).
+    instance._docente_previo = instance.__dict__.get("docente_id")
+
+
+@receiver(post_save, sender=Clase)
+def clase_guardada_carga(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not _CAMPOS_CARGA & set(update_fields)):
+        return
+    docentes = {instance.docente_id, getattr(instance, "_docente_previo", None)} - {None}
+    instance._docente_previo = instance.docente_id
+    if docentes:
+        cargas.recalcular_al_confirmar(docente_ids=docentes)
+
+
+@receiver(post_save, sender=Grupo)
+def grupo_guardado_ubicacion(sender, instance, raw=False, **kwargs):
+    # Clase.periodo es copia de grupo.periodo
+    if raw:
+        return
+    movidas = Clase.objects.filter(grupo=instance).exclude(periodo_id=instance.periodo_id)
+    docentes = set(movidas.exclude(docente__isnull=True).values_list("docente_id", flat=True))
+    if movidas.update(periodo_id=instance.periodo_id) and docentes:
+        # sin filtro de periodo: se reescribe el nuevo y se borran las filas que quedaron vacías en el viejo
+        cargas.recalcular_al_confirmar(docente_ids=docentes)
+
+
+@receiver(post_save, sender=Bloque)
+def bloque_guardado_ubicacion(sender, instance, raw=False, **kwargs):
+    # Clase.calendario y orden_inicio/orden_fin (también en DisponibilidadDocente) copian el bloque de inicio
+    if raw:
+        return
+    orden_fin = F("bloques_duracion") + (instance.orden - 1)
+    (Clase.objects.filter(bloque_inicio=instance)
+     .exclude(calendario_id=instance.calendario_id, orden_inicio=instance.orden)
+     .update(calendario_id=instance.calendario_id, orden_inicio=instance.orden, orden_fin=orden_fin))
+    (DisponibilidadDocente.objects.filter(bloque_inicio=instance).exclude(orden_inicio=instance.orden)
+     .update(orden_inicio=instance.orden, orden_fin=orden_fin))
+
+
+@receiver(post_save, sender=Bloque)
+@receiver(post_delete, sender=Bloque)
+def bloque_cambiado(sender, instance, **kwargs):
+    cal_id = instance.calendario_id
+    transaction.on_commit(lambda: ocupacion.invalidar_calendario(cal_id))
+    if kwargs.get("signal") is post_save:
+        # duracion_min cambia los minutos de la carga
+        cargas.recalcular_al_confirmar(calendario_id=cal_id)
+
+
+@receiver(post_save, sender=Ambiente)
+@receiver(post_delete, sender=Ambiente)
+@receiver(post_save, sender=Docente)
+@receiver(post_delete, sender=Docente)
+@receiver(post_save, sender=Grupo)
+@receiver(post_delete, sender=Grupo)
+@receiver(post_save, sender=Asignatura)
+@receiver(post_delete, sender=Asignatura)
+@receiver(post_save, sender=Edificio)
+@receiver(post_save, sender=TipoAmbiente)
+def catalogo_cambiado(sender, instance, **kwargs):
+    # nombres/códigos que aparecen en la grilla
+    transaction.on_commit(ocupacion.invalidar_catalogo)
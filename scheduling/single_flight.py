@@ -0,0 +1,112 @@
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from hashlib import sha1
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+# segundos que espera un request idéntico antes de calcular por su cuenta
+ESPERA_MAX = 30.0
+
+
+class _Vuelo:
+    def __init__(self):
+        self.listo = threading.Event()
+        self.foto = None  # respuesta del líder, copiada para poder clonarla
+        self.ok = False
+
+
+_VUELOS: Dict[str, _Vuelo] = {}
+_VUELOS_LOCK = threading.Lock()
+
+
+def _foto(resp):
+    headers = list(resp.items())
+    if isinstance(resp, Response):
+        return ("drf", resp.data, resp.status_code, headers)
+    return ("http", resp.content, resp.status_code, headers)
+
+
+def _clonar(foto):
+    tipo, cuerpo, status, headers = foto
+    if tipo == "drf":
+        resp = Response(cuerpo, status=status)
+    else:
+        resp = HttpResponse(cuerpo, status=status)
+    for k, v in headers:
+        resp[k] = v
+    return resp
+
+
+@contextmanager
+def _lock_cache(clave: str, espera: float):
+    """
+    Lock entre procesos con cache.add (atómico en Redis/Memcached/LocMem).
+    Si no se consigue a tiempo se sigue sin lock: nunca bloquea indefinidamente.
+    """
+    key = f"scheduling:singleflight:{sha1(clave.encode()).hexdigest()}"
+    token = uuid.uuid4().hex
+    fin = time.monotonic() + espera
+    tomado = cache.add(key, token, int(espera) + 1)
+    while not tomado and time.monotonic() < fin:
+        time.sleep(0.05)
+        tomado = cache.add(key, token, int(espera) + 1)
+    try:
+        yield
+    finally:
+        if tomado and cache.get(key) == token:
+            cache.delete(key)
+
+
+def single_flight(clave: Callable[..., Optional[str]], espera: float = ESPERA_MAX,
+                  lock_distribuido: Optional[bool] = None):
+    """
+    Decorador para vistas de lectura caras: el primer request de una clave calcula la respuesta
+    y los requests idénticos concurrentes del mismo proceso esperan y reciben una copia.
+    - clave(request, *args, **kwargs) -> str o None (None = no coalescer).
+    - lock_distribuido: además serializa por clave entre procesos con un lock en la cache de Django
+      (default: settings.SCHEDULING_SINGLE_FLIGHT_DISTRIBUIDO). Los demás procesos esperan el lock y
+      luego ejecutan la vista, así que sólo ahorra trabajo si la vista tiene su propia cache.
+    Colocar debajo de @api_view/@permission_classes para que los permisos se validen antes.
+    """
+    def deco(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            k = clave(request, *args, **kwargs)
+            if k is None:
+                return view(request, *args, **kwargs)
+            k = f"{view.__module__}.{view.__name__}:{k}"
+
+            with _VUELOS_LOCK:
+                vuelo = _VUELOS.get(k)
+                lider = vuelo is None
+                if lider:
+                    vuelo = _VUELOS[k] = _Vuelo()
+
+            if not lider:
+                if vuelo.listo.wait(espera) and vuelo.ok:
+                    return _clonar(vuelo.foto)
+                # el líder falló o tardó demasiado: calcular por cuenta propia
+                return view(request, *args, **kwargs)
+
+            distribuido = lock_distribuido
+            if distribuido is None:
+                distribuido = getattr(settings, "SCHEDULING_SINGLE_FLIGHT_DISTRIBUIDO", False)
+            try:
+                with _lock_cache(k, espera) if distribuido else nullcontext():
+                    resp = view(request, *args, **kwargs)
+                vuelo.foto = _foto(resp)
+                vuelo.ok = True
+                return resp
+            finally:
+                with _VUELOS_LOCK:
+                    _VUELOS.pop(k, None)
+                vuelo.listo.set()
+        return wrapper
+    return deco
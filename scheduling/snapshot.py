@@ -0,0 +1,120 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple
+
+from scheduling.cargas import cargas_del_periodo
+from scheduling.models import Bloque, Clase, DisponibilidadDocente
+from users.models import Docente
+
+DIAS = range(1, 8)
+TimeCell = Tuple[int, int]
+
+
+def _vacio() -> List[int]:
+    # índice = day_of_week (0 sin uso); cada entrada es una máscara sobre la posición del bloque
+    return [0] * 8
+
+
+@dataclass
+class SnapshotPlanificacion:
+    """
+    Foto en memoria de un período/calendario para los planificadores: bloques, disponibilidad,
+    ocupación y carga de docentes y grupos. Las ocupaciones son arreglos densos por día de
+    máscaras de bits sobre la posición del bloque (0 = primer bloque por orden).
+    """
+    periodo_id: int
+    calendario_id: int
+    id_por_idx: List[int]
+    idx_por_bloque: Dict[int, int]
+    docentes: Dict[int, Docente]
+    disp_docente: Dict[int, List[int]] = field(default_factory=dict)
+    ocup_docente: Dict[int, List[int]] = field(default_factory=dict)
+    ocup_grupo: Dict[int, List[int]] = field(default_factory=dict)
+    ocup_ambiente: Dict[int, List[int]] = field(default_factory=dict)
+    carga_docente: Dict[int, int] = field(default_factory=dict)
+    # preferencia declarada por celda: {docente_id: {(día, posición): peso}}
+    pref_docente: Dict[int, Dict[TimeCell, int]] = field(default_factory=dict)
+    # bloques ya programados por (grupo_id, tipo) en este calendario
+    bloques_grupo_tipo: Dict[Tuple[int, str], int] = field(default_factory=dict)
+
+    def mascara(self, bloque_id: int, dur: int) -> int:
+        """
+        Máscara de bloque_id + dur bloques consecutivos por orden (recortada al final de la grilla).
+        """
+        i = self.idx_por_bloque.get(bloque_id)
+        if i is None or dur <= 0:
+            return 0
+        dur = min(dur, len(self.id_por_idx) - i)
+        return ((1 << dur) - 1) << i
+
+    def celdas(self, mascaras: List[int]) -> Set[TimeCell]:
+        """
+        Expande un arreglo por día a celdas (día, bloque_id).
+        """
+        out: Set[TimeCell] = set()
+        for day in DIAS:
+            m = mascaras[day]
+            while m:
+                low = m & -m
+                out.add((day, self.id_por_idx[low.bit_length() - 1]))
+                m ^= low
+        return out
+
+    def ocupacion_grupo(self, grupo_id: int) -> List[int]:
+        return self.ocup_grupo.get(grupo_id) or _vacio()
+
+    def ocupacion_docente(self, docente_id: int) -> List[int]:
+        return self.ocup_docente.get(docente_id) or _vacio()
+
+    def disponibilidad_docente(self, docente_id: int) -> List[int]:
+        return self.disp_docente.get(docente_id) or _vacio()
+
+    def ocupacion_ambiente(self, ambiente_id: int) -> List[int]:
+        return self.ocup_ambiente.get(ambiente_id) or _vacio()
+
+
+def cargar_snapshot(periodo_id: int, calendario_id: int,
+                    excluir_canceladas: bool = False) -> SnapshotPlanificacion:
+    """
+    Carga todo en 5 consultas, sin importar cuántos docentes o grupos haya.
+    Con excluir_canceladas, las clases canceladas no ocupan celdas (nunca suman carga: ver CargaDocentePeriodo).
+    """
+    id_por_idx = list(Bloque.objects.filter(calendario_id=calendario_id)
+                      .order_by("orden").values_list("id", flat=True))
+    snap = SnapshotPlanificacion(
+        periodo_id=periodo_id,
+        calendario_id=calendario_id,
+        id_por_idx=id_por_idx,
+        idx_por_bloque={b_id: i for i, b_id in enumerate(id_por_idx)},
+        docentes={d.id: d for d in Docente.objects.filter(activo=True)},
+    )
+
+    disp = (DisponibilidadDocente.objects
+            .filter(calendario_id=calendario_id)
+            .values_list("docente_id", "day_of_week", "bloque_inicio_id", "bloques_duracion", "preferencia"))
+    for docente_id, day, bloque_id, dur, preferencia in disp:
+        m = snap.mascara(bloque_id, dur)
+        snap.disp_docente.setdefault(docente_id, _vacio())[day] |= m
+        if preferencia:
+            prefs = snap.pref_docente.setdefault(docente_id, {})
+            i = snap.idx_por_bloque.get(bloque_id, 0)
+            for pos in range(i, i + m.bit_count()):
+                prefs[(day, pos)] = max(prefs.get((day, pos), preferencia), preferencia)
+
+    # carga en todo el periodo (todos sus calendarios), desde la tabla materializada
+    snap.carga_docente = cargas_del_periodo(periodo_id)
+
+    clases = Clase.objects.filter(periodo_id=periodo_id, calendario_id=calendario_id)
+    if excluir_canceladas:
+        clases = clases.exclude(estado="cancelado")
+    filas = clases.values_list("grupo_id", "docente_id", "ambiente_id", "tipo", "day_of_week",
+                               "bloque_inicio_id", "bloques_duracion")
+    for grupo_id, docente_id, ambiente_id, tipo, day, bloque_id, dur in filas:
+        m = snap.mascara(bloque_id, dur)
+        snap.ocup_grupo.setdefault(grupo_id, _vacio())[day] |= m
+        if docente_id:
+            snap.ocup_docente.setdefault(docente_id, _vacio())[day] |= m
+        if ambiente_id:
+            snap.ocup_ambiente.setdefault(ambiente_id, _vacio())[day] |= m
+        clave = (grupo_id, tipo)
+        snap.bloques_grupo_tipo[clave] = snap.bloques_grupo_tipo.get(clave, 0) + (dur or 0)
+    return snap
@@ -9,10 +9,11 @@ from .views import (
 from .views_conflictos import conflictos_detectar_view, conflictos_list_view, conflictos_resolver_view
 from .views_cargas import cargas_docentes_view
 from .views_aulas import asignar_aulas_view
-from .views_grid import grid_semana_view
-from .views_dragdrop import dnd_mover_clase_view
+from .views_grid import grid_semana_view, grid_cache_stats_view
+from .views_dragdrop import dnd_mover_clase_view, dnd_probar_destinos_view, dnd_mapa_destinos_view
 from .views_substitucion import clase_set_substituto_view, clases_por_calendario_list_view
-from .views_export import export_pdf_view
+from .views_export import export_pdf_view, export_pdf_lote_view
+from .views_jobs import job_detalle_view
 
 from rest_framework.routers import SimpleRouter
 from .crud_views import CalendarioViewSet
@@ -57,11 +58,18 @@ urlpatterns = [
 
         # HU015
     path("grid/semana/", grid_semana_view),
+    path("grid/cache/", grid_cache_stats_view),
 
     # HU016
     path("dnd/mover/", dnd_mover_clase_view),
+    path("dnd/probar/", dnd_probar_destinos_view),
+    path("dnd/mapa/", dnd_mapa_destinos_view),
 
     path("export/pdf/", export_pdf_view),
+    path("export/pdf/lote/", export_pdf_lote_view),
+
+    # Jobs en segundo plano (async=true)
+    path("jobs/<int:pk>/", job_detalle_view),
     path("clasesPrev/<int:pk>/substituto/", clase_set_substituto_view, name="clase-set-substituto"),
     path("clasesPrev/", clases_por_calendario_list_view, name="clases-por-calendario"),
 ]
@@ -0,0 +1,123 @@
+"""
+Validación en memoria de escrituras masivas de clases (academics.views_clases, ClasesBulk*APIView).
+La ocupación de los calendarios afectados se lee una vez y cada clase se valida contra ella y contra
+las ya aceptadas del mismo pedido. Motivos: GRUPO / DOCENTE / AMBIENTE (solape de bloques ese día)
+y DUPLICADO (mismo grupo, día y bloque de inicio: restricción clase_unica_por_grupo_dia_bloque).
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from scheduling.models import Bloque, Clase
+from scheduling.ocupacion import RECURSOS, MapaOcupacion
+
+ETIQUETAS = {"GRUPO": "grupo", "DOCENTE": "docente", "AMBIENTE": "ambiente"}
+
+ClaveUnica = Tuple[int, int, int]  # (grupo_id, day_of_week, bloque_inicio_id)
+
+
+def ref_item(indice: int) -> int:
+    """
+    Referencia de un ítem del pedido que todavía no tiene id (negativa para no chocar con ids de Clase).
+    """
+    return -(indice + 1)
+
+
+def motivo(tipo: str, ref: int) -> dict:
+    if ref < 0:
+        return {"tipo": tipo, "index": -ref - 1}
+    return {"tipo": tipo, "clase": ref}
+
+
+def detalle(motivos: List[dict]) -> str:
+    partes = []
+    for m in motivos:
+        con = f"la clase {m['clase']}" if "clase" in m else f"el ítem {m['index']}"
+        if m["tipo"] == "DUPLICADO":
+            partes.append(f"duplica {con} (mismo grupo, día y bloque de inicio)")
+        else:
+            partes.append(f"{ETIQUETAS[m['tipo']]} ocupado por {con}")
+    return "Conflicto: " + "; ".join(partes) + "."
+
+
+class OcupacionLote:
+    """
+    Foto de los calendarios: bloques (id -> calendario, orden), un MapaOcupacion por calendario
+    con las clases no canceladas y las claves únicas de todas. Dos consultas.
+    """
+
+    def __init__(self, calendario_ids: Iterable[int]):
+        ids = set(calendario_ids)
+        self.bloques: Dict[int, Tuple[int, int]] = {
+            b_id: (cal_id, orden)
+            for b_id, cal_id, orden in Bloque.objects.filter(calendario_id__in=ids).values_list("id", "calendario_id", "orden")
+        }
+        self.mapas: Dict[int, MapaOcupacion] = {c: MapaOcupacion() for c in ids}
+        self.unicas: Dict[ClaveUnica, int] = {}
+        self._unica_de: Dict[int, ClaveUnica] = {}
+        self._calendario_de: Dict[int, int] = {}
+        filas = (Clase.objects
+                 .filter(calendario_id__in=ids)
+                 .order_by("id")
+                 .values_list("id", "grupo_id", "day_of_week", "bloque_inicio_id", "bloques_duracion",
+                              "docente_id", "ambiente_id", "estado"))
+        for cid, grupo_id, day, bloque_id, dur, docente_id, ambiente_id, estado in filas:
+            self._registrar(cid, grupo_id, day, bloque_id, dur, docente_id, ambiente_id, estado)
+
+    def _registrar(self, ref, grupo_id, day, bloque_id, dur, docente_id, ambiente_id, estado) -> None:
+        clave = (grupo_id, day, bloque_id)
+        self.unicas[clave] = ref
+        self._unica_de[ref] = clave
+        if estado == Clase.Estado.CANCELADO:
+            return
+        cal_id, orden = self.bloques[bloque_id]
+        self._calendario_de[ref] = cal_id
+        self.mapas[cal_id].agregar(ref, day, orden, dur, docente_id, ambiente_id, grupo_id)
+
+    def quitar(self, ref: int) -> None:
+        clave = self._unica_de.pop(ref, None)
+        if clave is not None and self.unicas.get(clave) == ref:
+            del self.unicas[clave]
+        cal_id = self._calendario_de.pop(ref, None)
+        if cal_id is not None:
+            self.mapas[cal_id].quitar(ref)
+
+    def conflictos(self, ref: int, clase: Clase) -> List[dict]:
+        """
+        Motivos por los que `clase` no entra en la foto (vacío si entra). `ref` se ignora al comparar.
+        """
+        motivos: List[dict] = []
+        otro = self.unicas.get((clase.grupo_id, clase.day_of_week, clase.bloque_inicio_id))
+        if otro is not None and otro != ref:
+            motivos.append(motivo("DUPLICADO", otro))
+        if clase.estado == Clase.Estado.CANCELADO:
+            return motivos
+        cal_id, orden = self.bloques[clase.bloque_inicio_id]
+        mapa = self.mapas[cal_id]
+        for tipo, attr in RECURSOS:
+            rid = getattr(clase, attr)
+            if not rid:
+                continue
+            for otro in mapa.choques(tipo, rid, clase.day_of_week, orden, clase.bloques_duracion, excluir=ref):
+                motivos.append(motivo(tipo, otro))
+        return motivos
+
+    def reservar(self, ref: int, clase: Clase) -> List[dict]:
+        """
+        Valida `clase` y, si entra, la registra con la referencia `ref` (reemplazando lo que tuviera).
+        Devuelve los motivos de conflicto; vacío = aceptada.
+        """
+        motivos = self.conflictos(ref, clase)
+        if not motivos:
+            self.registrar(ref, clase)
+        return motivos
+
+    def registrar(self, ref: int, clase) -> None:
+        """
+        Registra `clase` con la referencia `ref` sin validar (p.ej. para devolverla a su posición previa).
+        """
+        self.quitar(ref)
+        self._registrar(ref, clase.grupo_id, clase.day_of_week, clase.bloque_inicio_id,
+                        clase.bloques_duracion, clase.docente_id, clase.ambiente_id, clase.estado)
+
+    def calendario(self, bloque_id: int) -> Optional[int]:
+        info = self.bloques.get(bloque_id)
+        return info[0] if info else None
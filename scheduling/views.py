@@ -7,18 +7,18 @@ from rest_framework.response import Response
 from rest_framework import status
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
 import csv, io
-from django.db.models import Sum, F
+from django.db.models import F
 from academics.models import Asignatura, Grupo
-from scheduling.helpers import _bloques_requeridos, _dia_ints, _hay_clase_para_docente, _ventanas_disponibles
+from scheduling.helpers import _bloques_requeridos, _dia_ints
 from users.models import Docente
 from users.permissions import IsManagerOrStaff, IsTeacherOrManager
-from scheduling.models import Calendario, Bloque, Clase, DiaSemana, DisponibilidadDocente
+from scheduling.models import Calendario, Bloque, Clase, DiaSemana, DisponibilidadDocente, Job
+from scheduling.jobs import encolar, es_async, respuesta_encolado
 from scheduling.serializers import CalendarioSerializer, BloqueSerializer, DisponibilidadDocenteSerializer, PropuestaClasesRequestSerializer, PropuestaClasesResponseSerializer, PropuestaDocenteRequestSerializer, PropuestaDocenteResponseSerializer
-from django.db.models.functions import Coalesce
 
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from django.db.models import Q
 from rest_framework.decorators import api_view, permission_classes
@@ -26,6 +26,13 @@ from rest_framework.response import Response
 
 from academics.models import Grupo
 from scheduling.models import Clase, Bloque, Calendario, DisponibilidadDocente
+from scheduling.asignacion import asignar_por_matching
+from scheduling.snapshot import DIAS, cargar_snapshot
+from scheduling.generador import GeneradorHorario, Sesion, dividir_en_sesiones
+from scheduling.ocupacion import invalidar_calendario
+from scheduling.cargas import recalcular as recalcular_cargas
+from scheduling.importacion import LOTE as LOTE_IMPORTACION, MODOS as MODOS_IMPORTACION, ImportadorDisponibilidad
+from facilities.models import Ambiente
 
 
 # ---- HU008: Calendario y Bloques ----
@@ -186,6 +193,10 @@ def disponibilidad_delete_view(request, pk: int):
 @extend_schema(
     tags=["disponibilidad"],
     request=None,  # file multipart
+    parameters=[
+        OpenApiParameter("modo", str, OpenApiParameter.QUERY, description="agregar (default) | reemplazar"),
+        OpenApiParameter("lote", int, OpenApiParameter.QUERY, description="filas por transacción (default 1000)"),
+    ],
     responses={201: dict},
     examples=[OpenApiExample("CSV ejemplo (cabeceras)", value="docente,calendario,day_of_week,bloque_inicio,bloques_duracion,preferencia\n12,1,1,3,2,1")],
 )
@@ -195,21 +206,24 @@ def disponibilidad_import_csv_view(request):
     """
     Carga CSV con columnas:
     docente,calendario,day_of_week,bloque_inicio,bloques_duracion,preferencia
+    Se procesa por lotes (ver scheduling.importacion). modo=reemplazar borra antes la disponibilidad
+    de cada (docente, calendario) presente en el archivo. Los errores indican la línea del archivo.
     """
     if "file" not in request.FILES:
         return Response({"detail": "Adjunta 'file' CSV."}, status=400)
+    modo = request.query_params.get("modo") or request.data.get("modo") or "agregar"
+    if modo not in MODOS_IMPORTACION:
+        return Response({"detail": "modo debe ser agregar o reemplazar."}, status=400)
+    try:
+        lote = int(request.query_params.get("lote") or request.data.get("lote") or LOTE_IMPORTACION)
+    except ValueError:
+        return Response({"detail": "lote debe ser un entero."}, status=400)
+
     f = request.FILES["file"]
-    text = io.TextIOWrapper(f.file, encoding="utf-8")
+    text = io.TextIOWrapper(f.file, encoding="utf-8-sig", newline="")
     reader = csv.DictReader(text)
-    created, errors = 0, []
-    with transaction.atomic():
-        for i, row in enumerate(reader, start=2):
-            ser = DisponibilidadDocenteSerializer(data=row)
-            if ser.is_valid():
-                ser.save(); created += 1
-            else:
-                errors.append({"row": i, "errors": ser.errors})
-    return Response({"created": created, "errors": errors}, status=201)
+    resultado = ImportadorDisponibilidad(modo=modo, lote=lote).importar(reader)
+    return Response(resultado, status=201)
 
 
 
@@ -218,86 +232,6 @@ def disponibilidad_import_csv_view(request):
 
 TimeCell = Tuple[int, int]
 
-def _bloque_maps(calendario_id: int):
-    """
-    Retorna ayudas para expandir duraciones por orden de bloque.
-    """
-    bloques = list(Bloque.objects.filter(calendario_id=calendario_id).order_by("orden").only("id", "orden"))
-    id_by_idx = [b.id for b in bloques]
-    idx_by_id = {b.id: i for i, b in enumerate(bloques)}
-    return id_by_idx, idx_by_id
-
-def _expand_por_duracion(bloque_inicio_id: int, duracion: int, id_by_idx: List[int], idx_by_id: Dict[int, int]) -> List[int]:
-    """
-    Expande un bloque_inicio + duracion (en # de bloques) a la lista de bloque_ids consecutivos por ORDEN.
-    """
-    start_idx = idx_by_id[bloque_inicio_id]
-    end_idx = start_idx + duracion
-    # recorte defensivo por si alguien configuró duraciones más largas que la grilla
-    end_idx = min(end_idx, len(id_by_idx))
-    return id_by_idx[start_idx:end_idx]
-
-def _bloques_del_grupo(grupo_id: int, calendario_id: int) -> Set[TimeCell]:
-    """
-    Devuelve el conjunto de celdas (día, bloque_id) donde el grupo YA tiene clases programadas.
-    """
-    id_by_idx, idx_by_id = _bloque_maps(calendario_id)
-    celdas: Set[TimeCell] = set()
-    qs = (Clase.objects.filter(grupo_id=grupo_id)
-          .select_related("bloque_inicio")
-          .only("day_of_week", "bloque_inicio_id", "bloques_duracion"))
-    for c in qs:
-        for b_id in _expand_por_duracion(c.bloque_inicio_id, c.bloques_duracion, id_by_idx, idx_by_id):
-            celdas.add((int(c.day_of_week), int(b_id)))
-    return celdas
-
-def _bloques_disponibles_docente(docente_id: int, calendario_id: int) -> Set[TimeCell]:
-    """
-    Set de celdas (día, bloque_id) donde el docente marcó disponibilidad.
-    """
-    id_by_idx, idx_by_id = _bloque_maps(calendario_id)
-    disp: Set[TimeCell] = set()
-    qs = (DisponibilidadDocente.objects
-          .filter(docente_id=docente_id, calendario_id=calendario_id)
-          .select_related("bloque_inicio")
-          .only("day_of_week", "bloque_inicio_id", "bloques_duracion"))
-    for r in qs:
-        for b_id in _expand_por_duracion(r.bloque_inicio_id, r.bloques_duracion, id_by_idx, idx_by_id):
-            disp.add((int(r.day_of_week), int(b_id)))
-    return disp
-
-def _bloques_ocupados_docente_en_periodo(docente_id: int, periodo_id: int) -> Set[TimeCell]:
-    """
-    Set de celdas ya ocupadas por clases del docente en el período (para evitar choques).
-    """
-    celdas: Set[TimeCell] = set()
-    qs = (Clase.objects
-          .filter(docente_id=docente_id, grupo__periodo_id=periodo_id)
-          .select_related("bloque_inicio")
-          .only("day_of_week", "bloque_inicio_id", "bloques_duracion"))
-    # Necesitamos calendario para expandir; tomamos el calendario del primer bloque encontrado
-    # Si manejas múltiples calendarios por período, conviene pasar calendario_id desde la view.
-    # Aquí expandimos por ORDEN usando el calendario del bloque_inicio.
-    # Como Bloque tiene orden por calendario, hacemos un cache local por calendario.
-    cache_maps: Dict[int, Tuple[List[int], Dict[int, int]]] = {}
-
-    for c in qs:
-        cal_id = c.bloque_inicio.calendario_id
-        if cal_id not in cache_maps:
-            cache_maps[cal_id] = _bloque_maps(cal_id)
-        id_by_idx, idx_by_id = cache_maps[cal_id]
-        for b_id in _expand_por_duracion(c.bloque_inicio_id, c.bloques_duracion, id_by_idx, idx_by_id):
-            celdas.add((int(c.day_of_week), int(b_id)))
-    return celdas
-
-def _carga_actual_en_bloques(docente_id: int, periodo_id: int) -> int:
-    """
-    Suma de bloques (bloques_duracion) del docente en el período.
-    """
-    return (Clase.objects
-            .filter(docente_id=docente_id, grupo__periodo_id=periodo_id)
-            .aggregate(total=Coalesce(Sum("bloques_duracion"), 0))["total"])  # type: ignore
-
 def _carga_max_docente(docente) -> int:
     """
     Recupera la carga máxima semanal del docente.
@@ -328,57 +262,63 @@ class Candidato:
     carga_actual: int
     motivo: str
 
-# -------------------------------------------------------------------
-# Backtracking para asignación óptima (max suma de score)
-# -------------------------------------------------------------------
-
-def _mejor_asignacion_por_backtracking(
+@dataclass
+class ContextoAsignacion:
+    group_cells: Dict[int, Set[TimeCell]]
+    total_cells_group: Dict[int, int]
+    candidatos_por_grupo: Dict[int, List[Candidato]]
+    docentes_cache_obj: Dict[int, Any]
+    docentes_cache_ocup: Dict[int, Set[TimeCell]]
+    docentes_cache_carga: Dict[int, int]
+
+def _contexto_asignacion(
     grupos: List[Grupo],
     calendario_id: int,
     periodo_id: int,
     prefer_esp: bool,
-) -> Dict[int, Candidato]:
+) -> ContextoAsignacion:
     """
-    Resuelve asignación óptima: cada grupo -> 0 o 1 docente, maximizando score de cobertura,
-    evitando choques con clases ya asignadas a docentes y respetando cargas máximas.
+    Pre-cálculos compartidos por los solvers: celdas de cada grupo y candidatos con su score.
+    Todo sale de un snapshot cargado en un número fijo de consultas (scheduling.snapshot).
     """
-    # Pre-cálculos por grupo
-    group_cells: Dict[int, Set[TimeCell]] = {g.id: _bloques_del_grupo(g.id, calendario_id) for g in grupos}
-    total_cells_group: Dict[int, int] = {gid: len(cset) for gid, cset in group_cells.items()}
+    snap = cargar_snapshot(periodo_id, calendario_id)
+    docentes = list(snap.docentes.values())
 
-    from .helpers import _candidatos_docentes 
+    group_masks: Dict[int, List[int]] = {g.id: snap.ocupacion_grupo(g.id) for g in grupos}
+    group_cells: Dict[int, Set[TimeCell]] = {gid: snap.celdas(m) for gid, m in group_masks.items()}
+    total_cells_group: Dict[int, int] = {gid: len(cset) for gid, cset in group_cells.items()}
 
-    docentes_cache_disp: Dict[int, Set[TimeCell]] = {}
     docentes_cache_ocup: Dict[int, Set[TimeCell]] = {}
     docentes_cache_carga: Dict[int, int] = {}
-    docentes_cache_obj: Dict[int, any] = {}
+    docentes_cache_obj: Dict[int, Any] = {}
 
     candidatos_por_grupo: Dict[int, List[Candidato]] = {}
 
     for g in grupos:
         asig = g.asignatura
-        candidatos_model = list(_candidatos_docentes(asig, prefer_especialidad=prefer_esp))
+        # mismo criterio que helpers._candidatos_docentes, sin ir a la base por grupo
+        candidatos_model = docentes
+        if prefer_esp and asig and asig.nombre:
+            clave = asig.nombre.split()[0].lower()
+            candidatos_model = [d for d in docentes if clave in (d.especialidad or "").lower()]
         cands: List[Candidato] = []
-        cset = group_cells[g.id]
+        gm = group_masks[g.id]
         tot = total_cells_group[g.id]
 
         # Si el grupo no tiene clases programadas aún, el score de cobertura será 0. Igualmente ponderamos especialidad/carga.
         for d in candidatos_model:
-            docentes_cache_obj[d.id] = d
-            if d.id not in docentes_cache_disp:
-                docentes_cache_disp[d.id] = _bloques_disponibles_docente(d.id, calendario_id)
-            if d.id not in docentes_cache_ocup:
-                docentes_cache_ocup[d.id] = _bloques_ocupados_docente_en_periodo(d.id, periodo_id)
-            if d.id not in docentes_cache_carga:
-                docentes_cache_carga[d.id] = _carga_actual_en_bloques(d.id, periodo_id)
+            if d.id not in docentes_cache_obj:
+                docentes_cache_obj[d.id] = d
+                docentes_cache_ocup[d.id] = snap.celdas(snap.ocupacion_docente(d.id))
+                docentes_cache_carga[d.id] = snap.carga_docente.get(d.id, 0)
 
-            disp = docentes_cache_disp[d.id]
-            ocup = docentes_cache_ocup[d.id]
+            disp = snap.disponibilidad_docente(d.id)
+            ocup = snap.ocupacion_docente(d.id)
 
             # No dejar choques: si el docente ya tiene clase en alguna celda del grupo, lo penalizamos fuerte
-            hay_choque = len(cset & ocup) > 0
+            hay_choque = any(gm[day] & ocup[day] for day in DIAS)
 
-            cobertura = len(cset & disp) if tot > 0 else 0
+            cobertura = sum((gm[day] & disp[day]).bit_count() for day in DIAS) if tot > 0 else 0
             cobertura_ratio = (cobertura / tot) if tot > 0 else 0.0
 
             bonus_esp = 0.15 if (prefer_esp and _es_especialista(d, asig)) else 0.0
@@ -410,6 +350,39 @@ def _mejor_asignacion_por_backtracking(
         cands.sort(key=lambda x: (x.score, -x.cobertura_bloques, -x.total_bloques_grupo, -x.carga_actual), reverse=True)
         candidatos_por_grupo[g.id] = cands
 
+    return ContextoAsignacion(
+        group_cells=group_cells,
+        total_cells_group=total_cells_group,
+        candidatos_por_grupo=candidatos_por_grupo,
+        docentes_cache_obj=docentes_cache_obj,
+        docentes_cache_ocup=docentes_cache_ocup,
+        docentes_cache_carga=docentes_cache_carga,
+    )
+
+# -------------------------------------------------------------------
+# Backtracking para asignación óptima (max suma de score)
+# -------------------------------------------------------------------
+
+def _mejor_asignacion_por_backtracking(
+    grupos: List[Grupo],
+    calendario_id: int,
+    periodo_id: int,
+    prefer_esp: bool,
+    ctx: Optional[ContextoAsignacion] = None,
+) -> Dict[int, Candidato]:
+    """
+    Resuelve asignación óptima: cada grupo -> 0 o 1 docente, maximizando score de cobertura,
+    evitando choques con clases ya asignadas a docentes y respetando cargas máximas.
+    Búsqueda exhaustiva: sólo para entradas chicas (ver MAX_GRUPOS_EXACTO).
+    """
+    ctx = ctx or _contexto_asignacion(grupos, calendario_id, periodo_id, prefer_esp)
+    group_cells = ctx.group_cells
+    total_cells_group = ctx.total_cells_group
+    candidatos_por_grupo = ctx.candidatos_por_grupo
+    docentes_cache_obj = ctx.docentes_cache_obj
+    docentes_cache_ocup = ctx.docentes_cache_ocup
+    docentes_cache_carga = ctx.docentes_cache_carga
+
     # Ordenar grupos por “dificultad”: menos candidatos o menor cobertura máxima
     orden_grupos = sorted(
         grupos,
@@ -433,12 +406,13 @@ def _mejor_asignacion_por_backtracking(
         lst = candidatos_por_grupo.get(g.id, [])
         max_score_por_grupo[g.id] = lst[0].score if lst else 0.0
 
+    # sufijos acumulados: la cota de cada nodo es O(1)
+    cota_restante = [0.0] * (len(orden_grupos) + 1)
+    for j in range(len(orden_grupos) - 1, -1, -1):
+        cota_restante[j] = cota_restante[j + 1] + max_score_por_grupo.get(orden_grupos[j].id, 0.0)
+
     def upper_bound(idx: int, current: float) -> float:
-        ub = current
-        for j in range(idx, len(orden_grupos)):
-            gid = orden_grupos[j].id
-            ub += max_score_por_grupo.get(gid, 0.0)
-        return ub
+        return current + cota_restante[idx]
 
     asignacion_actual: Dict[int, Candidato] = {}
 
@@ -506,6 +480,67 @@ def _mejor_asignacion_por_backtracking(
     bt(0, 0.0)
     return best_assign
 
+# -------------------------------------------------------------------
+# Asignación por matching de costo mínimo (polinomial)
+# -------------------------------------------------------------------
+
+MAX_GRUPOS_EXACTO = 12
+
+def _candidato_viable(ctx: ContextoAsignacion, gid: int, cand: Candidato) -> bool:
+    """
+    Mismas reglas duras que el backtracking, evaluadas para un grupo aislado.
+    """
+    candidatos = ctx.candidatos_por_grupo.get(gid, [])
+    if cand.cobertura_bloques == 0 and any(c.cobertura_bloques > 0 for c in candidatos):
+        return False
+    if not ctx.group_cells[gid].isdisjoint(ctx.docentes_cache_ocup[cand.docente_id]):
+        return False
+    carga_max = _carga_max_docente(ctx.docentes_cache_obj[cand.docente_id])
+    return ctx.docentes_cache_carga[cand.docente_id] + ctx.total_cells_group[gid] <= carga_max * 1.10
+
+def _mejor_asignacion_por_matching(
+    grupos: List[Grupo],
+    calendario_id: int,
+    periodo_id: int,
+    prefer_esp: bool,
+    tiempo_max_ms: int = 0,
+    ctx: Optional[ContextoAsignacion] = None,
+) -> Dict[int, Candidato]:
+    """
+    Asignación por matching bipartito de costo mínimo (Hungarian) con expansión por carga máxima.
+    A diferencia del backtracking, acumula la carga de los grupos que toma cada docente y no le
+    asigna dos grupos que se crucen. Ver scheduling.asignacion.
+    """
+    ctx = ctx or _contexto_asignacion(grupos, calendario_id, periodo_id, prefer_esp)
+
+    candidatos: Dict[int, List[Tuple[int, float]]] = {}
+    for g in grupos:
+        candidatos[g.id] = [(c.docente_id, c.score) for c in ctx.candidatos_por_grupo.get(g.id, [])
+                            if _candidato_viable(ctx, g.id, c)]
+    holgura = {
+        did: _carga_max_docente(d) * 1.10 - ctx.docentes_cache_carga[did]
+        for did, d in ctx.docentes_cache_obj.items()
+    }
+    elegidos = asignar_por_matching(candidatos, ctx.total_cells_group, holgura, ctx.group_cells,
+                                    tiempo_max_ms=tiempo_max_ms)
+
+    res: Dict[int, Candidato] = {}
+    for g in grupos:
+        did = elegidos.get(g.id)
+        cand = next((c for c in ctx.candidatos_por_grupo.get(g.id, []) if c.docente_id == did), None)
+        res[g.id] = cand or Candidato(docente_id=0, score=0.0, cobertura_bloques=0,
+                                      total_bloques_grupo=ctx.total_cells_group[g.id],
+                                      carga_actual=0, motivo="sin_candidato")
+    return res
+
+def _resolver_asignacion(grupos, calendario_id, periodo_id, prefer_esp, modo="auto", tiempo_max_ms=0):
+    """
+    modo: "exacto" (backtracking), "matching" (Hungarian) o "auto" (exacto si hay pocos grupos).
+    """
+    if modo == "exacto" or (modo == "auto" and len(grupos) <= MAX_GRUPOS_EXACTO):
+        return _mejor_asignacion_por_backtracking(grupos, calendario_id, periodo_id, prefer_esp)
+    return _mejor_asignacion_por_matching(grupos, calendario_id, periodo_id, prefer_esp, tiempo_max_ms=tiempo_max_ms)
+
 # -------------------------------------------------------------------
 # View principal (mantiene request/response)
 # -------------------------------------------------------------------
@@ -526,17 +561,26 @@ def asignacion_docentes_proponer_view(request):
     - Objetivo: maximizar cobertura de bloques de las clases del grupo con disponibilidad del docente.
     - Restricciones: evitar choques con clases ya asignadas al docente y no sobrepasar carga máxima (suave).
     - Preferencias: prioriza especialidad si 'prefer_especialidad' es True y balancea por carga.
-    Formato de E/S se mantiene igual.
+    Formato de E/S se mantiene igual. Con async=true se encola como Job (consultar jobs/<id>/).
     """
     ser = PropuestaDocenteRequestSerializer(data=request.data)
     ser.is_valid(raise_exception=True)
+    if es_async(request):
+        return respuesta_encolado(encolar(Job.Tipo.ASIGNACION_DOCENTES, dict(ser.validated_data), request.user))
+    return Response(_proponer_docentes(ser.validated_data))
 
-    periodo_id = ser.validated_data["periodo"]
-    calendario_id = ser.validated_data["calendario"]
-    asignatura_id = ser.validated_data.get("asignatura")
-    turno_id = ser.validated_data.get("turno")
-    persistir = ser.validated_data["persistir"]
-    prefer_esp = ser.validated_data["prefer_especialidad"]
+def _proponer_docentes(datos, progreso=None) -> dict:
+    """
+    Cuerpo de asignacion_docentes_proponer_view; también lo ejecuta el worker de jobs.
+    """
+    periodo_id = datos["periodo"]
+    calendario_id = datos["calendario"]
+    asignatura_id = datos.get("asignatura")
+    turno_id = datos.get("turno")
+    persistir = datos["persistir"]
+    prefer_esp = datos["prefer_especialidad"]
+    modo = datos["modo"]
+    tiempo_max_ms = datos["tiempo_max_ms"]
 
     grupos_qs = Grupo.objects.filter(periodo_id=periodo_id).select_related("asignatura", "docente")
     if asignatura_id:
@@ -552,7 +596,7 @@ def asignacion_docentes_proponer_view(request):
         grupos_sin_doc = [g for g in grupos if not g.docente_id]
         grupos_con_doc = [g for g in grupos if g.docente_id]
 
-        asignaciones = _mejor_asignacion_por_backtracking(grupos_sin_doc, calendario_id, periodo_id, prefer_esp)
+        asignaciones = _resolver_asignacion(grupos_sin_doc, calendario_id, periodo_id, prefer_esp, modo, tiempo_max_ms)
         sugerencias = []
 
         for g in grupos_con_doc:
@@ -565,10 +609,10 @@ def asignacion_docentes_proponer_view(request):
             else:
                 sugerencias.append({"grupo": g.id, "docente_sugerido": None, "motivo": "sin_candidato"})
 
-        return Response({"sugerencias": sugerencias})
+        return {"sugerencias": sugerencias}
 
     # Si SÍ persistimos, corremos la optimización sobre TODOS y luego guardamos.
-    asignaciones = _mejor_asignacion_por_backtracking(grupos, calendario_id, periodo_id, prefer_esp)
+    asignaciones = _resolver_asignacion(grupos, calendario_id, periodo_id, prefer_esp, modo, tiempo_max_ms)
 
     sugerencias = []
     for g in grupos:
@@ -583,7 +627,7 @@ def asignacion_docentes_proponer_view(request):
             sugerencias.append({"grupo": g.id, "docente_sugerido": g.docente_id or None,
                                 "motivo": "sin_candidato" if not g.docente_id else "ya_asignado"})
 
-    return Response({"sugerencias": sugerencias})
+    return {"sugerencias": sugerencias}
 # ================= HU011: Propuesta de clases (sesiones) =================
 
 @extend_schema(
@@ -597,23 +641,45 @@ def asignacion_docentes_proponer_view(request):
 @api_view(["POST"])
 @permission_classes([IsAuthenticated, IsManagerOrStaff])
 def clases_proponer_view(request):
+    """
+    Genera las sesiones que faltan a cada grupo con scheduling.generador sobre un snapshot en memoria.
+    - Duras: sin choques de docente/grupo/ambiente, dentro de la disponibilidad, a lo sumo max_bloques_por_sesion.
+    - Blandas: preferencia del docente, repartir en días distintos y evitar huecos.
+    Con persistir=True crea todas las clases en un solo bulk_create.
+    Con async=true se encola como Job (consultar jobs/<id>/).
+    """
     ser = PropuestaClasesRequestSerializer(data=request.data)
     ser.is_valid(raise_exception=True)
-    periodo_id = ser.validated_data["periodo"]
-    calendario_id = ser.validated_data["calendario"]
-    asignatura_id = ser.validated_data.get("asignatura")
-    turno_id = ser.validated_data.get("turno")
-    reusar_docente = ser.validated_data["reusar_docente_de_grupo"]
-    persistir = ser.validated_data["persistir"]
-    max_por_sesion = max(1, ser.validated_data["max_bloques_por_sesion"])
+    if es_async(request):
+        return respuesta_encolado(encolar(Job.Tipo.PROPUESTA_CLASES, dict(ser.validated_data), request.user))
+    return Response(_proponer_clases(ser.validated_data))
+
+def _proponer_clases(datos, progreso=None) -> dict:
+    """
+    Cuerpo de clases_proponer_view; también lo ejecuta el worker de jobs.
+    """
+    periodo_id = datos["periodo"]
+    calendario_id = datos["calendario"]
+    asignatura_id = datos.get("asignatura")
+    turno_id = datos.get("turno")
+    reusar_docente = datos["reusar_docente_de_grupo"]
+    persistir = datos["persistir"]
+    max_por_sesion = max(1, datos["max_bloques_por_sesion"])
+    tiempo_max_ms = datos["tiempo_max_ms"]
 
     cal = Calendario.objects.get(pk=calendario_id)
     grupos = Grupo.objects.filter(periodo_id=periodo_id)
     if asignatura_id: grupos = grupos.filter(asignatura_id=asignatura_id)
     if turno_id: grupos = grupos.filter(turno_id=turno_id)
 
+    snap = cargar_snapshot(periodo_id, cal.id, excluir_canceladas=True)
+    # catálogo de ambientes, de menor a mayor capacidad (el más justo primero)
+    ambientes = list(Ambiente.objects.order_by("capacidad", "id").values_list("id", "tipo_ambiente_id", "capacidad"))
+
     previews, omitidas = [], []
     creadas = 0
+    sesiones: List[Sesion] = []
+    grupos_por_id: Dict[int, Grupo] = {}
 
     for g in grupos.select_related("asignatura", "docente"):
         asig = g.asignatura
@@ -625,43 +691,59 @@ def clases_proponer_view(request):
         if not docente:
             omitidas.append(f"Grupo {g.id}: sin docente asignado")
             continue
+        grupos_por_id[g.id] = g
 
-        # Intentar colocar sesiones greedily en las primeras ventanas disponibles (Lun-Vie)
         for tipo, req in (("T", req_t), ("P", req_p)):
-            bloques_pend = req
-            if bloques_pend <= 0:
-                continue
-            day_candidates = _dia_ints()
-            for day in day_candidates:
-                if bloques_pend <= 0:
-                    break
-                ventanas = _ventanas_disponibles(docente, cal, day)
-                for (start_orden, dur_disp, bloque_inicio_id) in ventanas:
-                    if bloques_pend <= 0:
-                        break
-                    dur_sesion = min(max_por_sesion, dur_disp, bloques_pend)
-                    # Evitar choque con clases del docente
-                    if _hay_clase_para_docente(docente.id, day, start_orden, dur_sesion):
-                        continue
-                    # Creamos preview (ambiente se asigna en HU014)
-                    pv = {
-                        "grupo": g.id, "tipo": tipo,
-                        "day_of_week": int(day), "bloque_inicio": bloque_inicio_id,
-                        "bloques_duracion": int(dur_sesion),
-                        "docente": docente.id, "ambiente": None,
-                    }
-                    previews.append(pv)
-                    if persistir:
-                        Clase.objects.create(
-                            grupo=g, tipo=tipo, day_of_week=day,
-                            bloque_inicio=Bloque.objects.get(pk=bloque_inicio_id),
-                            bloques_duracion=dur_sesion,
-                            ambiente_id=None, docente=docente, estado="propuesto"
-                        )
-                        creadas += 1
-                    bloques_pend -= dur_sesion
-
-            if bloques_pend > 0:
-                omitidas.append(f"Grupo {g.id} {tipo}: faltaron {bloques_pend} bloque(s) por disponibilidad")
-
-    return Response({"creadas": creadas, "previsualizacion": previews, "omitidas": omitidas})
\ No newline at end of file
+            # sólo lo que falta: las clases ya programadas del grupo cuentan
+            pendientes = req - snap.bloques_grupo_tipo.get((g.id, tipo), 0)
+            tipo_amb = asig.tipo_ambiente_teoria_id if tipo == "T" else asig.tipo_ambiente_practica_id
+            compatibles = [a_id for a_id, t_id, capacidad in ambientes
+                           if capacidad >= g.capacidad and (not tipo_amb or t_id == tipo_amb)]
+            for dur in dividir_en_sesiones(pendientes, max_por_sesion):
+                sesiones.append(Sesion(grupo_id=g.id, tipo=tipo, dur=dur,
+                                       docente_id=docente.id, ambientes=compatibles))
+
+    if progreso:
+        progreso(20)
+    ubicaciones = GeneradorHorario(snap, sesiones, _dia_ints()).resolver(tiempo_max_ms)
+    if progreso:
+        progreso(80)
+
+    faltantes: Dict[Tuple[int, str], int] = defaultdict(int)
+    nuevas: List[Clase] = []
+    for i, ses in enumerate(sesiones):
+        u = ubicaciones.get(i)
+        if u is None:
+            faltantes[(ses.grupo_id, ses.tipo)] += ses.dur
+            continue
+        bloque_inicio_id = snap.id_por_idx[u.pos]
+        previews.append({
+            "grupo": ses.grupo_id, "tipo": ses.tipo,
+            "day_of_week": u.day, "bloque_inicio": bloque_inicio_id,
+            "bloques_duracion": ses.dur,
+            "docente": ses.docente_id, "ambiente": u.ambiente_id,
+        })
+        if not persistir:
+            continue
+        if u.ambiente_id is None:
+            omitidas.append(f"Grupo {ses.grupo_id} {ses.tipo}: sin ambiente compatible")
+            continue
+        nuevas.append(Clase(
+            grupo=grupos_por_id[ses.grupo_id], tipo=ses.tipo, day_of_week=u.day,
+            bloque_inicio_id=bloque_inicio_id, bloques_duracion=ses.dur,
+            ambiente_id=u.ambiente_id, docente_id=ses.docente_id, estado="propuesto",
+        ))
+
+    for (gid, tipo), n in faltantes.items():
+        omitidas.append(f"Grupo {gid} {tipo}: faltaron {n} bloque(s) por disponibilidad")
+
+    if nuevas:
+        Clase.sincronizar_ubicacion(nuevas)
+        with transaction.atomic():
+            Clase.objects.bulk_create(nuevas)
+        # bulk_create no dispara señales
+        invalidar_calendario(cal.id)
+        recalcular_cargas(docente_ids={c.docente_id for c in nuevas if c.docente_id})
+        creadas = len(nuevas)
+
+    return {"creadas": creadas, "previsualizacion": previews, "omitidas": omitidas}
@@ -1,3 +1,8 @@
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from django.db import transaction
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -5,7 +10,9 @@ from drf_spectacular.utils import extend_schema, OpenApiExample
 
 from users.permissions import IsManagerOrStaff
 from facilities.models import Ambiente
-from scheduling.models import Clase, Calendario
+from scheduling.models import Clase, Calendario, Job
+from scheduling.jobs import encolar, es_async, respuesta_encolado
+from scheduling.ocupacion import MapaOcupacion, _mascara, invalidar_calendario
 from academics.models import Asignatura
 from .serializers import AsignarAulasRequestSerializer, AsignarAulasResponseSerializer
 
@@ -15,17 +22,37 @@ def _tipo_ambiente_para_clase(clase: Clase):
         return asig.tipo_ambiente_teoria_id
     return asig.tipo_ambiente_practica_id
 
-def _candidatos_ambiente(clase: Clase, prefer_edificio=None):
-    tipo_id = _tipo_ambiente_para_clase(clase)
-    if not tipo_id:
-        return Ambiente.objects.none()
-    qs = Ambiente.objects.filter(tipo_ambiente_id=tipo_id, capacidad__gte=clase.grupo.capacidad)
-    if prefer_edificio:
-        # primero preferidos, luego el resto
-        prefer = qs.filter(edificio_id=prefer_edificio)
-        otros = qs.exclude(edificio_id=prefer_edificio)
-        return list(prefer) + list(otros)
-    return list(qs.order_by("capacidad"))
+class CatalogoAmbientes:
+    """
+    Ambientes precargados por tipo_ambiente y ordenados por capacidad (una consulta).
+    """
+
+    def __init__(self):
+        self._por_tipo: Dict[int, List[Tuple[int, int, int]]] = defaultdict(list)  # tipo -> [(capacidad, id, edificio)]
+        for a_id, tipo_id, capacidad, edificio_id in (Ambiente.objects
+                                                       .values_list("id", "tipo_ambiente_id", "capacidad", "edificio_id")):
+            self._por_tipo[tipo_id].append((capacidad, a_id, edificio_id))
+        for lst in self._por_tipo.values():
+            lst.sort()
+        self._capacidades = {t: [x[0] for x in lst] for t, lst in self._por_tipo.items()}
+        self._cache: Dict[Tuple, List[int]] = {}
+
+    def candidatos(self, tipo_id, capacidad_min: int, prefer_edificio=None) -> List[int]:
+        """
+        Ids de ambientes del tipo con capacidad suficiente: primero el edificio preferido,
+        y dentro de cada parte de menor a mayor capacidad.
+        """
+        if not tipo_id:
+            return []
+        key = (tipo_id, capacidad_min, prefer_edificio)
+        if key not in self._cache:
+            lst = self._por_tipo.get(tipo_id, [])
+            desde = bisect_left(self._capacidades.get(tipo_id, []), capacidad_min)
+            aptos = lst[desde:]
+            if prefer_edificio:
+                aptos = [x for x in aptos if x[2] == prefer_edificio] + [x for x in aptos if x[2] != prefer_edificio]
+            self._cache[key] = [x[1] for x in aptos]
+        return self._cache[key]
 
 @extend_schema(
     tags=["aulas"],
@@ -38,50 +65,67 @@ def _candidatos_ambiente(clase: Clase, prefer_edificio=None):
 @api_view(["POST"])
 @permission_classes([IsAuthenticated, IsManagerOrStaff])
 def asignar_aulas_view(request):
+    """
+    Con async=true se encola como Job (consultar jobs/<id>/).
+    """
     ser = AsignarAulasRequestSerializer(data=request.data)
     ser.is_valid(raise_exception=True)
-    periodo_id = ser.validated_data["periodo"]
-    calendario_id = ser.validated_data["calendario"]
-    prefer_edificio = ser.validated_data.get("prefer_edificio")
-    force = ser.validated_data["force"]
-    ids = ser.validated_data.get("clase_ids")
+    if es_async(request):
+        return respuesta_encolado(encolar(Job.Tipo.ASIGNACION_AULAS, dict(ser.validated_data), request.user))
+    return Response(_asignar_aulas(ser.validated_data))
+
+def _asignar_aulas(datos, progreso=None) -> dict:
+    periodo_id = datos["periodo"]
+    calendario_id = datos["calendario"]
+    prefer_edificio = datos.get("prefer_edificio")
+    force = datos["force"]
+    ids = datos.get("clase_ids")
 
     qs = (Clase.objects
-      .filter(grupo__periodo_id=periodo_id,
-              bloque_inicio__calendario_id=calendario_id)
+      .filter(periodo_id=periodo_id, calendario_id=calendario_id)
       .exclude(estado="cancelado"))
     if ids:
         qs = qs.filter(id__in=ids)
 
+    catalogo = CatalogoAmbientes()
+    # ocupación de todos los ambientes del calendario (cualquier período/estado), como en la versión previa
+    ocupacion = MapaOcupacion()
+    for cid, a_id, day, orden, dur in (Clase.objects
+                                       .filter(calendario_id=calendario_id, ambiente__isnull=False)
+                                       .values_list("id", "ambiente_id", "day_of_week",
+                                                    "orden_inicio", "bloques_duracion")):
+        ocupacion.agregar(cid, day, orden, dur, ambiente_id=a_id)
+
     res = []
-    for c in qs.select_related("grupo__asignatura","docente","bloque_inicio","ambiente"):
+    cambiadas: List[Clase] = []
+    clases = list(qs.select_related("grupo__asignatura").order_by("id"))
+    for n, c in enumerate(clases):
+        if progreso and n % 200 == 0:
+            progreso(int(90 * n / len(clases)))
         if c.ambiente_id and not force:
             res.append({"clase": c.id, "ambiente_anterior": c.ambiente_id, "ambiente_nuevo": c.ambiente_id, "estado": "omitido"})
             continue
-        candidatos = _candidatos_ambiente(c, prefer_edificio=prefer_edificio)
+        orden, dur = c.orden_inicio, c.bloques_duracion
+        m = _mascara(orden, dur)
         elegido = None
-        for a in candidatos:
-            choques = (Clase.objects
-                .filter(ambiente=a,
-                        day_of_week=c.day_of_week,
-                        bloque_inicio__calendario_id=calendario_id)
-                .exclude(id=c.id)
-                .select_related("bloque_inicio"))
-            conflicto = any(
-                not ( (c.bloque_inicio.orden + c.bloques_duracion -1) < (x.bloque_inicio.orden) or
-                      (x.bloque_inicio.orden + x.bloques_duracion -1) < (c.bloque_inicio.orden) )
-                for x in choques.select_related("bloque_inicio")
-            )
-            if not conflicto:
-                elegido = a
+        for a_id in catalogo.candidatos(_tipo_ambiente_para_clase(c), c.grupo.capacidad, prefer_edificio):
+            if not ocupacion.mascara("AMBIENTE", a_id, c.day_of_week, excluir=c.id) & m:
+                elegido = a_id
                 break
 
         if elegido:
             prev = c.ambiente_id
-            c.ambiente = elegido
-            c.save(update_fields=["ambiente"])
-            res.append({"clase": c.id, "ambiente_anterior": prev, "ambiente_nuevo": elegido.id, "estado": "asignado"})
+            c.ambiente_id = elegido
+            ocupacion.agregar(c.id, c.day_of_week, orden, dur, ambiente_id=elegido)
+            cambiadas.append(c)
+            res.append({"clase": c.id, "ambiente_anterior": prev, "ambiente_nuevo": elegido, "estado": "asignado"})
         else:
             res.append({"clase": c.id, "ambiente_anterior": c.ambiente_id, "ambiente_nuevo": None, "estado": "sin_candidatos"})
 
-    return Response({"asignaciones": res})
+    if cambiadas:
+        with transaction.atomic():
+            Clase.objects.bulk_update(cambiadas, ["ambiente"], batch_size=500)
+        # bulk_update no dispara señales
+        invalidar_calendario(calendario_id)
+
+    return {"asignaciones": res}
@@ -1,3 +1,8 @@
+import csv
+from typing import Dict, List
+
+from django.db.models import Count
+from django.http import StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -5,44 +10,141 @@ from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from users.permissions import IsManagerOrStaff
 from users.models import Docente
-from scheduling.models import Clase, Calendario
+from scheduling.cargas import minutos_por_tramo
+from scheduling.models import Calendario, CargaDocentePeriodo, Clase
 
 from .serializers import CargaDocenteResponseSerializer
 
+# desglose -> campo de Clase por el que se agrupa
+DESGLOSES = {"dia": "day_of_week", "turno": "grupo__turno__nombre", "tipo": "tipo"}
+
+
+class _Eco:
+    """Destino de csv.writer que devuelve la línea en vez de escribirla (para streaming)."""
+    def write(self, valor):
+        return valor
+
+
+def _estado(horas_45: float, d: dict) -> str:
+    estado = "OK"
+    if horas_45 < d["carga_min_semanal"]: estado = "BAJO"
+    if horas_45 > d["carga_max_semanal"] and d["carga_max_semanal"] > 0: estado = "EXCESO"
+    return estado
+
+
+def _acumulado_materializado(periodo_id: int, calendario_id: int) -> Dict[int, dict]:
+    filas = (CargaDocentePeriodo.objects.filter(periodo_id=periodo_id, calendario_id=calendario_id)
+             .values_list("docente_id", "clases", "bloques", "minutos"))
+    return {d: {"clases": n, "bloques": b, "minutos": m, "desglose": {}} for d, n, b, m in filas}
+
+
+def _cargas(periodo_id: int, calendario_id: int, desgloses: List[str]) -> List[dict]:
+    """
+    Sin desglose, lee CargaDocentePeriodo. Con desglose, una consulta agrupada sobre Clase
+    (docente, tramo y dimensiones pedidas). Más los docentes activos con sus límites.
+    """
+    cal = Calendario.objects.only("duracion_bloque_min").get(pk=calendario_id)
+    if not desgloses:
+        return _items(_acumulado_materializado(periodo_id, calendario_id), desgloses)
+    minutos = minutos_por_tramo(calendario_id, cal.duracion_bloque_min or 45)
+
+    campos = ["docente_id", "orden_inicio", "bloques_duracion", *(DESGLOSES[x] for x in desgloses)]
+    grupos = (Clase.objects
+              .filter(periodo_id=periodo_id, calendario_id=calendario_id,
+                      docente__activo=True)
+              .exclude(estado="cancelado")
+              .values(*campos).order_by()
+              .annotate(n=Count("id")))
+
+    acum: Dict[int, dict] = {}
+    for g in grupos:
+        n, dur = g["n"], g["bloques_duracion"]
+        mins = minutos(g["orden_inicio"], dur) * n
+        a = acum.setdefault(g["docente_id"], {"clases": 0, "bloques": 0, "minutos": 0,
+                                              "desglose": {x: {} for x in desgloses}})
+        a["clases"] += n
+        a["bloques"] += dur * n
+        a["minutos"] += mins
+        for x in desgloses:
+            clave = str(g[DESGLOSES[x]])
+            sub = a["desglose"][x].setdefault(clave, {"clases": 0, "minutos": 0})
+            sub["clases"] += n
+            sub["minutos"] += mins
+    return _items(acum, desgloses)
+
+
+def _items(acum: Dict[int, dict], desgloses: List[str]) -> List[dict]:
+    items = []
+    docentes = (Docente.objects.filter(activo=True).order_by("id")
+                .values("id", "nombre_completo", "carga_min_semanal", "carga_max_semanal"))
+    for d in docentes:
+        a = acum.get(d["id"]) or {"clases": 0, "bloques": 0, "minutos": 0, "desglose": {x: {} for x in desgloses}}
+        horas_45 = a["minutos"] / 45.0
+        item = {
+            "docente": d["id"], "nombre": d["nombre_completo"], "horas_45": round(horas_45, 2),
+            "carga_min_semanal": d["carga_min_semanal"], "carga_max_semanal": d["carga_max_semanal"],
+            "estado": _estado(horas_45, d), "clases": a["clases"],
+            "bloques": a["bloques"], "minutos": a["minutos"],
+        }
+        if desgloses:
+            item["desglose"] = {
+                x: {k: {"clases": v["clases"], "horas_45": round(v["minutos"] / 45.0, 2)} for k, v in sorted(vals.items())}
+                for x, vals in a["desglose"].items()
+            }
+        items.append(item)
+    return items
+
+
+def _csv_filas(items: List[dict], desgloses: List[str]):
+    # columnas de desglose: todas las claves que aparecen, p.ej. dia_1, turno_Mañana, tipo_T
+    extra = sorted({f"{x}_{k}" for it in items for x in desgloses for k in it["desglose"][x]})
+    w = csv.writer(_Eco())
+    yield w.writerow(["docente", "nombre", "clases", "bloques", "minutos", "horas_45",
+                      "carga_min_semanal", "carga_max_semanal", "estado", *extra])
+    for it in items:
+        plano = {f"{x}_{k}": v["horas_45"] for x in desgloses for k, v in it["desglose"][x].items()}
+        yield w.writerow([it["docente"], it["nombre"], it["clases"], it["bloques"], it["minutos"], it["horas_45"],
+                          it["carga_min_semanal"], it["carga_max_semanal"], it["estado"],
+                          *(plano.get(c, 0) for c in extra)])
+
+
 @extend_schema(
     tags=["cargas"],
     parameters=[
         OpenApiParameter("periodo", int, OpenApiParameter.QUERY, required=True),
         OpenApiParameter("calendario", int, OpenApiParameter.QUERY, required=True),
+        OpenApiParameter("desglose", str, OpenApiParameter.QUERY, description="dia,turno,tipo"),
+        OpenApiParameter("formato", str, OpenApiParameter.QUERY, description="json (default) | csv"),
     ],
     responses={200: CargaDocenteResponseSerializer},
 )
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, IsManagerOrStaff])
 def cargas_docentes_view(request):
+    """
+    Carga semanal por docente activo en las clases del periodo y calendario (sin canceladas).
+    Minutos según la duración real de cada bloque; horas_45 = minutos / 45.
+    ?desglose=dia,turno,tipo agrega horas y clases por esas dimensiones; ?formato=csv descarga en CSV.
+    """
     try:
         periodo_id = int(request.query_params["periodo"])
         calendario_id = int(request.query_params["calendario"])
     except (KeyError, ValueError):
         return Response({"detail": "periodo y calendario son requeridos."}, status=400)
 
-    cal = Calendario.objects.get(pk=calendario_id)
-    m = cal.duracion_bloque_min or 45
+    desgloses = [x.strip() for x in (request.query_params.get("desglose") or "").split(",") if x.strip()]
+    invalidos = [x for x in desgloses if x not in DESGLOSES]
+    if invalidos:
+        return Response({"detail": f"desglose inválido: {', '.join(invalidos)} (usar dia, turno, tipo)."}, status=400)
+    desgloses = list(dict.fromkeys(desgloses))
 
-    items = []
-    docentes = Docente.objects.filter(activo=True)
-    # agrupar clases por docente
-    for d in docentes:
-        qs = Clase.objects.filter(docente=d, grupo__periodo_id=periodo_id).exclude(estado="cancelado")
-        bloques = sum(qs.values_list("bloques_duracion", flat=True)) or 0
-        horas_45 = (bloques * m) / 45.0
-        estado = "OK"
-        if horas_45 < d.carga_min_semanal: estado = "BAJO"
-        if horas_45 > d.carga_max_semanal and d.carga_max_semanal > 0: estado = "EXCESO"
-        items.append({
-            "docente": d.id, "nombre": d.nombre_completo, "horas_45": round(horas_45, 2),
-            "carga_min_semanal": d.carga_min_semanal, "carga_max_semanal": d.carga_max_semanal,
-            "estado": estado, "clases": qs.count()
-        })
+    try:
+        items = _cargas(periodo_id, calendario_id, desgloses)
+    except Calendario.DoesNotExist:
+        return Response({"detail": "Calendario no encontrado."}, status=404)
 
+    if request.query_params.get("formato") == "csv":
+        resp = StreamingHttpResponse(_csv_filas(items, desgloses), content_type="text/csv; charset=utf-8")
+        resp["Content-Disposition"] = f'attachment; filename="cargas-p{periodo_id}-cal{calendario_id}.csv"'
+        return resp
     return Response({"periodo": periodo_id, "calendario": calendario_id, "items": items})
@@ -1,11 +1,14 @@
+from django.db import transaction
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 
 from users.permissions import IsManagerOrStaff
-from scheduling.models import Clase, ConflictoHorario, Bloque
+from scheduling.models import Clase, ConflictoHorario, Bloque, Job
+from scheduling.jobs import encolar, es_async, respuesta_encolado
 from .serializers import DetectarConflictosRequestSerializer, ConflictoSerializer
+from .ocupacion import _conflictos_por_mascaras, indice_calendario
 
 def _overlap(a_start, a_dur, b_start, b_dur):
     a_end = a_start + a_dur - 1
@@ -13,26 +16,88 @@ def _overlap(a_start, a_dur, b_start, b_dur):
     return not (a_end < b_start or b_end < a_start)
 
 def _conflictos_en_queryset(qs):
-    hallados = []
-    por_dia = {}
-    for c in qs.select_related("bloque_inicio", "docente", "ambiente", "grupo"):
-        por_dia.setdefault(c.day_of_week, []).append(c)
-
-    for day, clases in por_dia.items():
-        n = len(clases)
-        for i in range(n):
-            ci = clases[i]
-            for j in range(i+1, n):
-                cj = clases[j]
-                if _overlap(ci.bloque_inicio.orden, ci.bloques_duracion,
-                            cj.bloque_inicio.orden, cj.bloques_duracion):
-                    if ci.docente_id and ci.docente_id == cj.docente_id:
-                        hallados.append(("DOCENTE", ci, cj))
-                    if ci.ambiente_id and cj.ambiente_id and ci.ambiente_id == cj.ambiente_id:
-                        hallados.append(("AMBIENTE", ci, cj))
-                    if ci.grupo_id == cj.grupo_id:
-                        hallados.append(("GRUPO", ci, cj))
-    return hallados
+    """
+    Detecta choques DOCENTE/AMBIENTE/GRUPO con máscaras de bits por recurso y día
+    (ver scheduling.ocupacion). Devuelve [(tipo, clase_a, clase_b)].
+    """
+    clases = {c.id: c for c in qs}
+    filas = (
+        (c.id, c.day_of_week, c.orden_inicio, c.bloques_duracion,
+         c.docente_id, c.ambiente_id, c.grupo_id)
+        for c in clases.values()
+    )
+    return [(tipo, clases[a], clases[b]) for tipo, a, b in _conflictos_por_mascaras(filas)]
+
+def _clave_conflicto(tipo, a_id, b_id):
+    return (tipo, min(a_id, b_id), max(a_id, b_id))
+
+def _persistir_conflictos(hallados, alcance):
+    """
+    Sincroniza ConflictoHorario (no resueltos) con lo detectado dentro de `alcance` (queryset de Clase):
+    inserta sólo pares nuevos (bulk_create), mantiene los ya abiertos y marca como resueltos
+    los que dejaron de detectarse. Devuelve (objetos_vigentes, {"nuevos", "mantenidos", "cerrados"}).
+    """
+    detectados = {}
+    for tipo, a, b in hallados:
+        detectados.setdefault(_clave_conflicto(tipo, a, b), (tipo, a, b))
+
+    with transaction.atomic():
+        abiertos = {}
+        obsoletos = []
+        for c in ConflictoHorario.objects.filter(resuelto=False, clase_a__in=alcance).order_by("id"):
+            k = _clave_conflicto(c.tipo, c.clase_a_id, c.clase_b_id)
+            if k in detectados and k not in abiertos:
+                abiertos[k] = c
+            else:
+                obsoletos.append(c.id)  # desaparecido o duplicado de corridas anteriores
+
+        nuevos = [ConflictoHorario(tipo=tipo, clase_a_id=a, clase_b_id=b, resuelto=False, nota="")
+                  for k, (tipo, a, b) in detectados.items() if k not in abiertos]
+        if nuevos:
+            nuevos = ConflictoHorario.objects.bulk_create(nuevos)
+        cerrados = 0
+        if obsoletos:
+            cerrados = ConflictoHorario.objects.filter(id__in=obsoletos).update(
+                resuelto=True, nota="Resuelto automáticamente: ya no se detecta.")
+
+    resumen = {"nuevos": len(nuevos), "mantenidos": len(abiertos), "cerrados": cerrados}
+    return list(abiertos.values()) + nuevos, resumen
+
+def _detectar_conflictos(datos, progreso=None):
+    """
+    Detecta (y opcionalmente persiste) conflictos. Devuelve (filas, resumen o None).
+    """
+    periodo_id = datos["periodo"]
+    calendario_id = datos.get("calendario")
+    persistir = datos["persistir"]
+
+    alcance = Clase.objects.filter(periodo_id=periodo_id)
+    if calendario_id:
+        alcance = alcance.filter(calendario_id=calendario_id)
+    qs = alcance.exclude(estado="cancelado")
+
+    idx = indice_calendario(calendario_id) if calendario_id else None
+    if idx is not None and idx.periodo_id == periodo_id:
+        hallados = idx.conflictos()
+    else:
+        hallados = [(tipo, a.id, b.id) for tipo, a, b in _conflictos_en_queryset(qs)]
+    if persistir:
+        objs, resumen = _persistir_conflictos(hallados, alcance)
+    else:
+        objs = []
+        for tipo, a, b in hallados:
+            obj = ConflictoHorario(tipo=tipo, clase_a_id=a, clase_b_id=b, resuelto=False)  # fake instance
+            obj.id = None
+            objs.append(obj)
+        resumen = None
+
+    resp = [{"id": obj.id, "tipo": obj.tipo, "clase_a": obj.clase_a_id, "clase_b": obj.clase_b_id,
+             "resuelto": False, "nota": obj.nota, "detectado_en": obj.detectado_en} for obj in objs]
+    return resp, resumen
+
+def _detectar_conflictos_job(datos, progreso=None) -> dict:
+    resp, resumen = _detectar_conflictos(datos, progreso=progreso)
+    return {"conflictos": resp, "resumen": resumen}
 
 @extend_schema(
     tags=["conflictos"],
@@ -42,27 +107,21 @@ def _conflictos_en_queryset(qs):
 @api_view(["POST"])
 @permission_classes([IsAuthenticated, IsManagerOrStaff])
 def conflictos_detectar_view(request):
+    """
+    Con async=true se encola como Job (consultar jobs/<id>/); el resultado trae
+    {"conflictos": [...], "resumen": {...}}.
+    """
     ser = DetectarConflictosRequestSerializer(data=request.data)
     ser.is_valid(raise_exception=True)
-    periodo_id = ser.validated_data["periodo"]
-    calendario_id = ser.validated_data.get("calendario")
-    persistir = ser.validated_data["persistir"]
-
-    qs = Clase.objects.filter(grupo__periodo_id=periodo_id).exclude(estado="cancelado")
-    if calendario_id:
-        qs = qs.filter(bloque_inicio__calendario_id=calendario_id)
-
-    hallados = _conflictos_en_queryset(qs)
-    resp = []
-    for tipo, a, b in hallados:
-        if persistir:
-            obj = ConflictoHorario.objects.create(tipo=tipo, clase_a=a, clase_b=b, resuelto=False, nota="")
-        else:
-            obj = ConflictoHorario(tipo=tipo, clase_a=a, clase_b=b, resuelto=False)  # fake instance
-            obj.id = None
-        resp.append({"id": obj.id, "tipo": tipo, "clase_a": a.id, "clase_b": b.id,
-                     "resuelto": False, "nota": "", "detectado_en": getattr(obj, "detectado_en", None)})
-    return Response(resp)
+    if es_async(request):
+        return respuesta_encolado(encolar(Job.Tipo.DETECCION_CONFLICTOS, dict(ser.validated_data), request.user))
+    resp, resumen = _detectar_conflictos(ser.validated_data)
+    response = Response(resp)
+    if resumen:
+        response["X-Conflictos-Nuevos"] = str(resumen["nuevos"])
+        response["X-Conflictos-Mantenidos"] = str(resumen["mantenidos"])
+        response["X-Conflictos-Cerrados"] = str(resumen["cerrados"])
+    return response
 
 @extend_schema(tags=["conflictos"], responses={200: ConflictoSerializer(many=True)})
 @api_view(["GET"])
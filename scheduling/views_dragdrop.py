@@ -1,39 +1,63 @@
 from django.db import transaction
+from django.db.models import Q
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema
 
 from users.permissions import IsManagerOrStaff
-from scheduling.models import Clase, Bloque, ConflictoHorario
+from scheduling.models import Clase, Bloque, ConflictoHorario, DisponibilidadDocente
 from .serializers import (
-    DragDropMoveRequestSerializer, DragDropMoveResponseSerializer, ClaseDetailSerializer
+    DragDropMoveRequestSerializer, DragDropMoveResponseSerializer, ClaseDetailSerializer,
+    DragDropProbeRequestSerializer, DragDropProbeResponseSerializer,
+    DragDropMapaRequestSerializer, DragDropMapaResponseSerializer,
 )
-from .views_conflictos import _overlap  # reutilizamos helper
-from notifications.utils import notify_cambio_clase  # (lo creamos abajo)
+from .ocupacion import _mascara, indice_calendario
+from notifications.utils import notify_cambio_clase
 
 def _validar_conflictos_para(clase, new_day, new_bloque: Bloque, new_dur):
-    conflictos = []
+    """
+    Choques de `clase` movida a (new_day, new_bloque, new_dur) en UNA consulta: clases del mismo
+    grupo/docente/ambiente ese día cuyo rango [orden, orden+dur-1] se cruza con el destino.
+    Devuelve [{"tipo", "clase"}]; una clase puede aparecer con más de un tipo.
+    """
+    inicio = new_bloque.orden
+    fin = inicio + new_dur - 1
 
-    # 1) mismo grupo – ya cubierto por UniqueConstraint, pero lo revisamos antes
-    qs_grupo = Clase.objects.filter(grupo=clase.grupo, day_of_week=new_day).exclude(pk=clase.pk)
-    for x in qs_grupo.select_related("bloque_inicio"):
-        if _overlap(new_bloque.orden, new_dur, x.bloque_inicio.orden, x.bloques_duracion):
-            conflictos.append({"tipo":"GRUPO","clase": x.id})
+    recursos = Q(grupo_id=clase.grupo_id)
+    if clase.docente_id:
+        recursos |= Q(docente_id=clase.docente_id)
+    if clase.ambiente_id:
+        recursos |= Q(ambiente_id=clase.ambiente_id)
 
-    # 2) docente
-    qs_doc = Clase.objects.filter(docente=clase.docente, day_of_week=new_day).exclude(pk=clase.pk)
-    for x in qs_doc.select_related("bloque_inicio"):
-        if _overlap(new_bloque.orden, new_dur, x.bloque_inicio.orden, x.bloques_duracion):
-            conflictos.append({"tipo":"DOCENTE","clase": x.id})
+    filas = (Clase.objects
+             .filter(recursos, day_of_week=new_day, calendario_id=new_bloque.calendario_id,
+                     orden_inicio__lte=fin, orden_fin__gte=inicio)
+             .exclude(pk=clase.pk)
+             .exclude(estado="cancelado")
+             .order_by("id")
+             .values_list("id", "grupo_id", "docente_id", "ambiente_id"))
 
-    # 3) ambiente (si ya tiene)
-    if clase.ambiente_id:
-        qs_amb = Clase.objects.filter(ambiente=clase.ambiente, day_of_week=new_day).exclude(pk=clase.pk)
-        for x in qs_amb.select_related("bloque_inicio"):
-            if _overlap(new_bloque.orden, new_dur, x.bloque_inicio.orden, x.bloques_duracion):
-                conflictos.append({"tipo":"AMBIENTE","clase": x.id})
+    conflictos = []
+    for x_id, grupo_id, docente_id, ambiente_id in filas:
+        if grupo_id == clase.grupo_id:
+            conflictos.append({"tipo": "GRUPO", "clase": x_id})
+        if clase.docente_id and docente_id == clase.docente_id:
+            conflictos.append({"tipo": "DOCENTE", "clase": x_id})
+        if clase.ambiente_id and ambiente_id == clase.ambiente_id:
+            conflictos.append({"tipo": "AMBIENTE", "clase": x_id})
+    return conflictos
 
+def _conflictos_en_indice(idx, clase, day, orden, dur):
+    """
+    Igual que _validar_conflictos_para pero contra el índice en memoria (sin SQL); para sondeos de la UI.
+    """
+    conflictos = []
+    for tipo, rid in (("GRUPO", clase.grupo_id), ("DOCENTE", clase.docente_id), ("AMBIENTE", clase.ambiente_id)):
+        if not rid:
+            continue
+        for x in idx.choques(tipo, rid, day, orden, dur, excluir=clase.pk):
+            conflictos.append({"tipo": tipo, "clase": x})
     return conflictos
 
 @extend_schema(
@@ -54,7 +78,7 @@ def dnd_mover_clase_view(request):
     dry = ser.validated_data["dry_run"]
 
     try:
-        clase = Clase.objects.select_for_update().select_related("bloque_inicio","grupo","docente","ambiente").get(pk=clase_id)
+        clase = Clase.objects.select_for_update().select_related("bloque_inicio","grupo__asignatura","docente","ambiente__edificio","ambiente__tipo_ambiente").get(pk=clase_id)
     except Clase.DoesNotExist:
         return Response({"detail":"Clase no encontrada."}, status=404)
 
@@ -90,7 +114,130 @@ def dnd_mover_clase_view(request):
             old_docente=clase.docente, new_docente=clase.docente,
         )
 
-    # notificar afectados
-    notify_cambio_clase(clase, titulo="Clase reprogramada", motivo=motivo)
+        # notificar afectados (si es diferido, se encola al confirmar la transacción)
+        notify_cambio_clase(clase, titulo="Clase reprogramada", motivo=motivo)
 
     return Response({"updated": True, "clase": ClaseDetailSerializer(clase).data, "conflictos":[]})
+
+
+@extend_schema(
+    tags=["dnd"],
+    request=DragDropProbeRequestSerializer,
+    responses={200: DragDropProbeResponseSerializer},
+)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsManagerOrStaff])
+def dnd_probar_destinos_view(request):
+    """
+    Valida N destinos (día, bloque) para una clase en una sola llamada, sin mover nada.
+    Se resuelve contra el índice de ocupación del calendario, así que no hay una consulta por destino.
+    """
+    ser = DragDropProbeRequestSerializer(data=request.data)
+    ser.is_valid(raise_exception=True)
+    clase_id = ser.validated_data["clase"]
+
+    try:
+        clase = Clase.objects.select_related("bloque_inicio").get(pk=clase_id)
+    except Clase.DoesNotExist:
+        return Response({"detail":"Clase no encontrada."}, status=404)
+
+    idx = indice_calendario(clase.bloque_inicio.calendario_id)
+    dur_default = ser.validated_data.get("bloques_duracion") or clase.bloques_duracion
+
+    # bloques fuera del índice: distinguir los de otro calendario de los que no existen (una consulta)
+    ajenos = {d["bloque_inicio"] for d in ser.validated_data["destinos"]} - set(idx.orden_por_bloque)
+    existentes = set(Bloque.objects.filter(pk__in=ajenos).values_list("id", flat=True)) if ajenos else set()
+
+    destinos = []
+    for d in ser.validated_data["destinos"]:
+        day = d["day_of_week"]
+        bloque_id = d["bloque_inicio"]
+        dur = d.get("bloques_duracion") or dur_default
+        item = {"day_of_week": day, "bloque_inicio": bloque_id, "bloques_duracion": dur}
+        orden = idx.orden_por_bloque.get(bloque_id)
+        if orden is None:
+            detalle = ("El bloque pertenece a otro calendario." if bloque_id in existentes
+                       else f"El bloque {bloque_id} no existe.")
+            item.update({"valido": False, "conflictos": [], "detalle": detalle})
+        else:
+            conflictos = _conflictos_en_indice(idx, clase, day, orden, dur)
+            item.update({"valido": not conflictos, "conflictos": conflictos, "detalle": ""})
+        destinos.append(item)
+
+    return Response({"clase": clase.id, "destinos": destinos})
+
+
+def _mascaras_disponibilidad(docente_id, calendario_id):
+    """
+    {day: máscara de órdenes} donde el docente marcó disponibilidad (una consulta).
+    """
+    por_dia = {}
+    filas = (DisponibilidadDocente.objects
+             .filter(docente_id=docente_id, calendario_id=calendario_id)
+             .values_list("day_of_week", "orden_inicio", "bloques_duracion"))
+    for day, orden, dur in filas:
+        por_dia[day] = por_dia.get(day, 0) | _mascara(orden, dur)
+    return por_dia
+
+@extend_schema(
+    tags=["dnd"],
+    request=DragDropMapaRequestSerializer,
+    responses={200: DragDropMapaResponseSerializer},
+)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated, IsManagerOrStaff])
+def dnd_mapa_destinos_view(request):
+    """
+    Matriz día × bloque con el estado de soltar la clase empezando en cada celda:
+    libre | grupo | docente | ambiente | fuera_disponibilidad | fuera_grilla.
+    Se calcula con las máscaras del índice del calendario y la disponibilidad del docente.
+    """
+    ser = DragDropMapaRequestSerializer(data=request.data)
+    ser.is_valid(raise_exception=True)
+
+    try:
+        clase = Clase.objects.select_related("bloque_inicio").get(pk=ser.validated_data["clase"])
+    except Clase.DoesNotExist:
+        return Response({"detail":"Clase no encontrada."}, status=404)
+
+    cal_id = clase.bloque_inicio.calendario_id
+    dur = ser.validated_data.get("bloques_duracion") or clase.bloques_duracion
+    dias = ser.validated_data.get("dias") or [1, 2, 3, 4, 5]
+
+    idx = indice_calendario(cal_id)
+    bloques = sorted(idx.orden_por_bloque.items(), key=lambda x: x[1])  # [(id, orden)]
+    grilla = 0
+    for _, orden in bloques:
+        grilla |= _mascara(orden, 1)
+    disp = _mascaras_disponibilidad(clase.docente_id, cal_id) if clase.docente_id else None
+
+    filas = []
+    for day in dias:
+        ocupado = [
+            (tipo.lower(), idx.mascara(tipo, rid, day, excluir=clase.pk) if rid else 0)
+            for tipo, rid in (("GRUPO", clase.grupo_id), ("DOCENTE", clase.docente_id), ("AMBIENTE", clase.ambiente_id))
+        ]
+        disp_dia = disp.get(day, 0) if disp is not None else None
+        celdas = []
+        for _, orden in bloques:
+            w = _mascara(orden, dur)
+            estado = "libre"
+            if w & ~grilla:
+                estado = "fuera_grilla"
+            else:
+                for tipo, m in ocupado:
+                    if m & w:
+                        estado = tipo
+                        break
+                else:
+                    if disp_dia is not None and w & ~disp_dia:
+                        estado = "fuera_disponibilidad"
+            celdas.append(estado)
+        filas.append({"day_of_week": day, "celdas": celdas})
+
+    return Response({
+        "clase": clase.id,
+        "bloques_duracion": dur,
+        "bloques": [{"id": b_id, "orden": orden} for b_id, orden in bloques],
+        "filas": filas,
+    })
@@ -1,22 +1,27 @@
-from io import BytesIO
-from typing import List
-from django.http import HttpResponse
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from io import RawIOBase
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema
 from drf_spectacular.types import OpenApiTypes
 
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib.units import cm
-from reportlab.lib import colors
-from reportlab.pdfgen import canvas
-from reportlab.pdfbase.pdfmetrics import stringWidth
-
 from scheduling.models import Clase, Bloque
-from users.permissions import IsTeacherOrManager
+from scheduling.pdf_render import DatosPDF, huella, render_horario
+from scheduling.single_flight import single_flight
+from users.permissions import IsManagerOrStaff, IsTeacherOrManager
 from users.models import Docente  # <— para obtener el nombre si viene ?docente=
 
-DOW_LABEL = {1:"Lunes",2:"Martes",3:"Miércoles",4:"Jueves",5:"Viernes",6:"Sábado",7:"Domingo"}
+# PDFs ya renderizados, direccionados por el hash de lo que dibujan (ver pdf_render.huella)
+PDF_CACHE_DIR = getattr(settings, "SCHEDULING_PDF_CACHE_DIR",
+                        os.path.join(tempfile.gettempdir(), "horarios-pdf-cache"))
+PDF_PROCESOS = getattr(settings, "SCHEDULING_PDF_PROCESOS", min(4, os.cpu_count() or 1))
 
 def _parse_dias(qsparam: str | None) -> List[int]:
     if not qsparam:
@@ -30,22 +35,65 @@ def _parse_dias(qsparam: str | None) -> List[int]:
             pass
     return out or [1,2,3,4,5]
 
-def _wrap_text(c: canvas.Canvas, text: str, max_w: float, max_lines: int, base_font="Helvetica", base_size=8):
-    words=text.split()
-    for size in range(base_size,6,-1):
-        lines,cur=[], ""
-        for w in words:
-            cand=w if not cur else cur+" "+w
-            if stringWidth(cand, base_font, size) <= max_w:
-                cur=cand
-            else:
-                if cur: lines.append(cur)
-                cur=w
-            if len(lines)>=max_lines: break
-        if cur and len(lines)<max_lines: lines.append(cur)
-        if len(lines)<=max_lines:
-            return lines[:max_lines], size
-    return [text[: max(0,int(max_w/(stringWidth("M","Helvetica",6) or 1)))]], 6
+# ---------------- cache en disco ----------------
+
+def _ruta_cache(h: str) -> str:
+    return os.path.join(PDF_CACHE_DIR, h[:2], f"{h}.pdf")
+
+def _cache_leer(h: str) -> Optional[bytes]:
+    try:
+        with open(_ruta_cache(h), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _cache_guardar(h: str, pdf: bytes) -> None:
+    ruta = _ruta_cache(h)
+    try:
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # escribir aparte y renombrar: un lector concurrente nunca ve un archivo a medias
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp, ruta)
+    except OSError:
+        pass  # la cache es opcional
+
+def _pdf_para(datos: DatosPDF) -> Tuple[str, bytes]:
+    h = huella(datos)
+    pdf = _cache_leer(h)
+    if pdf is None:
+        pdf = render_horario(datos)
+        _cache_guardar(h, pdf)
+    return h, pdf
+
+# ---------------- datos ----------------
+
+def _clases_qs(periodo_id: int, calendario_id: int, dias: List[int]):
+    return (
+        Clase.objects.select_related("grupo__asignatura","docente","ambiente__edificio","ambiente__tipo_ambiente","bloque_inicio")
+        .filter(periodo_id=periodo_id, calendario_id=calendario_id)
+        .exclude(estado="cancelado")
+        .filter(day_of_week__in=dias)
+        .order_by("day_of_week","bloque_inicio__orden","grupo__asignatura__codigo","id")
+    )
+
+def _fila(cl: Clase) -> tuple:
+    a = cl.grupo.asignatura
+    aula_txt = str(cl.ambiente) if cl.ambiente_id else "—"
+    linea1 = f"{a.codigo} – {aula_txt}"
+    linea2 = cl.grupo.codigo or f"Grupo #{cl.grupo_id}"
+    return (int(cl.day_of_week), cl.bloque_inicio.orden, int(cl.bloques_duracion or 1), cl.tipo, linea1, linea2)
+
+def _bloques_pdf(calendario_id: int) -> List[Tuple[int, str]]:
+    return [(b.orden, f"{b.hora_inicio.strftime('%H:%M')} - {b.hora_fin.strftime('%H:%M')}")
+            for b in Bloque.objects.filter(calendario_id=calendario_id).order_by("orden")]
+
+def _pdf_response(pdf: bytes, h: str, filename: str) -> HttpResponse:
+    resp = HttpResponse(pdf, content_type="application/pdf")
+    resp["Content-Disposition"] = f'inline; filename="{filename}"'
+    resp["ETag"] = f'"{h}"'
+    return resp
 
 @extend_schema(
     tags=["export"],
@@ -54,10 +102,12 @@ def _wrap_text(c: canvas.Canvas, text: str, max_w: float, max_lines: int, base_f
 )
 @api_view(["GET"])
 @permission_classes([IsAuthenticated, IsTeacherOrManager])
+@single_flight(lambda request: repr(sorted(request.query_params.lists())) + request.headers.get("If-None-Match", ""))
 def export_pdf_view(request):
     """
     Exporta horario semanal en PDF como grilla (días × bloques).
     Filtros: ?periodo=&calendario=&docente=&grupo=&ambiente=&dias=1,2,3,4,5
+    El PDF se cachea en disco por hash de su contenido; responde ETag y 304 con If-None-Match.
     """
     try:
         periodo_id = int(request.query_params.get("periodo"))
@@ -67,22 +117,15 @@ def export_pdf_view(request):
 
     dias = _parse_dias(request.query_params.get("dias"))
 
-    qs = (
-        Clase.objects.select_related("grupo__asignatura","docente","ambiente","bloque_inicio")
-        .filter(grupo__periodo_id=periodo_id, bloque_inicio__calendario_id=calendario_id)
-        .exclude(estado="cancelado")
-        .filter(day_of_week__in=dias)
-        .order_by("day_of_week","bloque_inicio__orden","grupo__asignatura__codigo")
-    )
+    qs = _clases_qs(periodo_id, calendario_id, dias)
     # filtros adicionales
     for p in ("docente","grupo","ambiente"):
         val = request.query_params.get(p)
         if val: qs = qs.filter(**{f"{p}_id": val})
 
-    bloques = list(Bloque.objects.filter(calendario_id=calendario_id).order_by("orden"))
+    bloques = _bloques_pdf(calendario_id)
     if not bloques:
         return HttpResponse("No hay bloques para el calendario dado.", status=400)
-    bloque_index = {b.orden: i for i,b in enumerate(bloques)}
 
     # ======== ENCABEZADO: construir subtítulo con NOMBRE de docente ========
     docente_nombre = None
@@ -101,29 +144,6 @@ def export_pdf_view(request):
             docente_nombre = nombres[0]
     # =======================================================================
 
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=landscape(A4))
-    page_w, page_h = landscape(A4)
-
-    left, right, top, bottom = 1.2*cm, 1.2*cm, 1.4*cm, 1.2*cm
-    title_h = 0.9*cm
-    header_h = 1.0*cm
-    y0 = page_h - top - title_h
-    time_col_w = 3.2*cm
-    grid_x0 = left + time_col_w
-    grid_y_top = y0 - 0.4*cm
-    grid_w = page_w - right - grid_x0
-    grid_h = grid_y_top - bottom - header_h
-
-    col_count = len(dias)
-    row_count = len(bloques)
-    col_w = grid_w / col_count
-    row_h = grid_h / row_count
-
-    # Título y subtítulo
-    c.setFont("Helvetica-Bold", 13)
-    c.drawString(left, page_h - top, "Horario semanal")
-    c.setFont("Helvetica", 9)
     subt = [f"Período {periodo_id}", f"Cal {calendario_id}"]
     # Mostrar docente por nombre si aplica
     if docente_nombre:
@@ -134,74 +154,126 @@ def export_pdf_view(request):
             v = request.query_params.get(p)
             if v:
                 subt.append(f"{p.capitalize()} {v}")
-    c.drawString(left, page_h - top - 0.6*cm, " · ".join(subt))
-
-    # Encabezado de días
-    c.setFont("Helvetica-Bold", 10)
-    for i, d in enumerate(dias):
-        label = DOW_LABEL.get(d, str(d))
-        x_center = grid_x0 + i*col_w + col_w/2
-        c.drawCentredString(x_center, grid_y_top - 0.75*cm + header_h - 0.65*cm, label)
-
-    # Etiquetas de filas (rangos)
-    c.setFont("Helvetica", 8)
-    for r, b in enumerate(bloques):
-        y_center = grid_y_top - header_h - r*row_h - row_h/2
-        rango = f"{b.hora_inicio.strftime('%H:%M')} - {b.hora_fin.strftime('%H:%M')}"
-        c.drawRightString(grid_x0 - 0.15*cm, y_center - 2.5, rango)
-
-    # Grid
-    c.setStrokeColor(colors.black); c.setLineWidth(1)
-    for i in range(col_count + 1):
-        x = grid_x0 + i * col_w
-        c.line(x, grid_y_top - header_h - grid_h, x, grid_y_top - header_h)
-    for r in range(row_count + 1):
-        y = grid_y_top - header_h - r * row_h
-        c.line(grid_x0, y, grid_x0 + grid_w, y)
-    c.line(grid_x0, grid_y_top - header_h, grid_x0 + grid_w, grid_y_top - header_h)
-
-    # Celdas de clases
-    for cl in qs:
-        if cl.bloque_inicio is None or cl.bloque_inicio.orden not in bloque_index:
+
+    datos = {"subtitulo": " · ".join(subt), "dias": dias, "bloques": bloques, "clases": [_fila(cl) for cl in qs]}
+    h = huella(datos)
+    if f'"{h}"' in request.headers.get("If-None-Match", ""):
+        resp = HttpResponse(status=304)
+        resp["ETag"] = f'"{h}"'
+        return resp
+    h, pdf = _pdf_para(datos)
+    return _pdf_response(pdf, h, "horario-semanal.pdf")
+
+# ---------------- exportación por lotes ----------------
+
+class _Tubo(RawIOBase):
+    """
+    Destino no seekable para zipfile: acumula lo escrito hasta que el generador lo entrega.
+    """
+
+    def __init__(self):
+        self._partes: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._partes.append(bytes(b))
+        return len(b)
+
+    def vaciar(self) -> bytes:
+        out = b"".join(self._partes)
+        self._partes.clear()
+        return out
+
+def _zip_stream(listos: List[Tuple[str, bytes]], pendientes: List[Tuple[str, str, DatosPDF]]) -> Iterable[bytes]:
+    """
+    Emite el ZIP a medida que hay PDFs: primero los que estaban en cache, luego los que
+    se renderizan en el pool de procesos.
+    """
+    tubo = _Tubo()
+    with zipfile.ZipFile(tubo, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nombre, pdf in listos:
+            zf.writestr(nombre, pdf)
+            yield tubo.vaciar()
+        if pendientes:
+            lotes = [d for _, _, d in pendientes]
+            if len(pendientes) == 1 or PDF_PROCESOS <= 1:
+                pdfs = map(render_horario, lotes)
+                pool = None
+            else:
+                # "spawn": pdf_render no depende de Django, los procesos arrancan limpios
+                pool = ProcessPoolExecutor(max_workers=PDF_PROCESOS, mp_context=multiprocessing.get_context("spawn"))
+                pdfs = pool.map(render_horario, lotes, chunksize=4)
+            try:
+                for (nombre, h, _), pdf in zip(pendientes, pdfs):
+                    _cache_guardar(h, pdf)
+                    zf.writestr(nombre, pdf)
+                    yield tubo.vaciar()
+            finally:
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+    yield tubo.vaciar()
+
+@extend_schema(
+    tags=["export"],
+    parameters=[],
+    responses={(200, "application/zip"): OpenApiTypes.BINARY},
+)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsManagerOrStaff])
+def export_pdf_lote_view(request):
+    """
+    Un PDF por docente, grupo o ambiente del calendario, en un solo ZIP.
+    ?periodo=&calendario=&por=docente|grupo|ambiente&dias=1,2,3,4,5
+    Lee las clases en una consulta; los PDFs que no están en la cache se renderizan en paralelo.
+    """
+    try:
+        periodo_id = int(request.query_params.get("periodo"))
+        calendario_id = int(request.query_params.get("calendario"))
+    except (TypeError, ValueError):
+        return HttpResponse("periodo y calendario son requeridos", status=400)
+    por = request.query_params.get("por", "docente")
+    if por not in ("docente", "grupo", "ambiente"):
+        return HttpResponse("por debe ser docente, grupo o ambiente", status=400)
+
+    dias = _parse_dias(request.query_params.get("dias"))
+    bloques = _bloques_pdf(calendario_id)
+    if not bloques:
+        return HttpResponse("No hay bloques para el calendario dado.", status=400)
+
+    filas: Dict[int, List[tuple]] = {}
+    docentes_de: Dict[int, set] = {}
+    nombres: Dict[int, str] = {}
+    for cl in _clases_qs(periodo_id, calendario_id, dias):
+        ent = getattr(cl, f"{por}_id")
+        if not ent:
             continue
-        day_idx = dias.index(cl.day_of_week)
-        start_idx = bloque_index[cl.bloque_inicio.orden]
-        dur = int(cl.bloques_duracion or 1)
-
-        x = grid_x0 + day_idx*col_w + 0.8
-        y = grid_y_top - header_h - (start_idx + dur)*row_h + 0.8
-        w = col_w - 1.6
-        h = dur*row_h - 1.6
-
-        fill = colors.Color(0.93,0.96,1.0) if cl.tipo == "T" else colors.Color(0.96,0.93,1.0)
-        c.setFillColor(fill); c.setStrokeColor(colors.black)
-        c.rect(x, y, w, h, stroke=1, fill=1)
-
-        c.setFillColor(colors.black)
-        top_pad, left_pad = 2.5, 3.0
-        max_w = w - 2*left_pad
-
-        a = cl.grupo.asignatura
-        aula_txt = str(cl.ambiente) if cl.ambiente_id else "—"
-        linea1 = f"{a.codigo} – {aula_txt}"
-        linea2 = cl.grupo.codigo or f"Grupo #{cl.grupo_id}"
-
-        lines1, size1 = _wrap_text(c, linea1, max_w, 2, base_size=8)
-        lines2, size2 = _wrap_text(c, linea2, max_w, 1, base_size=7)
-        yy = y + h - top_pad - size1
-        c.setFont("Helvetica-Bold", size1)
-        for L in lines1:
-            c.drawString(x + left_pad, yy, L)
-            yy -= size1 + 1.2
-        c.setFont("Helvetica", size2)
-        if yy - size2 > y + 1.5:
-            c.drawString(x + left_pad, yy, lines2[0])
-
-    c.showPage()
-    c.save()
-    pdf = buffer.getvalue()
-    buffer.close()
+        filas.setdefault(ent, []).append(_fila(cl))
+        if cl.docente_id:
+            nombres[cl.docente_id] = cl.docente.nombre_completo
+            docentes_de.setdefault(ent, set()).add(cl.docente_id)
 
-    resp = HttpResponse(pdf, content_type="application/pdf")
-    resp["Content-Disposition"] = 'inline; filename="horario-semanal.pdf"'
+    listos: List[Tuple[str, bytes]] = []
+    pendientes: List[Tuple[str, str, DatosPDF]] = []
+    for ent in sorted(filas):
+        subt = [f"Período {periodo_id}", f"Cal {calendario_id}"]
+        # mismo subtítulo que export_pdf_view con el filtro equivalente
+        if por == "docente":
+            subt.append(f"Docente {nombres.get(ent, ent)}")
+        elif por == "grupo" and len(docentes_de.get(ent, ())) == 1:
+            subt.append(f"Docente {nombres[next(iter(docentes_de[ent]))]}")
+        else:
+            subt.append(f"{por.capitalize()} {ent}")
+        datos = {"subtitulo": " · ".join(subt), "dias": dias, "bloques": bloques, "clases": filas[ent]}
+        h = huella(datos)
+        nombre = f"{por}-{ent}.pdf"
+        pdf = _cache_leer(h)
+        if pdf is None:
+            pendientes.append((nombre, h, datos))
+        else:
+            listos.append((nombre, pdf))
+
+    resp = StreamingHttpResponse(_zip_stream(listos, pendientes), content_type="application/zip")
+    resp["Content-Disposition"] = f'attachment; filename="horarios-{por}-cal{calendario_id}.zip"'
     return resp
@@ -1,18 +1,33 @@
+from functools import lru_cache
 from hashlib import md5
+from django.core.cache import cache
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema
 
-from users.permissions import IsTeacherOrManager
+from users.permissions import IsManagerOrStaff, IsTeacherOrManager
 from scheduling.models import Clase, Bloque, Calendario, DiaSemana
 from academics.models import Grupo
+from .cache_respuestas import TTL_RESPUESTAS, clave_respuesta, contar, estadisticas
+from .ocupacion import cache_compartida
 from .serializers import GridRequestSerializer, GridResponseSerializer
+from .single_flight import single_flight
 
+@lru_cache(maxsize=4096)
 def _color_hex_from_text(txt: str) -> str:
     h = md5((txt or "x").encode()).hexdigest()[:6]
     return f"#{h}"
 
+def _alcance(request) -> str:
+    role = getattr(getattr(request.user, "profile", None), "role", None)
+    return f"docente:{request.user.pk}" if role == "DOCENTE" else "todo"
+
+def _cuerpo(data):
+    # clave de single_flight: el cuerpo puede no ser un dict (lista, JSON escalar); el serializer lo rechaza luego
+    return sorted(data.items()) if isinstance(data, dict) else repr(data)
+
+
 @extend_schema(
     tags=["grid"],
     request=GridRequestSerializer,
@@ -20,32 +35,58 @@ def _color_hex_from_text(txt: str) -> str:
 )
 @api_view(["POST"])
 @permission_classes([IsAuthenticated, IsTeacherOrManager])
+@single_flight(lambda request: f"{_alcance(request)}:{_cuerpo(request.data)!r}")
 def grid_semana_view(request):
-    """Devuelve la grilla 5×N (o 6×N) con celdas por clase, filtrable por docente/grupo/aula."""
+    """
+    Devuelve la grilla 5×N (o 6×N) con celdas por clase, filtrable por docente/grupo/aula.
+    La respuesta se cachea por (periodo, calendario, filtros, alcance del rol) y se invalida
+    por versión del calendario/catálogo (ver scheduling.cache_respuestas). Header X-Cache: HIT/MISS
+    (BYPASS si la cache no es compartida entre procesos).
+    """
     ser = GridRequestSerializer(data=request.data)
     ser.is_valid(raise_exception=True)
-    periodo_id = ser.validated_data["periodo"]
-    calendario_id = ser.validated_data["calendario"]
-    docente_id = ser.validated_data.get("docente")
-    grupo_id = ser.validated_data.get("grupo")
-    ambiente_id = ser.validated_data.get("ambiente")
-    bmin = ser.validated_data.get("bloque_min")
-    bmax = ser.validated_data.get("bloque_max")
+    datos = ser.validated_data
+    filtros = tuple(datos.get(k) for k in ("docente", "grupo", "ambiente", "bloque_min", "bloque_max"))
+
+    # visibilidad: si es DOCENTE, restringir a sus clases
+    alcance = _alcance(request)
+    usuario_docente = request.user if alcance != "todo" else None
 
+    if not cache_compartida():
+        # cache por proceso: no vería las escrituras de otros procesos, así que no se cachea
+        response = Response(_grid_semana(datos["periodo"], datos["calendario"], *filtros,
+                                         usuario_docente=usuario_docente))
+        response["X-Cache"] = "BYPASS"
+        return response
+
+    key = clave_respuesta("grid", datos["calendario"], datos["periodo"], filtros, alcance)
+    data = cache.get(key)
+    if data is None:
+        contar("grid", "miss")
+        data = _grid_semana(datos["periodo"], datos["calendario"], *filtros, usuario_docente=usuario_docente)
+        cache.set(key, data, TTL_RESPUESTAS)
+        estado = "MISS"
+    else:
+        contar("grid", "hit")
+        estado = "HIT"
+    response = Response(data)
+    response["X-Cache"] = estado
+    return response
+
+def _grid_semana(periodo_id, calendario_id, docente_id=None, grupo_id=None, ambiente_id=None,
+                 bmin=None, bmax=None, usuario_docente=None) -> dict:
     bloques_qs = Bloque.objects.filter(calendario_id=calendario_id).order_by("orden")
     if bmin: bloques_qs = bloques_qs.filter(orden__gte=bmin)
     if bmax: bloques_qs = bloques_qs.filter(orden__lte=bmax)
     bloques = list(bloques_qs)
 
     qs = Clase.objects.select_related(
-        "bloque_inicio","docente","ambiente","grupo__asignatura"
-    ).filter(grupo__periodo_id=periodo_id, bloque_inicio__calendario_id=calendario_id)\
+        "bloque_inicio","docente","ambiente__edificio","ambiente__tipo_ambiente","grupo__asignatura"
+    ).filter(periodo_id=periodo_id, calendario_id=calendario_id)\
      .exclude(estado="cancelado")
 
-    # visibilidad: si es DOCENTE, restringir a sus clases
-    role = getattr(getattr(request.user, "profile", None), "role", None)
-    if role == "DOCENTE":
-        qs = qs.filter(docente__user=request.user)
+    if usuario_docente is not None:
+        qs = qs.filter(docente__user=usuario_docente)
 
     if docente_id: qs = qs.filter(docente_id=docente_id)
     if grupo_id: qs = qs.filter(grupo_id=grupo_id)
@@ -73,7 +114,7 @@ def grid_semana_view(request):
             "color": _color_hex_from_text(asig.codigo or asig.nombre),
         })
 
-    return Response({
+    return {
         "calendario": calendario_id,
         "periodo": periodo_id,
         "dias": [int(d) for d in dias],
@@ -82,4 +123,11 @@ def grid_semana_view(request):
             for b in bloques
         ],
         "celdas": celdas
-    })
+    }
+
+@extend_schema(tags=["grid"], responses={200: None})
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsManagerOrStaff])
+def grid_cache_stats_view(request):
+    """Aciertos/fallos de la cache de grid_semana_view."""
+    return Response(estadisticas("grid"))
@@ -0,0 +1,20 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema
+
+from users.permissions import IsManagerOrStaff
+from scheduling.models import Job
+from .serializers import JobSerializer
+
+@extend_schema(tags=["jobs"], responses={200: JobSerializer})
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsManagerOrStaff])
+def job_detalle_view(request, pk: int):
+    """
+    Estado, progreso y resultado de un job encolado con async=true.
+    """
+    job = Job.objects.filter(pk=pk).first()
+    if job is None:
+        return Response({"detail": "No encontrado."}, status=404)
+    return Response(JobSerializer(job).data)
@@ -130,7 +130,7 @@ def clases_por_calendario_list_view(request):
     qs = (Clase.objects.select_related(
             "grupo__asignatura", "docente", "docente_substituto", "bloque_inicio"
         )
-        .filter(bloque_inicio__calendario_id=calendario)
+        .filter(calendario_id=calendario)
         .exclude(estado="cancelado")
         .order_by("day_of_week", "bloque_inicio__orden", "grupo__asignatura__codigo")
     )
@@ -0,0 +1,14 @@
+"""
+Punto de entrada de los procesos del pool de `jobs_worker`. Se importa en procesos "spawn"
+antes de que Django esté configurado: no importar modelos a nivel de módulo.
+"""
+
+
+def inicializar_proceso():
+    import django
+    django.setup()
+
+
+def ejecutar(job_id: int):
+    from scheduling.jobs import ejecutar_job
+    return ejecutar_job(job_id)